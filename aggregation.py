@@ -0,0 +1,103 @@
+import threading
+
+# Agregasi transaksi POS per (cabang, tanggal). Field tanggal/cabang/nominal di-resolve sekali per endpoint,
+# lalu halaman dijumlahkan langsung ke total sen (StreamingAggregator), record mentah tidak perlu ditampung.
+
+# Urutan fallback field, sama seperti loop lama di fetch_api_data
+DATE_FIELDS = ('tanggal_transaksi', 'tanggal', 'created_at')
+CLINIC_FIELDS = ('nama_clinic', 'nama_klinik', 'klinik')
+AMOUNT_FIELDS = ('total_bayar', 'total_pembayaran', 'total', 'nominal')
+
+SCHEMA_SAMPLE_SIZE = 100  # Jumlah record yang dicek untuk menentukan field yang dipakai endpoint
+
+def resolve_fields(records, candidates):
+    """Field kandidat yang benar-benar ada di schema endpoint (dicek sekali dari sampel record)"""
+    keys = set()
+    for record in records[:SCHEMA_SAMPLE_SIZE]:
+        keys.update(record.keys())
+    return [field for field in candidates if field in keys]
+
+class StreamingAggregator:
+    """Akumulator total per (cabang, tanggal) yang diisi per halaman, record mentah tidak disimpan"""
+
+    def __init__(self, year_month=None):
+        self.year_month = year_month
+        self.totals = {}  # (cabang, tanggal) -> total sen
+        self.record_counts = {}  # endpoint -> jumlah record yang sudah diproses
+        self.schemas = {}  # endpoint -> field tanggal/cabang/nominal hasil resolve halaman pertama
+        self.lock = threading.Lock()
+
+    def schema(self, endpoint, records):
+        with self.lock:
+            if endpoint not in self.schemas:
+                self.schemas[endpoint] = tuple(
+                    resolve_fields(records, candidates) or list(candidates)
+                    for candidates in (DATE_FIELDS, CLINIC_FIELDS, AMOUNT_FIELDS)
+                )
+            return self.schemas[endpoint]
+
+    def add_page(self, endpoint, records):
+        """Tambahkan satu halaman record ke akumulator"""
+        if not records:
+            return
+        date_fields, clinic_fields, amount_fields = self.schema(endpoint, records)
+
+        page_totals = {}  # Dalam sen (int) supaya total bulanan exact
+        for record in records:
+            tanggal = first_value(record, date_fields)
+            if not tanggal:
+                continue
+            tanggal = str(tanggal).split(' ')[0]
+            if self.year_month and not tanggal.startswith(self.year_month):
+                continue
+            cabang = first_value(record, clinic_fields)
+            if not cabang:
+                continue
+            amount = first_value(record, amount_fields)
+            key = (cabang, tanggal)
+            page_totals[key] = page_totals.get(key, 0) + parse_rupiah_sen(amount)
+
+        with self.lock:
+            for key, total in page_totals.items():
+                self.totals[key] = self.totals.get(key, 0) + total
+            self.record_counts[endpoint] = self.record_counts.get(endpoint, 0) + len(records)
+
+    def consume(self, endpoint, pages):
+        """Habiskan generator halaman (mis. api_client.iter_pages) ke akumulator, return jumlah record"""
+        for records in pages:
+            self.add_page(endpoint, records)
+        return self.record_counts.get(endpoint, 0)
+
+    def result(self):
+        """Hasil dalam bentuk {cabang: {tanggal: total}} seperti yang dipakai compare_data"""
+        aggregated = {}
+        with self.lock:
+            for (cabang, tanggal), total in self.totals.items():
+                aggregated.setdefault(cabang, {})[tanggal] = sen_to_rupiah(total)
+        return aggregated
+
+def parse_rupiah_sen(value):
+    """'120000.00' -> 12000000 (sen), exact tanpa lewat float"""
+    if value is None or value == '':
+        return 0
+    if isinstance(value, int):
+        return value * 100
+    if isinstance(value, float):
+        return round(value * 100)
+    text = str(value).strip()
+    negative = text.startswith('-')
+    whole, _, fraction = text.lstrip('+-').partition('.')
+    sen = int(whole or 0) * 100 + int((fraction + '00')[:2] or 0)
+    return -sen if negative else sen
+
+def sen_to_rupiah(sen):
+    """Total sen (int) ke Rupiah float, konversi sekali di akhir supaya tidak ada akumulasi pembulatan"""
+    return sen / 100
+
+def first_value(record, fields):
+    """Nilai pertama yang ada (bukan None) dari daftar field; nominal 0 tetap 0, tidak jatuh ke field berikutnya"""
+    for field in fields:
+        value = record.get(field)
+        if value is not None:
+            return value
+    return None
@@ -0,0 +1,204 @@
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+import api_client
+from api_client import MAX_CONCURRENCY
+from date_windows import WEEK_RULE_PROGRESS, WEEK_RULE_SALES, filter_range
+from leaderboard import fetch_clinics
+from leaderboard_engine import LeaderboardEngine
+from metrics import metrics
+from range_cache import RangeCache
+from response_cache import today_wib
+
+# Service aggregator: sync upstream di background, leaderboard disimpan di memori (LeaderboardEngine), lalu
+# dilayani dengan bentuk yang sama seperti /api/sales (JSON) dan /api/sales-progress (SSE progress / complete).
+# Route Next.js proxy ke sini kalau env AGGREGATOR_URL di-set, jadi refresh dashboard tidak memicu crawl upstream.
+
+DEFAULT_PORT = 8790
+REFRESH_INTERVAL = 60  # Detik antar sync hari berjalan
+KEEPALIVE_INTERVAL = 5  # Detik antar komentar SSE selama scan pertama belum selesai
+
+# Definisi minggu masing-masing route (lihat date_windows)
+ROUTE_WEEK_RULES = {
+    '/api/sales': WEEK_RULE_SALES,
+    '/api/sales-progress': WEEK_RULE_PROGRESS,
+}
+
+class Aggregator:
+    """Engine leaderboard yang di-refresh di background: scan penuh saat start / ganti hari, selain itu hanya hari ini"""
+
+    def __init__(self, interval=REFRESH_INTERVAL, max_workers=MAX_CONCURRENCY, today=today_wib):
+        self.interval = interval
+        self.max_workers = max_workers
+        self.today = today  # Fungsi tanggal hari ini (bisa diganti untuk uji dengan data stand-in)
+        self.engine = None
+        self.range_cache = RangeCache(today=today, max_workers=max_workers)  # Window di luar rentang scan engine
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.last_refresh = None
+        self.last_error = None
+
+    def refresh(self):
+        today = self.today()
+        engine = self.engine
+        if engine is None or engine.today != today:
+            # Ganti hari: bangun ulang. Hari yang sudah tutup dibaca dari cache disk (immutable), jadi murah
+            # Engine pakai aturan minggu sales (bisa lewat akhir bulan), jadi rentang scan juga cukup untuk progress
+            started = time.perf_counter()
+            engine = LeaderboardEngine(fetch_clinics(), today, WEEK_RULE_SALES).scan(self.max_workers)
+            print(f"   ✅ Scan {engine.scan_range[0]} s/d {engine.scan_range[1]}: {engine.n_records} record, {time.perf_counter() - started:.1f}s")
+            self.engine = engine
+        else:
+            engine.rescan(today, self.max_workers)
+        self.last_refresh = time.time()
+        self.ready.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:  # Sync gagal: tetap layani data terakhir, coba lagi interval berikutnya
+                self.last_error = str(e)
+                print(f"   ❌ Refresh gagal: {e}")
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        thread = threading.Thread(target=self.run, name="aggregator-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.stopped.set()
+
+    def leaderboard(self, params, week_rule):
+        """Baris /api/sales untuk query dashboard; window di luar scan (mis. tahun lalu) lewat range cache"""
+        engine = self.engine
+        query = (params.get('filter') or 'daily', params.get('date'), params.get('week'), params.get('month'), params.get('year'))
+        try:
+            return engine.window(*query, week_rule=week_rule)
+        except ValueError:
+            dari_tanggal, sampai_tanggal = filter_range(*query, today=engine.today, week_rule=week_rule)
+            return self.range_cache.leaderboard(dari_tanggal, sampai_tanggal, engine.clinics)
+
+    def status(self):
+        engine = self.engine
+        return {
+            'ready': self.ready.is_set(),
+            'today': engine.today if engine else None,
+            'scan_range': engine.scan_range if engine else None,
+            'records_ingested': engine.n_records if engine else 0,
+            'last_refresh': self.last_refresh,
+            'last_error': self.last_error,
+        }
+
+class AggregatorHandler(BaseHTTPRequestHandler):
+    # HTTP/1.0: koneksi ditutup setelah response, stream SSE selesai saat event complete terkirim
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        aggregator = self.server.aggregator
+        parts = urlsplit(self.path)
+        path = parts.path.rstrip('/')
+        params = dict(parse_qsl(parts.query))
+
+        if path == '/healthz':
+            return self.send_json(200, aggregator.status())
+        if path == '/metrics':
+            return self.send_body(200, 'text/plain; version=0.0.4', metrics.prometheus_text().encode('utf-8'))
+        if path == '/api/sales':
+            if not aggregator.ready.wait(self.server.ready_timeout):
+                return self.send_json(503, {'message': 'Aggregator belum selesai scan pertama'})
+            try:
+                return self.send_json(200, aggregator.leaderboard(params, ROUTE_WEEK_RULES[path]))
+            except Exception as e:
+                # Sama seperti route.js: error = array kosong
+                print(f"   ❌ /api/sales {params}: {e}")
+                return self.send_json(200, [])
+        if path == '/api/sales-progress':
+            return self.send_progress(aggregator, params, ROUTE_WEEK_RULES[path])
+        return self.send_json(404, {'message': 'Not Found'})
+
+    def send_progress(self, aggregator, params, week_rule):
+        """Event SSE seperti /api/sales-progress: progress per cabang lalu complete (langsung dari memori)"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')  # Stream selesai setelah event complete
+        self.end_headers()
+        try:
+            while not aggregator.ready.wait(KEEPALIVE_INTERVAL):
+                self.write_event(None)
+            try:
+                rows = aggregator.leaderboard(params, week_rule)
+            except Exception as e:
+                return self.write_event({'type': 'error', 'message': str(e)})
+            clinics = aggregator.engine.clinics
+            for current, clinic in enumerate(clinics, 1):
+                self.write_event({
+                    'type': 'progress',
+                    'clinic': clinic.get('nama_clinic') or clinic.get('name'),
+                    'progress': int((current - 0.5) * 100 / len(clinics) + 0.5),  # Math.round seperti route.js
+                    'total': len(clinics),
+                    'current': current,
+                })
+            self.write_event({'type': 'complete', 'data': rows})
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Dashboard sudah menutup koneksi
+
+    def write_event(self, event):
+        """Satu event SSE 'data: {...}', atau komentar keep-alive kalau event None"""
+        payload = ": keep-alive\n\n" if event is None else f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+        self.wfile.write(payload.encode('utf-8'))
+        self.wfile.flush()
+
+    def send_json(self, status, body):
+        self.send_body(status, 'application/json', json.dumps(body, ensure_ascii=False).encode('utf-8'))
+
+    def send_body(self, status, content_type, payload):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+class AggregatorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, aggregator, ready_timeout=60):
+        super().__init__(address, AggregatorHandler)
+        self.aggregator = aggregator
+        self.ready_timeout = ready_timeout  # Detik request JSON menunggu scan pertama sebelum 503
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregator leaderboard: sync upstream di background, layani /api/sales dan /api/sales-progress")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--interval", type=float, default=REFRESH_INTERVAL, help="Detik antar sync hari berjalan")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENCY)
+    args = parser.parse_args()
+
+    # Halaman hari berjalan di cache disk harus sudah kadaluarsa di refresh berikutnya
+    api_client.response_cache.live_ttl = min(api_client.response_cache.live_ttl, args.interval / 2)
+
+    aggregator = Aggregator(args.interval, args.workers)
+    aggregator.start()
+    server = AggregatorServer((args.host, args.port), aggregator)
+    print(f">> Aggregator di http://{args.host}:{server.server_address[1]} (refresh tiap {args.interval:.0f}s)")
+    print(f"   Set AGGREGATOR_URL=http://{args.host}:{server.server_address[1]} di Next.js untuk proxy")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        aggregator.stop()
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
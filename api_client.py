@@ -0,0 +1,435 @@
+import os
+import time
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from response_cache import ResponseCache, normalize_url, is_immutable
+from metrics import metrics
+
+# Client HTTP bersama untuk semua script Python (compare_settlement*, debug_dashboard_logic)
+API_BASE_URL = os.environ.get("CLINIC_API_BASE_URL", "https://clinic.beautycenter.id/api")
+
+RATE_LIMIT_PER_MINUTE = 500  # Limit upstream
+MAX_RETRIES = 3  # Sama dengan maxRetries di fetchWithParams (app/api/sales/route.js)
+RATE_LIMIT_WAIT = 3.0  # Detik tunggu setelah 429
+MAX_BACKOFF = 5.0  # Exponential backoff 1s, 2s, 4s, maksimal 5s
+POOL_SIZE = 16
+MAX_PAGES = 200
+MAX_CONCURRENCY = 8  # Maksimal request paralel per endpoint
+
+class TokenBucket:
+    """Rate limiter token bucket, dipakai bersama oleh semua thread"""
+
+    def __init__(self, rate_per_minute=RATE_LIMIT_PER_MINUTE, burst=10):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Tunggu sampai ada token (dan tidak sedang pause karena 429)"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Tahan semua request selama beberapa detik (setelah kena 429) dan kosongkan burst"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+class PageLimitReached(Exception):
+    """Masih ada halaman berikutnya setelah max_pages (dipakai iter_pages dengan strict=True)"""
+
+class PageFetchFailed(Exception):
+    """Halaman gagal di-fetch setelah semua retry (dipakai iter_pages dengan strict=True): hasil walk tidak lengkap"""
+
+limiter = TokenBucket()
+request_count = 0  # Jumlah request HTTP yang benar-benar dikirim (termasuk retry, tidak termasuk cache hit)
+failure_count = 0  # Request yang menyerah (get_json return None), walk halaman berhenti di situ
+_request_count_lock = threading.Lock()
+response_cache = ResponseCache()  # Set response_cache.refresh = True untuk --refresh
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Session requests dengan connection pool (keep-alive) dan kompresi gzip/deflate"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                'Accept': 'application/json',
+                'Accept-Encoding': 'gzip, deflate',
+            })
+            _session = session
+        return _session
+
+def count_request():
+    global request_count
+    with _request_count_lock:
+        request_count += 1
+
+def count_failure():
+    global failure_count
+    with _request_count_lock:
+        failure_count += 1
+
+def backoff_seconds(retry_count):
+    """Exponential backoff seperti fetchWithParams: 1s, 2s, 4s, maksimal 5s"""
+    return min(2 ** (retry_count - 1), MAX_BACKOFF)
+
+def get_json(endpoint, params=None, timeout=30, cached=True):
+    """GET endpoint (nama endpoint atau URL lengkap) lewat cache disk, rate limit dan retry; return JSON atau None.
+    cached=False: selalu request ke API (hasilnya tetap ditulis ke cache)"""
+    url = endpoint if endpoint.startswith("http") else f"{API_BASE_URL}/{endpoint}"
+    cached = response_cache.get(url, params) if cached else None
+    if cached is not None:
+        return cached
+    retry_count = 0
+
+    while retry_count <= MAX_RETRIES:
+        limiter.acquire()
+        count_request()
+        started = time.perf_counter()
+        try:
+            response = get_session().get(url, params=params, timeout=timeout)
+        except requests.RequestException as e:
+            metrics.observe_request(url, time.perf_counter() - started)
+            retry_count += 1
+            if retry_count <= MAX_RETRIES:
+                wait = backoff_seconds(retry_count)
+                metrics.observe_retry(url)
+                print(f"   ⚠️  Network error {url}, retry {retry_count}/{MAX_RETRIES} in {wait:.0f}s: {e}")
+                time.sleep(wait)
+                continue
+            print(f"   ❌ Error fetching {url} after {MAX_RETRIES} retries: {e}")
+            count_failure()
+            return None
+        metrics.observe_request(url, time.perf_counter() - started, response.status_code, len(response.content))
+
+        # Rate limit: tahan semua thread, bukan hanya request ini
+        if response.status_code == 429:
+            print(f"   ⚠️  Rate limit hit {url}, waiting {RATE_LIMIT_WAIT:.0f}s...")
+            limiter.pause(RATE_LIMIT_WAIT)
+            retry_count += 1
+            metrics.observe_retry(url)
+            continue
+
+        if 500 <= response.status_code < 600:
+            retry_count += 1
+            if retry_count <= MAX_RETRIES:
+                wait = backoff_seconds(retry_count)
+                metrics.observe_retry(url)
+                print(f"   ⚠️  API Error {response.status_code} {url}, retry {retry_count}/{MAX_RETRIES} in {wait:.0f}s...")
+                time.sleep(wait)
+                continue
+            print(f"   ❌ API Error {response.status_code} {url} after {MAX_RETRIES} retries, skipping...")
+            count_failure()
+            return None
+
+        if response.status_code != 200:
+            print(f"   ❌ Error: status {response.status_code} {url}")
+            count_failure()
+            return None
+
+        started = time.perf_counter()
+        data = response.json()
+        metrics.observe_decode(url, time.perf_counter() - started)
+        response_cache.put(url, params, data)
+        return data
+
+    count_failure()
+    return None
+
+def fetch_page(endpoint, params, page, cached=True):
+    """Fetch satu halaman endpoint, return JSON hasil atau None kalau gagal"""
+    return get_json(endpoint, {**params, 'page': page}, cached=cached)
+
+class SeenKeys:
+    """Seen-set ringkas: id integer sebagai bitmap (1 bit per id dalam rentang), nomor_transaksi sebagai hash 8 byte"""
+
+    def __init__(self):
+        self.base = None  # id untuk bit pertama
+        self.bits = bytearray()
+        self.hashes = set()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def add(self, record):
+        """True kalau record belum pernah dilihat; record tanpa id / nomor_transaksi (perawatan) selalu dianggap baru"""
+        id_ = record.get('id')
+        if isinstance(id_, int) and id_ >= 0:
+            new = self.add_id(id_)
+        elif record.get('nomor_transaksi') or id_ is not None:
+            key = str(id_ if id_ is not None else record['nomor_transaksi'])
+            digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+            new = digest not in self.hashes
+            self.hashes.add(digest)
+        else:
+            return True
+        self.count += new
+        return new
+
+    def add_id(self, id_):
+        if self.base is None:
+            self.base = id_ & ~7
+        if id_ < self.base:
+            # Rentang diperlebar ke bawah (minimal dua kali lipat supaya tidak sering menggeser isi bitmap)
+            grow = max((self.base - id_ + 7) // 8, len(self.bits))
+            self.bits[:0] = bytes(grow)
+            self.base -= grow * 8
+        index, mask = (id_ - self.base) >> 3, 1 << ((id_ - self.base) & 7)
+        if index >= len(self.bits):
+            self.bits.extend(bytes(max(index + 1 - len(self.bits), len(self.bits))))
+        if self.bits[index] & mask:
+            return False
+        self.bits[index] |= mask
+        return True
+
+    def count_above(self, id_):
+        """Jumlah id integer yang sudah dilihat dan lebih besar dari id_"""
+        if self.base is None:
+            return 0
+        offset = max(id_ + 1 - self.base, 0)
+        index, bit = offset >> 3, offset & 7
+        if index >= len(self.bits):
+            return 0
+        return int.from_bytes(self.bits[index + 1:], 'little').bit_count() + (self.bits[index] >> bit).bit_count()
+
+class PageGuard:
+    """Konsistensi walk halaman (urut id turun) saat ada transaksi baru masuk / dihapus (void) di tengah walk.
+    Insert di atas menggeser batas halaman ke bawah: halaman berikutnya mengulang record (dibuang lewat seen-set).
+    Delete di atas menggeser batas ke atas, dan insert yang kalah cepat dengan fetch paralel juga bisa begitu:
+    ada record yang terlewat di batas p/p+1. Setelah walk selesai, halaman teratas dibaca ulang untuk mengambil
+    insert baru dan mengecek record yang hilang. Kalau selama walk data terbukti berubah, tiap batas halaman yang
+    id-nya tidak bersambung dibaca ulang (delete tidak meninggalkan jejak di jumlah record, jadi batas yang
+    'aman' tidak bisa dibuktikan). Delete tanpa perubahan lain di halaman teratas tidak terdeteksi."""
+
+    def __init__(self, endpoint, params, cached=True):
+        self.endpoint = endpoint
+        self.params = params
+        self.cached = cached  # False: halaman walk selalu dari API (repair memang selalu tanpa cache)
+        self.seen = SeenKeys()
+        self.pages = {}  # halaman -> (id terbesar, id terkecil)
+        self.ordered = True  # False kalau ada halaman tanpa id atau tidak urut id turun: tidak bisa ditambal
+        self.duplicates = 0
+        self.per_page = 1
+        self.drift = 0  # Selisih posisi sebenarnya dengan jumlah id dikenal di atasnya (insert +, delete -)
+        self.failures = 0  # Request baca ulang yang gagal: hasil walk ini mungkin tidak lengkap
+        url = endpoint if endpoint.startswith("http") else f"{API_BASE_URL}/{endpoint}"
+        self.live = not is_immutable(normalize_url(url, params))  # Rentang yang sudah tutup tidak berubah lagi
+
+    def fetch(self, page, cached=True):
+        return fetch_page(self.endpoint, self.params, page, cached and self.cached)
+
+    def reread(self, page):
+        """Baca ulang satu halaman tanpa cache (repair); None kalau gagal, dihitung di failures"""
+        result = self.fetch(page, cached=False)
+        metrics.observe_repair(self.endpoint)
+        if result is None:
+            self.failures += 1
+        return result
+
+    def accept(self, page, data):
+        """Record halaman yang belum pernah dilihat"""
+        ids = [record.get('id') for record in data]
+        self.per_page = max(self.per_page, len(data))
+        if data and all(isinstance(id_, int) for id_ in ids) and all(a > b for a, b in zip(ids, ids[1:])):
+            self.pages[page] = (ids[0], ids[-1])
+        else:
+            self.ordered = False
+        fresh = [record for record in data if self.seen.add(record)]
+        if len(fresh) < len(data):
+            self.duplicates += len(data) - len(fresh)
+            metrics.observe_duplicates(self.endpoint, len(data) - len(fresh))
+            print(f"   ⚠️  {self.endpoint} page {page}: {len(data) - len(fresh)} record dobel (batas halaman bergeser), dibuang")
+        return fresh
+
+    def position(self, id_):
+        """Perkiraan halaman tempat id_ sekarang berada"""
+        return max((self.seen.count_above(id_) + self.drift) // self.per_page + 1, 1)
+
+    def repair(self, max_pages=MAX_PAGES):
+        """Generator record yang masuk / terlewat selama walk (dipanggil setelah halaman terakhir)"""
+        if not self.live or not self.ordered or 1 not in self.pages:
+            return
+        walk_top = max(highest for highest, _ in self.pages.values())
+        # Insert selama walk ada di atas id terbesar walk: baca ulang halaman teratas sampai ketemu id walk
+        inserted = deleted = 0
+        for page in range(1, max_pages + 1):
+            result = self.reread(page)
+            data = (result or {}).get('data') or []
+            fresh = [record for record in data if self.seen.add(record)]
+            inserted += len(fresh)
+            if fresh:
+                yield fresh
+            if not data:
+                break
+            # Id yang pernah dilihat di rentang halaman ini tapi tidak ada lagi: sudah dihapus
+            first_id, last_id = data[0].get('id') or 0, data[-1].get('id') or 0
+            deleted += self.seen.count_above(last_id - 1) - self.seen.count_above(first_id) - len(data)
+            if last_id <= walk_top or not result.get('next_page_url'):
+                break
+        if not inserted and not deleted and not self.duplicates:
+            return
+        print(f"   ⚠️  {self.endpoint}: {inserted} transaksi baru, {deleted} terhapus selama walk, cek batas halaman")
+
+        found = 0
+        for page in sorted(self.pages):
+            if page + 1 not in self.pages:
+                continue
+            lower, upper = self.pages[page + 1][0], self.pages[page][1]
+            if lower >= upper - 1:
+                continue  # Overlap atau id berurutan: tidak ada record yang bisa terlewat di antaranya
+            for records in self.bridge(lower, upper, max_pages):
+                found += len(records)
+                yield records
+        if found:
+            print(f"   ✅ {self.endpoint}: {found} record terlewat di batas halaman ditambal")
+
+    def bridge(self, lower, upper, max_pages):
+        """Record lower < id < upper yang belum dilihat, mulai dari halaman tempat upper sekarang berada.
+        Posisi = id yang sudah dikenal di atas upper + drift, drift diperbarui dari tiap halaman yang dibaca."""
+        page = self.position(upper)
+        above = 0  # Halaman terbawah yang sudah terbukti dimulai dari upper atau di atasnya
+        for _ in range(max_pages):
+            result = self.reread(page)
+            data = (result or {}).get('data') or []
+            fresh = [record for record in data if lower < (record.get('id') or 0) < upper and self.seen.add(record)]
+            if fresh:
+                yield fresh
+            first_id, last_id = (data[0].get('id') or 0, data[-1].get('id') or 0) if data else (0, 0)
+            if first_id >= upper:
+                above = max(above, page)
+            if data and last_id >= upper:
+                # Belum sampai di bawah upper (insert yang belum dikenal menggeser ke bawah): perbarui drift lalu lompat
+                self.drift = page * self.per_page - 1 - self.seen.count_above(last_id)
+                page = max(page + 1, self.position(upper))
+            elif first_id < upper and page > above + 1:
+                # Kelewatan (delete di atas menggeser record ke atas): record setelah upper ada di halaman sebelumnya
+                if data:
+                    self.drift = (page - 1) * self.per_page - self.seen.count_above(first_id)
+                page = max(min(page - 1, self.position(upper)), above + 1)
+            elif not data or last_id <= lower or not result.get('next_page_url'):
+                return
+            else:
+                page += 1
+
+def iter_pages(endpoint, params, max_workers=MAX_CONCURRENCY, max_pages=MAX_PAGES, strict=False, cached=True):
+    """Generator data per halaman, urut nomor halaman; maksimal max_workers halaman di-fetch bersamaan.
+    Record dobel karena batas halaman bergeser dibuang, record yang terlewat ditambal di akhir (PageGuard).
+    strict=True: raise PageLimitReached kalau data masih berlanjut setelah max_pages, PageFetchFailed kalau ada
+    halaman yang gagal (tanpa strict walk berhenti diam-diam di halaman itu). cached=False: lewati cache disk"""
+    guard = PageGuard(endpoint, params, cached)
+    first = guard.fetch(1)
+    if first is None and strict:
+        raise PageFetchFailed(f"{endpoint} {params}: halaman 1 gagal")
+    if not first or not first.get('data'):
+        return
+    print(f"   {endpoint} page {first.get('current_page', 1)}: {len(first['data'])} records")
+    metrics.observe_page(endpoint, len(first['data']))
+    yield guard.accept(1, first['data'])
+    if not first.get('next_page_url'):
+        yield from repair_walk(guard, strict)
+        return
+
+    # last_page hanya ada kalau API pakai paginate() biasa; simplePaginate() hanya kasih next_page_url
+    last_page = min(first.get('last_page') or max_pages, max_pages)
+    reached_end = False
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+        next_page = 2
+
+        def submit_next():
+            nonlocal next_page
+            if next_page <= last_page:
+                pending.append((next_page, pool.submit(guard.fetch, next_page)))
+                next_page += 1
+
+        while len(pending) < max_workers and next_page <= last_page:
+            submit_next()
+
+        try:
+            while pending:
+                page, future = pending.popleft()
+                result = future.result()
+                if result is None and strict:
+                    raise PageFetchFailed(f"{endpoint} {params}: halaman {page} gagal")
+                # Sama seperti walk serial: berhenti di halaman gagal/kosong pertama
+                if not result or not result.get('data'):
+                    reached_end = True
+                    break
+                print(f"   {endpoint} page {page}: {len(result['data'])} records")
+                metrics.observe_page(endpoint, len(result['data']))
+                # Halaman berikutnya di-submit sebelum yield, supaya network jalan selagi halaman ini diproses
+                if result.get('next_page_url'):
+                    submit_next()
+                else:
+                    reached_end = True
+                yield guard.accept(page, result['data'])
+                if reached_end:
+                    break
+        finally:
+            for _, future in pending:
+                future.cancel()
+
+    if not reached_end:
+        if strict:
+            raise PageLimitReached(f"{endpoint} {params}: lebih dari {max_pages} halaman")
+        print(f"   ⚠️  {endpoint}: batas {max_pages} halaman tercapai, data mungkin terpotong")
+        return
+    yield from repair_walk(guard, strict)
+
+def repair_walk(guard, strict):
+    """guard.repair(); strict=True: raise PageFetchFailed kalau ada halaman baca ulang yang gagal"""
+    yield from guard.repair()
+    if guard.failures and strict:
+        raise PageFetchFailed(f"{guard.endpoint} {guard.params}: {guard.failures} halaman baca ulang gagal")
+
+def fetch_all_pages(endpoint, params, max_workers=MAX_CONCURRENCY, max_pages=MAX_PAGES):
+    """Fetch semua halaman endpoint secara paralel, hasil digabung urut sesuai nomor halaman"""
+    return [record for page in iter_pages(endpoint, params, max_workers, max_pages) for record in page]
+
+def fetch_new_pages(endpoint, params, watermark_id, max_pages=MAX_PAGES):
+    """Walk halaman dari yang terbaru (urut id turun) sampai ketemu id yang sudah diketahui"""
+    records = []
+    seen = SeenKeys()  # Insert baru selama walk menggeser halaman: record yang terulang di halaman berikutnya dibuang
+    for page in range(1, max_pages + 1):
+        result = fetch_page(endpoint, params, page)
+        if not result or not result.get('data'):
+            break
+        data = result['data']
+        new_records = [record for record in data if record.get('id') is None or record['id'] > watermark_id]
+        records.extend(record for record in new_records if seen.add(record))
+        print(f"   {endpoint} page {page}: {len(new_records)} record baru")
+        metrics.observe_page(endpoint, len(data))
+        if len(new_records) < len(data) or not result.get('next_page_url'):
+            break
+    else:
+        print(f"   ⚠️  {endpoint}: batas {max_pages} halaman tercapai sebelum ketemu watermark, data mungkin terpotong")
+    return records
@@ -1,4 +1,5 @@
 import { NextResponse } from 'next/server';
+import { getWIBDateStr, fetchRangeTotal } from '@/lib/upstream';
 
 // Mock Beauty Center Only (No Klinik DRW)
 const MOCK_CLINICS = [
@@ -17,93 +18,8 @@ const MOCK_CLINICS = [
 export const dynamic = 'force-dynamic';
 export const runtime = 'nodejs';
 
-function getWIBDateStr(date = new Date()) {
-  const year = date.getFullYear();
-  const month = String(date.getMonth() + 1).padStart(2, '0');
-  const day = String(date.getDate()).padStart(2, '0');
-  return `${year}-${month}-${day}`;
-}
-
-async function fetchWithParams(endpoint, params) {
-  let allData = [];
-  let page = 1;
-  let hasMorePages = true;
-  const maxPages = 50;
-  const maxRetries = 3;
-
-  const queryParams = new URLSearchParams(params);
-
-  while (hasMorePages && page <= maxPages) {
-    queryParams.set('page', page.toString());
-    const url = `https://clinic.beautycenter.id/api/${endpoint}?${queryParams.toString()}`;
-    
-    let retryCount = 0;
-    let success = false;
-    
-    while (!success && retryCount <= maxRetries) {
-      try {
-        const response = await fetch(url, {
-          headers: { 'Accept': 'application/json' },
-          cache: 'no-store'
-        });
-        
-        if (response.status === 429) {
-          await new Promise(resolve => setTimeout(resolve, 3000));
-          retryCount++;
-          continue;
-        }
-        
-        if (response.status >= 500 && response.status < 600) {
-          retryCount++;
-          if (retryCount <= maxRetries) {
-            const waitTime = Math.min(1000 * Math.pow(2, retryCount - 1), 5000);
-            await new Promise(resolve => setTimeout(resolve, waitTime));
-            continue;
-          } else {
-            break;
-          }
-        }
-        
-        if (!response.ok) {
-          break;
-        }
-        
-        const result = await response.json();
-        const data = result?.data || [];
-        
-        if (data.length > 0) {
-          allData = allData.concat(data);
-          
-          if (result.next_page_url) {
-            page++;
-            await new Promise(resolve => setTimeout(resolve, 150));
-          } else {
-            hasMorePages = false;
-          }
-        } else {
-          hasMorePages = false;
-        }
-        
-        success = true;
-        
-      } catch (error) {
-        retryCount++;
-        if (retryCount <= maxRetries) {
-          const waitTime = Math.min(1000 * Math.pow(2, retryCount - 1), 5000);
-          await new Promise(resolve => setTimeout(resolve, waitTime));
-        } else {
-          break;
-        }
-      }
-    }
-    
-    if (!success) {
-      break;
-    }
-  }
-
-  return allData;
-}
+// Python aggregator (aggregator_daemon.py) streaming the same progress/complete events from memory
+const AGGREGATOR_URL = process.env.AGGREGATOR_URL;
 
 async function fetchClinics() {
   try {
@@ -120,6 +36,25 @@ async function fetchClinics() {
 }
 
 export async function GET(request) {
+  if (AGGREGATOR_URL) {
+    try {
+      const { search } = new URL(request.url);
+      const response = await fetch(`${AGGREGATOR_URL}/api/sales-progress${search}`, { cache: 'no-store' });
+      if (response.ok && response.body) {
+        return new Response(response.body, {
+          headers: {
+            'Content-Type': 'text/event-stream',
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+          },
+        });
+      }
+      console.error(`Aggregator error: ${response.status}, falling back to upstream fetch`);
+    } catch (error) {
+      console.error('Aggregator unreachable, falling back to upstream fetch:', error.message);
+    }
+  }
+
   const encoder = new TextEncoder();
   
   const stream = new ReadableStream({
@@ -239,50 +174,31 @@ export async function GET(request) {
           };
           controller.enqueue(encoder.encode(`data: ${JSON.stringify(progressData)}\n\n`));
 
-          const productParams = {
-            nama_cabang: clinicId,
-            dari_tanggal: startDateStr,
-            sampai_tanggal: endDateStr
-          };
-          
-          const treatmentParams = {
-            klinik: clinicId,
-            dari_tanggal: startDateStr,
-            sampai_tanggal: endDateStr
-          };
+          const productParams = { nama_cabang: clinicId };
+          const treatmentParams = { klinik: clinicId };
 
-          let products = [];
-          let treatments = [];
+          let productAmount = 0;
+          let treatmentAmount = 0;
+          let fetchedGaps = false;
           
           try {
-            products = await fetchWithParams('laporan-penjualan-produk', productParams);
+            const products = await fetchRangeTotal('laporan-penjualan-produk', productParams, 'total_bayar', startDateStr, endDateStr);
+            productAmount = products.total;
+            fetchedGaps = products.gaps.length > 0;
           } catch (error) {
             console.error(`Products fetch failed for ${clinicName}:`, error.message);
           }
           
-          await new Promise(resolve => setTimeout(resolve, 200));
+          if (fetchedGaps) await new Promise(resolve => setTimeout(resolve, 200));
           
           try {
-            treatments = await fetchWithParams('laporan-penjualan-perawatan', treatmentParams);
+            const treatments = await fetchRangeTotal('laporan-penjualan-perawatan', treatmentParams, 'total_pembayaran', startDateStr, endDateStr);
+            treatmentAmount = treatments.total;
           } catch (error) {
             console.error(`Treatments fetch failed for ${clinicName}:`, error.message);
           }
 
-          let totalAmount = 0;
-          let productAmount = 0;
-          let treatmentAmount = 0;
-
-          products.forEach(p => {
-            const amount = parseFloat(p.total_bayar || 0);
-            totalAmount += amount;
-            productAmount += amount;
-          });
-
-          treatments.forEach(t => {
-            const amount = parseFloat(t.total_pembayaran || 0);
-            totalAmount += amount;
-            treatmentAmount += amount;
-          });
+          const totalAmount = productAmount + treatmentAmount;
 
           leaderboard.push({
             id: clinicId,
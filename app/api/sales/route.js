@@ -1,4 +1,5 @@
 import { NextResponse } from 'next/server';
+import { CACHE_DURATION, getWIBDateStr, fetchRangeTotal } from '@/lib/upstream';
 
 // Mock Beauty Center Only (No Klinik DRW)
 const MOCK_CLINICS = [
@@ -22,7 +23,9 @@ const cache = {
   yearly: { data: null, timestamp: null, promise: null },
   ytd: { data: null, timestamp: null, promise: null }
 };
-const CACHE_DURATION = 5 * 60 * 1000; // 5 minutes in milliseconds
+
+// Python aggregator (aggregator_daemon.py) holding precomputed leaderboards; unset = crawl upstream here
+const AGGREGATOR_URL = process.env.AGGREGATOR_URL;
 
 function isCacheValid(filter) {
   const filterCache = cache[filter];
@@ -48,115 +51,6 @@ function getCache(filter) {
   return null;
 }
 
-// Helper to get date in YYYY-MM-DD format for WIB (UTC+7)
-function getWIBDate(date = new Date()) {
-  const utcOffset = 7 * 60; // 7 hours in minutes
-  const localTime = new Date(date.getTime() + (utcOffset * 60 * 1000));
-  return localTime.toISOString().split('T')[0];
-}
-
-function getWIBDateStr(date = new Date()) {
-  // Get local date parts to avoid timezone issues
-  const year = date.getFullYear();
-  const month = String(date.getMonth() + 1).padStart(2, '0');
-  const day = String(date.getDate()).padStart(2, '0');
-  return `${year}-${month}-${day}`;
-}
-
-async function fetchWithParams(endpoint, params) {
-  let allData = [];
-  let page = 1;
-  let hasMorePages = true;
-  const maxPages = 50; // Safety limit for monthly data
-  const maxRetries = 3; // Max retry attempts for 500 errors
-
-  // Construct base query params
-  const queryParams = new URLSearchParams(params);
-
-  while (hasMorePages && page <= maxPages) {
-    // Update page parameter
-    queryParams.set('page', page.toString());
-    const url = `https://clinic.beautycenter.id/api/${endpoint}?${queryParams.toString()}`;
-    
-    let retryCount = 0;
-    let success = false;
-    
-    // Retry loop for this page
-    while (!success && retryCount <= maxRetries) {
-      try {
-        const response = await fetch(url, {
-          headers: { 'Accept': 'application/json' },
-          cache: 'no-store'
-        });
-        
-        // Handle rate limiting
-        if (response.status === 429) {
-          console.log(`⚠️ Rate limit hit for ${endpoint} page ${page}, waiting 3s...`);
-          await new Promise(resolve => setTimeout(resolve, 3000));
-          retryCount++;
-          continue;
-        }
-        
-        // Handle server errors (500, 502, 503, 504) with retry
-        if (response.status >= 500 && response.status < 600) {
-          retryCount++;
-          if (retryCount <= maxRetries) {
-            const waitTime = Math.min(1000 * Math.pow(2, retryCount - 1), 5000); // Exponential backoff, max 5s
-            console.log(`⚠️ API Error ${response.status} for ${endpoint} page ${page}, retry ${retryCount}/${maxRetries} in ${waitTime}ms...`);
-            await new Promise(resolve => setTimeout(resolve, waitTime));
-            continue;
-          } else {
-            console.error(`❌ API Error ${response.status} for ${url} after ${maxRetries} retries, skipping...`);
-            break; // Give up on this page
-          }
-        }
-        
-        // Handle other non-OK responses
-        if (!response.ok) {
-          console.error(`API Error ${response.status} for ${url}`);
-          break;
-        }
-        
-        const result = await response.json();
-        const data = result?.data || [];
-        
-        if (data.length > 0) {
-          allData = allData.concat(data);
-          
-          if (result.next_page_url) {
-            page++;
-            // Minimal delay since rate limit is now 500/min
-            await new Promise(resolve => setTimeout(resolve, 150));
-          } else {
-            hasMorePages = false;
-          }
-        } else {
-          hasMorePages = false;
-        }
-        
-        success = true; // Mark as successful
-        
-      } catch (error) {
-        retryCount++;
-        if (retryCount <= maxRetries) {
-          const waitTime = Math.min(1000 * Math.pow(2, retryCount - 1), 5000);
-          console.error(`⚠️ Network error for ${url}, retry ${retryCount}/${maxRetries} in ${waitTime}ms...`, error.message);
-          await new Promise(resolve => setTimeout(resolve, waitTime));
-        } else {
-          console.error(`❌ Error fetching ${url} after ${maxRetries} retries:`, error);
-          break;
-        }
-      }
-    }
-    
-    // If we failed all retries, move to next page or stop
-    if (!success) {
-      break;
-    }
-  }
-
-  return allData;
-}
 
 async function fetchClinics() {
   try {
@@ -176,6 +70,19 @@ export const dynamic = 'force-dynamic';
 export const runtime = 'nodejs';
 
 export async function GET(request) {
+  if (AGGREGATOR_URL) {
+    try {
+      const { search } = new URL(request.url);
+      const response = await fetch(`${AGGREGATOR_URL}/api/sales${search}`, { cache: 'no-store' });
+      if (response.ok) {
+        return NextResponse.json(await response.json());
+      }
+      console.error(`Aggregator error: ${response.status}, falling back to upstream fetch`);
+    } catch (error) {
+      console.error('Aggregator unreachable, falling back to upstream fetch:', error.message);
+    }
+  }
+
   try {
     // Get filter and period parameters from query params
     const { searchParams } = new URL(request.url);
@@ -336,59 +243,36 @@ async function fetchLeaderboardData(filter = 'daily', params = {}) {
       
       console.log(`📍 Processing ${clinicName} (ID: ${clinicId})...`);
 
-      // Fetch Products with error handling
-      const productParams = {
-        nama_cabang: clinicId,
-        dari_tanggal: startDateStr,
-        sampai_tanggal: endDateStr
-      };
-      
-      // Fetch Treatments (uses different parameter: klinik instead of nama_cabang)
-      const treatmentParams = {
-        klinik: clinicId,
-        dari_tanggal: startDateStr,
-        sampai_tanggal: endDateStr
-      };
+      // Products filter by nama_cabang, treatments by klinik; dates come from the day-range cache gaps
+      const productParams = { nama_cabang: clinicId };
+      const treatmentParams = { klinik: clinicId };
 
-      // Fetch SEQUENTIALLY with error handling
-      let products = [];
-      let treatments = [];
+      // Fetch SEQUENTIALLY with error handling, only the days not cached yet
+      let productAmount = 0;
+      let treatmentAmount = 0;
+      let fetchedGaps = false;
       
       try {
-        products = await fetchWithParams('laporan-penjualan-produk', productParams);
-        console.log(`   ✓ Products: ${products.length} records`);
+        const products = await fetchRangeTotal('laporan-penjualan-produk', productParams, 'total_bayar', startDateStr, endDateStr);
+        productAmount = products.total;
+        fetchedGaps = products.gaps.length > 0;
+        console.log(`   ✓ Products: ${products.records} records fetched for ${products.gaps.length} uncached range(s)`);
       } catch (error) {
         console.error(`   ✗ Products fetch failed for ${clinicName}:`, error.message);
       }
       
       // Minimal delay since rate limit is now 500/min
-      await new Promise(resolve => setTimeout(resolve, 200));
+      if (fetchedGaps) await new Promise(resolve => setTimeout(resolve, 200));
       
       try {
-        treatments = await fetchWithParams('laporan-penjualan-perawatan', treatmentParams);
-        console.log(`   ✓ Treatments: ${treatments.length} records`);
+        const treatments = await fetchRangeTotal('laporan-penjualan-perawatan', treatmentParams, 'total_pembayaran', startDateStr, endDateStr);
+        treatmentAmount = treatments.total;
+        console.log(`   ✓ Treatments: ${treatments.records} records fetched for ${treatments.gaps.length} uncached range(s)`);
       } catch (error) {
         console.error(`   ✗ Treatments fetch failed for ${clinicName}:`, error.message);
       }
 
-      // Aggregate Data based on filter
-      let totalAmount = 0;
-      let productAmount = 0;
-      let treatmentAmount = 0;
-
-      // Process Products
-      products.forEach(p => {
-        const amount = parseFloat(p.total_bayar || 0);
-        totalAmount += amount;
-        productAmount += amount;
-      });
-
-      // Process Treatments
-      treatments.forEach(t => {
-        const amount = parseFloat(t.total_pembayaran || 0);
-        totalAmount += amount;
-        treatmentAmount += amount;
-      });
+      const totalAmount = productAmount + treatmentAmount;
 
       leaderboard.push({
         id: clinicId,
@@ -0,0 +1,164 @@
+import os
+import sys
+import json
+import time
+import random
+import calendar
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import stand_in_api
+
+# Benchmark end-to-end compare_settlement_fixed (parse_csv_settlement -> fetch_api_data -> compare_data)
+# terhadap stand-in API lokal, tanpa menyentuh clinic.beautycenter.id.
+# Tiap ukuran dijalankan di proses terpisah supaya peak RSS tidak tercampur antar ukuran.
+
+NAMA_BULAN_CSV = {1: "Januari", 2: "Februari", 3: "Maret", 4: "April", 5: "Mei", 6: "Juni", 7: "Juli",
+                  8: "Agustus", 9: "September", 10: "Oktober", 11: "November", 12: "Desember"}
+MISMATCH_RATE = 0.1  # Porsi sel settlement yang sengaja dibuat beda dari POS
+
+def format_rupiah(value):
+    return "Rp " + f"{int(value):,}".replace(",", ".")
+
+def write_settlement_csv(path, datasets, year, month, seed=42):
+    """CSV settlement bentuk 'Dashboard All Branch' dari total stand-in, sebagian sel digeser supaya ada selisih"""
+    from compare_settlement_fixed import CABANG_MAPPING
+
+    totals = {}
+    for dataset in datasets.values():
+        for key, total in dataset.totals().items():
+            totals[key] = totals.get(key, 0.0) + total
+
+    rng = random.Random(seed)
+    days_in_month = calendar.monthrange(year, month)[1]
+    lines = [f"Dashboard All Branch {year} - {NAMA_BULAN_CSV[month]},,", ",,"]
+    lines.append(",".join(["Cabang", "Keterangan", "Target"] + [str(day) for day in range(1, days_in_month + 1)] + ["Total"]))
+    for nama_csv, nama_api in CABANG_MAPPING.items():
+        cells = []
+        for day in range(1, days_in_month + 1):
+            value = totals.get((nama_api, f"{year}-{month:02d}-{day:02d}"), 0.0)
+            if rng.random() < MISMATCH_RATE:
+                value += rng.randint(-20, 20) * 5000
+            cells.append(f'"{format_rupiah(value)}"' if value > 0 else "")
+        lines.append(",".join([nama_csv, "", ""] + cells + [""]))
+    lines.append(",".join(["revenue", "", ""] + [""] * days_in_month + [""]))
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # ru_maxrss dalam KB di Linux
+
+def run_stages(args):
+    """Dijalankan di proses anak: tiga stage pipeline, hasil dicetak sebagai satu baris JSON"""
+    os.environ["CLINIC_API_BASE_URL"] = args.base_url
+    import api_client
+    import compare_settlement_fixed as cs
+
+    api_client.response_cache.enabled = False
+    if args.rate_limit:
+        api_client.limiter = api_client.TokenBucket(args.rate_limit)
+    else:
+        api_client.limiter = api_client.TokenBucket(rate_per_minute=1e12, burst=1e9)
+
+    stages = {}
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        stage_start = time.perf_counter()
+        year, month = cs.detect_settlement_period(args.csv)
+        csv_data = cs.parse_csv_settlement(args.csv, year, month)
+        stages['parse_csv_settlement'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        api_data = cs.fetch_api_data(year=year, month=month, store_path=args.store_path)
+        stages['fetch_api_data'] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        cs.compare_data(csv_data, api_data)
+        stages['compare_data'] = time.perf_counter() - stage_start
+    wall = time.perf_counter() - start
+
+    print(json.dumps({
+        'wall': wall,
+        'stages': stages,
+        'requests': api_client.request_count,
+        'requests_per_second': api_client.request_count / stages['fetch_api_data'] if stages['fetch_api_data'] else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+        'api_total': sum(total for per_day in api_data.values() for total in per_day.values()),
+    }))
+
+def run_size(transactions, args):
+    """Satu ukuran: stand-in + CSV disiapkan di proses ini, pipeline diukur di proses anak"""
+    datasets = stand_in_api.build_datasets(transactions, args.year, args.month)
+    expected_total = sum(sum(dataset.totals().values()) for dataset in datasets.values())
+    options = {
+        'latency': args.latency_ms / 1000,
+        'error_429': args.error_429,
+        'error_5xx': args.error_5xx,
+        'per_page': args.per_page,
+    }
+    base_url, server = stand_in_api.start_process(transactions, args.year, args.month, **options)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        csv_path = os.path.join(workdir, f"Dashboard All Branch {args.year} - {NAMA_BULAN_CSV[args.month]}.csv")
+        write_settlement_csv(csv_path, datasets, args.year, args.month)
+        command = [sys.executable, os.path.abspath(__file__), "--child", "--csv", csv_path, "--base-url", base_url,
+                   "--rate-limit", str(args.rate_limit)]
+        if args.store:
+            command += ["--store-path", os.path.join(workdir, "transaksi.db")]
+        try:
+            output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=workdir).stdout
+        finally:
+            server.terminate()
+            server.join()
+
+    result = json.loads(output.strip().splitlines()[-1])
+    result['transactions'] = transactions
+    result['expected_total'] = expected_total
+    result['match'] = abs(result['api_total'] - expected_total) < 0.01
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline settlement vs POS terhadap stand-in API lokal")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Jumlah transaksi per run")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=12)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency stand-in per request")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Peluang response 429 (0-1)")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="Peluang response 503 (0-1)")
+    parser.add_argument("--per-page", type=int, default=stand_in_api.PER_PAGE)
+    parser.add_argument("--rate-limit", type=float, default=0, help="Request/menit di client (0 = tanpa limit, 500 = limit upstream)")
+    parser.add_argument("--store", action="store_true", help="Pakai store SQLite (fetch_api_data default) di direktori sementara")
+    parser.add_argument("--json", help="Simpan hasil lengkap ke file JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--csv", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    parser.add_argument("--store-path", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_stages(args)
+        return
+
+    print(f"{'Transaksi':>10} {'Wall (s)':>9} {'Parse':>7} {'Fetch':>8} {'Compare':>8} {'Request':>8} {'Req/s':>7} {'RSS (MB)':>9}  Match")
+    print("=" * 86)
+    results = []
+    for transactions in args.sizes:
+        result = run_size(transactions, args)
+        results.append(result)
+        stages = result['stages']
+        print(f"{transactions:>10,} {result['wall']:>9.2f} {stages['parse_csv_settlement']:>7.3f} {stages['fetch_api_data']:>8.2f} "
+              f"{stages['compare_data']:>8.3f} {result['requests']:>8,} {result['requests_per_second']:>7.0f} "
+              f"{result['peak_rss_mb']:>9.1f}  {'✓' if result['match'] else '✗'}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nHasil disimpan ke {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,326 @@
+import os
+import json
+import time
+import random
+import calendar
+import argparse
+import threading
+import multiprocessing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+
+# Stand-in lokal untuk API clinic.beautycenter.id (laporan-penjualan-produk, laporan-penjualan-perawatan, klinik).
+# Bentuk record dan pagination (Laravel simplePaginate) mengikuti getlaporanpembayaran.json / getlaporanperawatan.json.
+# Data disimpan kolumnar (NumPy), dict record baru dibuat per halaman, jadi 1 juta transaksi tetap ringan.
+# Urutan halaman seperti API asli: produk terbaru dulu (id turun), perawatan urut abjad nama_pembeli.
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+KLINIK_FILE = os.path.join(REPO_DIR, "getklinik.json")
+
+PER_PAGE = 15  # Sama dengan per_page API asli
+FIRST_PRODUK_ID = 20000
+N_PASIEN = 5000  # Jumlah nama pasien sintetis ("Pasien 0" .. "Pasien 4999")
+# Peringkat abjad tiap nama pasien, untuk urutan nama_pembeli perawatan ("Pasien 10" sebelum "Pasien 2")
+NAME_RANK = np.argsort(np.argsort(np.array([f"Pasien {n}" for n in range(N_PASIEN)])))
+
+METODE_PEMBAYARAN = ["TUNAI", "QRIS BSI", "EDC BRI", "EDC BCA", "TRANSFER BCA"]
+NAMA_KASIR = ["Dea Yuni Widiastuti", "Rina Kartika", "Siti Nurhaliza", "Ayu Lestari"]
+NAMA_PRODUK = ["HB dosting", "Serum Vit C", "Sunscreen SPF 50", "Toner Acne", "Night Cream", "Facial Wash"]
+NAMA_TREATMENT = ["Facial White (BC)", "Charcoal Peel Off Mask", "Meso Whitening (BC)", "PDT Biolight (BC)", "Chemical Peeling"]
+
+def load_clinics():
+    with open(KLINIK_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+class Dataset:
+    """Transaksi sintetis satu bulan untuk satu endpoint; disimpan urut terbaru dulu, perawatan dilayani urut nama"""
+
+    def __init__(self, endpoint, n, year, month, clinics, seed):
+        rng = np.random.default_rng(seed)
+        days_in_month = calendar.monthrange(year, month)[1]
+        self.endpoint = endpoint
+        self.year, self.month = year, month
+        self.clinics = clinics
+        self.day = np.sort(rng.integers(1, days_in_month + 1, n))[::-1].copy()
+        self.clinic = rng.integers(0, len(clinics), n)
+        self.amount = rng.integers(1, 100, n) * 5000  # Rupiah bulat seperti data asli
+        self.variant = rng.integers(0, 1 << 30, n)  # Sumber field deskriptif (metode, kasir, item, pasien)
+        self.ids = FIRST_PRODUK_ID + n - np.arange(n)
+        self.by_clinic = {}
+        self.by_name = {}  # (dari, sampai, klinik) -> index baris urut nama_pembeli (perawatan)
+        self.deleted = []  # id yang sudah dihapus
+        self.lock = threading.RLock()
+
+    def insert(self, count, rng=None):
+        """Transaksi baru di atas (hari terakhir, id berikutnya), seperti kasir yang masih input saat walk berjalan"""
+        rng = rng or np.random.default_rng()
+        with self.lock:
+            next_id = int(self.ids[0]) + 1 if len(self.ids) else FIRST_PRODUK_ID
+            self.day = np.concatenate([np.full(count, self.day.max() if len(self.day) else 1), self.day])
+            self.clinic = np.concatenate([rng.integers(0, len(self.clinics), count), self.clinic])
+            self.amount = np.concatenate([rng.integers(1, 100, count) * 5000, self.amount])
+            self.variant = np.concatenate([rng.integers(0, 1 << 30, count), self.variant])
+            self.ids = np.concatenate([next_id + count - 1 - np.arange(count), self.ids])
+            self.by_clinic = {}
+            self.by_name = {}
+
+    def delete(self, count, rng=None, newest=None):
+        """Hapus `count` transaksi acak (void kasir), opsional hanya dari `newest` baris terbaru; return id yang dihapus"""
+        rng = rng or np.random.default_rng()
+        with self.lock:
+            window = min(newest or len(self.ids), len(self.ids))
+            rows = rng.choice(window, min(count, window), replace=False)
+            deleted = [int(i) for i in self.ids[rows]]
+            self.deleted.extend(deleted)
+            for name in ('day', 'clinic', 'amount', 'variant', 'ids'):
+                setattr(self, name, np.delete(getattr(self, name), rows))
+            self.by_clinic = {}
+            self.by_name = {}
+        return deleted
+
+    def rows_for(self, clinic_id=None):
+        """Index baris (opsional hanya satu klinik), urut terbaru dulu"""
+        if clinic_id is None:
+            return None
+        with self.lock:
+            if clinic_id not in self.by_clinic:
+                code = next((i for i, c in enumerate(self.clinics) if c['id'] == clinic_id), -1)
+                self.by_clinic[clinic_id] = np.flatnonzero(self.clinic == code)
+            return self.by_clinic[clinic_id]
+
+    def select(self, dari_tanggal, sampai_tanggal, clinic_id=None):
+        """Index baris dalam rentang tanggal (string YYYY-MM-DD)"""
+        rows = self.rows_for(clinic_id)
+        days = self.day if rows is None else self.day[rows]
+        prefix = f"{self.year}-{self.month:02d}"
+        first = int(dari_tanggal[8:10]) if dari_tanggal[:7] == prefix else (1 if dari_tanggal[:7] < prefix else 99)
+        last = int(sampai_tanggal[8:10]) if sampai_tanggal[:7] == prefix else (99 if sampai_tanggal[:7] > prefix else 0)
+        # days urut turun: pakai searchsorted pada nilai negatif
+        start = np.searchsorted(-days, -last, side='left')
+        stop = np.searchsorted(-days, -first, side='right')
+        index = np.arange(start, stop)
+        return index if rows is None else rows[index]
+
+    def ordered(self, dari_tanggal, sampai_tanggal, clinic_id=None):
+        """Index baris dalam urutan halaman API: produk terbaru dulu, perawatan abjad nama_pembeli
+        (stabil, jadi nama yang sama tetap terbaru dulu). Urutan perawatan di-cache sampai ada insert"""
+        with self.lock:
+            rows = self.select(dari_tanggal, sampai_tanggal, clinic_id)
+            if 'perawatan' not in self.endpoint:
+                return rows
+            key = (dari_tanggal, sampai_tanggal, clinic_id)
+            if key not in self.by_name:
+                self.by_name[key] = rows[np.argsort(NAME_RANK[self.variant[rows] % N_PASIEN], kind='stable')]
+            return self.by_name[key]
+
+    def record(self, i):
+        tanggal = f"{self.year}-{self.month:02d}-{int(self.day[i]):02d}"
+        variant = int(self.variant[i])
+        nama_clinic = self.clinics[int(self.clinic[i])]['nama_clinic']
+        amount = f"{int(self.amount[i])}.00"
+        metode = METODE_PEMBAYARAN[variant % len(METODE_PEMBAYARAN)]
+        no_telp = f"628{variant % 10**10:010d}"
+        if 'produk' in self.endpoint:
+            return {
+                'id': int(self.ids[i]),
+                'tanggal_transaksi': tanggal,
+                'nama_pasien': f"Pasien {variant % N_PASIEN}",
+                'no_rm': f"288BC{variant % N_PASIEN:09d}",
+                'no_telp': no_telp,
+                'nama_clinic': nama_clinic,
+                'tunai': amount if metode == "TUNAI" else "0.00",
+                'total_bayar': amount,
+                'nomor_transaksi': f"P.{int(self.ids[i])}",
+                'metode_pembayaran': metode,
+                'nama_kasir': NAMA_KASIR[(variant >> 4) % len(NAMA_KASIR)],
+                'created_at': f"{tanggal} {(variant >> 8) % 12 + 8:02d}:{(variant >> 12) % 60:02d}:00",
+                'nama_produk': NAMA_PRODUK[(variant >> 16) % len(NAMA_PRODUK)],
+            }
+        potongan = (variant >> 4) % 5 * 10000
+        tax_total = round(int(self.amount[i]) * 0.11)
+        return {
+            'nama_pembeli': f"Pasien {variant % N_PASIEN}",
+            'no_telp': no_telp,
+            'tax_total': f"{tax_total}.00",
+            'total_pembayaran': amount,
+            'nama_clinic': nama_clinic,
+            'created_at': tanggal,
+            'metode_pembayaran': metode,
+            'potongan': f"{potongan}.00",
+            'final_pembayaran': f"{int(self.amount[i]) - potongan + tax_total}.00",
+            'nama_treatment': ", ".join(NAMA_TREATMENT[:(variant >> 16) % 3 + 1]),
+        }
+
+    def totals(self):
+        """Total per (nama_clinic, tanggal) untuk verifikasi / membuat CSV settlement"""
+        days_in_month = calendar.monthrange(self.year, self.month)[1]
+        keys = self.clinic.astype(np.int64) * (days_in_month + 1) + self.day
+        sums = np.bincount(keys, weights=self.amount, minlength=len(self.clinics) * (days_in_month + 1))
+        result = {}
+        for key in np.flatnonzero(sums):
+            clinic, day = divmod(int(key), days_in_month + 1)
+            result[(self.clinics[clinic]['nama_clinic'], f"{self.year}-{self.month:02d}-{day:02d}")] = float(sums[key])
+        return result
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, datasets, clinics, latency=0.0, error_429=0.0, error_5xx=0.0, per_page=PER_PAGE, seed=0,
+                 insert_rate=0.0, delete_rate=0.0):
+        super().__init__(address, StandInHandler)
+        self.datasets = datasets
+        self.clinics = clinics
+        self.latency = latency
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.per_page = per_page
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.request_count = 0
+        self.insert_rate = insert_rate  # Transaksi baru per detik, produk & perawatan (uji pergeseran batas halaman)
+        self.inserted = 0
+        self.delete_rate = delete_rate  # Transaksi dihapus per detik, di posisi acak (void)
+        self.deleted = 0
+        self.started = time.monotonic()
+        self.insert_rng = np.random.default_rng(seed)
+
+    def apply_inserts(self):
+        """Tambahkan transaksi yang 'masuk' (dan hapus yang di-void) sejak request terakhir, dibagi acak ke produk dan perawatan"""
+        if not self.insert_rate and not self.delete_rate:
+            return
+        with self.random_lock:
+            elapsed = time.monotonic() - self.started
+            due = int(elapsed * self.insert_rate) - self.inserted
+            if due > 0:
+                produk = int(self.insert_rng.binomial(due, 0.5))
+                for endpoint, count in (('laporan-penjualan-produk', produk), ('laporan-penjualan-perawatan', due - produk)):
+                    if count:
+                        self.datasets[endpoint].insert(count, self.insert_rng)
+                self.inserted += due
+            due = int(elapsed * self.delete_rate) - self.deleted
+            if due > 0:
+                produk = int(self.insert_rng.binomial(due, 0.5))
+                for endpoint, count in (('laporan-penjualan-produk', produk), ('laporan-penjualan-perawatan', due - produk)):
+                    if count:
+                        self.datasets[endpoint].delete(count, self.insert_rng)
+                self.deleted += due
+
+    def roll(self):
+        with self.random_lock:
+            self.request_count += 1
+            return self.random.random()
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, sama seperti upstream
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query))
+        endpoint = parts.path.rstrip('/').rsplit('/', 1)[-1]
+
+        if server.latency:
+            time.sleep(server.latency)
+        roll = server.roll()
+        if roll < server.error_429:
+            return self.send_json(429, {'message': 'Too Many Attempts.'})
+        if roll < server.error_429 + server.error_5xx:
+            return self.send_json(503, {'message': 'Service Unavailable'})
+
+        if endpoint == 'klinik':
+            return self.send_json(200, server.clinics)
+        server.apply_inserts()
+        dataset = server.datasets.get(endpoint)
+        if dataset is None:
+            return self.send_json(404, {'message': 'Not Found'})
+
+        clinic_id = query.get('nama_cabang') or query.get('klinik')
+        page = max(int(query.get('page', 1)), 1)
+        start = (page - 1) * server.per_page
+        with dataset.lock:  # Satu snapshot data per response walau ada insert
+            rows = dataset.ordered(
+                query.get('dari_tanggal', '0000-00-00'),
+                query.get('sampai_tanggal', '9999-99-99'),
+                int(clinic_id) if clinic_id else None,
+            )
+            chunk = rows[start:start + server.per_page]
+            data = [dataset.record(i) for i in chunk]
+        base = f"http://{self.headers.get('Host')}{parts.path}"
+        self.send_json(200, {
+            'current_page': page,
+            'data': data,
+            'first_page_url': f"{base}?page=1",
+            'from': start + 1 if len(chunk) else None,
+            'next_page_url': f"{base}?page={page + 1}" if start + server.per_page < len(rows) else None,
+            'path': base,
+            'per_page': server.per_page,
+            'prev_page_url': f"{base}?page={page - 1}" if page > 1 else None,
+            'to': start + len(chunk) if len(chunk) else None,
+        })
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def build_datasets(transactions, year, month, seed=42):
+    """Dataset produk + perawatan, total `transactions` record dibagi dua endpoint"""
+    clinics = load_clinics()
+    return {
+        'laporan-penjualan-produk': Dataset('laporan-penjualan-produk', transactions // 2, year, month, clinics, seed),
+        'laporan-penjualan-perawatan': Dataset('laporan-penjualan-perawatan', transactions - transactions // 2, year, month, clinics, seed + 1),
+    }
+
+def create_server(transactions, year=2025, month=12, port=0, seed=42, **options):
+    """Server stand-in (belum jalan); base URL API: f'http://127.0.0.1:{server.server_address[1]}/api'"""
+    return StandInServer(('127.0.0.1', port), build_datasets(transactions, year, month, seed), load_clinics(), seed=seed, **options)
+
+def serve(transactions, year, month, seed, options, ready):
+    server = create_server(transactions, year, month, seed=seed, **options)
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+def start_process(transactions, year=2025, month=12, seed=42, **options):
+    """Jalankan stand-in di proses terpisah (tidak rebutan GIL dengan client); return (base_url, process)"""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve, args=(transactions, year, month, seed, options, ready), daemon=True)
+    process.start()
+    port = ready.get(timeout=120)
+    return f"http://127.0.0.1:{port}/api", process
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in lokal API clinic.beautycenter.id")
+    parser.add_argument("--transactions", type=int, default=10_000, help="Jumlah transaksi (produk + perawatan)")
+    parser.add_argument("--year", type=int, default=2025)
+    parser.add_argument("--month", type=int, default=12)
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latency per request")
+    parser.add_argument("--error-429", type=float, default=0.0, help="Peluang response 429 (0-1)")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="Peluang response 503 (0-1)")
+    parser.add_argument("--per-page", type=int, default=PER_PAGE)
+    parser.add_argument("--insert-rate", type=float, default=0.0, help="Transaksi baru per detik (produk & perawatan) selama server jalan")
+    parser.add_argument("--delete-rate", type=float, default=0.0, help="Transaksi dihapus (void) per detik selama server jalan")
+    args = parser.parse_args()
+
+    server = create_server(
+        args.transactions, args.year, args.month, port=args.port,
+        latency=args.latency_ms / 1000, error_429=args.error_429, error_5xx=args.error_5xx, per_page=args.per_page,
+        insert_rate=args.insert_rate, delete_rate=args.delete_rate,
+    )
+    print(f">> Stand-in API jalan di http://127.0.0.1:{server.server_address[1]}/api ({args.transactions:,} transaksi)")
+    print(f"   Pakai: CLINIC_API_BASE_URL=http://127.0.0.1:{server.server_address[1]}/api python compare_settlement_fixed.py ...")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
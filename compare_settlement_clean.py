@@ -1,5 +1,5 @@
 import pandas as pd
-import requests
+from api_client import get_json
 import json
 from datetime import datetime
 import re
@@ -96,13 +96,10 @@ def fetch_api_data(year=2025, month=12):
             while page <= max_pages:
                 try:
                     url = f"{endpoint}&page={page}" if "?" in endpoint else f"{endpoint}?page={page}"
-                    response = requests.get(url, timeout=30)
-                    
-                    if response.status_code != 200:
-                        print(f"     Error: status {response.status_code}")
+                    result = get_json(url)
+                    if result is None:
                         break
-                        
-                    result = response.json()
+                    
                     data = result.get('data', [])
                     
                     if not data:
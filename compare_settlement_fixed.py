@@ -1,8 +1,22 @@
 import pandas as pd
-import requests
+import numpy as np
 import json
 from datetime import datetime
 import re
+import os
+import calendar
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import api_client
+from api_client import MAX_CONCURRENCY
+from range_sharding import iter_sharded_pages
+from aggregation import StreamingAggregator
+from transaction_store import TransactionStore, DEFAULT_DB_PATH, sync_endpoint
+from customer_index import CustomerIndex
+from metrics import metrics
+from profiling import StageProfiler, default_output_dir
+from reconciliation import reconcile, KATEGORI_BEAUTY_CENTER, KATEGORI_KLINIK
+from gap_attribution import attribute_cells, render_attribution
 
 # Mapping nama cabang dari CSV ke nama API (FIXED - sesuai dengan nama di API)
 # PERHATIAN: Beberapa nama di CSV ada SPASI di akhir!
@@ -39,195 +53,195 @@ def clean_currency(value):
     except:
         return 0
 
-def parse_csv_settlement(file_path):
+# Nama bulan (Indonesia & Inggris) untuk deteksi periode dari header sheet / nama file
+NAMA_BULAN = {
+    'januari': 1, 'january': 1, 'jan': 1,
+    'februari': 2, 'february': 2, 'feb': 2,
+    'maret': 3, 'march': 3, 'mar': 3,
+    'april': 4, 'apr': 4,
+    'mei': 5, 'may': 5,
+    'juni': 6, 'june': 6, 'jun': 6,
+    'juli': 7, 'july': 7, 'jul': 7,
+    'agustus': 8, 'august': 8, 'agu': 8, 'aug': 8,
+    'september': 9, 'sep': 9,
+    'oktober': 10, 'october': 10, 'okt': 10, 'oct': 10,
+    'november': 11, 'nov': 11,
+    'desember': 12, 'december': 12, 'des': 12, 'dec': 12,
+}
+BULAN_PATTERN = re.compile(r"\b(" + "|".join(sorted(NAMA_BULAN, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+TAHUN_PATTERN = re.compile(r"\b(20\d{2})\b")
+
+DAY_COLUMN_OFFSET = 3  # Kolom tanggal 1 ada di index 3
+CURRENCY_NOISE = r"Rp|[,.\s]"  # Sama dengan yang dibuang clean_currency
+
+def detect_settlement_period(file_path):
+    """Deteksi (tahun, bulan) dari 2 baris header sheet, fallback ke nama file"""
+    with open(file_path, encoding='utf-8-sig', errors='replace') as f:
+        header = f.readline() + f.readline()
+    nama_file = os.path.basename(file_path)
+    
+    year = month = None
+    for text in (header, nama_file):
+        if month is None and BULAN_PATTERN.search(text):
+            month = NAMA_BULAN[BULAN_PATTERN.search(text).group(1).lower()]
+        if year is None and TAHUN_PATTERN.search(text):
+            year = int(TAHUN_PATTERN.search(text).group(1))
+    
+    if year is None or month is None:
+        raise ValueError(f"Tidak bisa mendeteksi bulan/tahun settlement dari header atau nama file: {file_path}")
+    return year, month
+
+def clean_currency_values(values):
+    """Versi vectorized clean_currency: bersihkan format Rupiah satu array sekaligus"""
+    values = pd.Series(values, dtype=object)
+    cleaned = values.str.replace(CURRENCY_NOISE, '', regex=True)  # Non-string (angka/NaN) jadi NaN
+    numbers = pd.to_numeric(cleaned.where(cleaned.notna(), values), errors='coerce')
+    return numbers.fillna(0).to_numpy(dtype=float)
+
+def parse_settlement_long(file_path, year=None, month=None):
+    """Parse CSV settlement ke tabel panjang (cabang, tanggal, amount), hanya amount > 0"""
+    if year is None or month is None:
+        year, month = detect_settlement_period(file_path)
+    days_in_month = calendar.monthrange(year, month)[1]
+    
+    df = pd.read_csv(file_path, skiprows=2)
+    df_cabang = df[df.iloc[:, 0].notna() & (df.iloc[:, 0] != 'revenue')]
+    cabang = df_cabang.iloc[:, 0].map(lambda c: CABANG_MAPPING.get(c, c)).to_numpy(dtype=object)
+    
+    # Semua sel tanggal dibersihkan sekaligus (row-major: cabang x hari), lalu di-melt ke bentuk panjang
+    day_columns = df_cabang.iloc[:, DAY_COLUMN_OFFSET:DAY_COLUMN_OFFSET + days_in_month]
+    n_days = day_columns.shape[1]
+    amounts = clean_currency_values(day_columns.to_numpy(dtype=object).ravel())
+    
+    tanggal_bulan = np.array([f"{year}-{month:02d}-{day:02d}" for day in range(1, n_days + 1)], dtype=object)
+    mask = amounts > 0
+    return pd.DataFrame({
+        'cabang': np.repeat(cabang, n_days)[mask],
+        'tanggal': np.tile(tanggal_bulan, len(cabang))[mask],
+        'amount': amounts[mask],
+    })
+
+def parse_settlement_files(file_paths):
+    """Parse banyak file settlement (mis. 12 sheet setahun) jadi satu tabel panjang"""
+    frames = [parse_settlement_long(file_path) for file_path in file_paths]
+    if not frames:
+        return pd.DataFrame(columns=['cabang', 'tanggal', 'amount'])
+    return pd.concat(frames, ignore_index=True)
+
+def parse_csv_settlement(file_path, year=None, month=None):
     """Parse CSV settlement dan ekstrak data omset per cabang per tanggal"""
     df = pd.read_csv(file_path, skiprows=2)
-    df_cabang = df[df.iloc[:, 0].notna() & (df.iloc[:, 0] != 'revenue')].copy()
+    cabang_csv = df.iloc[:, 0]
+    cabang_csv = cabang_csv[cabang_csv.notna() & (cabang_csv != 'revenue')]
     
     print("=== Nama cabang di CSV ===")
-    for idx, row in df_cabang.iterrows():
-        cabang_csv = row.iloc[0]
-        if cabang_csv != 'revenue' and pd.notna(cabang_csv):
-            print(f"   - '{cabang_csv}'")
+    for nama in cabang_csv:
+        print(f"   - '{nama}'")
     print()
     
     data = {}
-    for idx, row in df_cabang.iterrows():
-        cabang_csv = row.iloc[0]
-        if cabang_csv == 'revenue' or pd.isna(cabang_csv):
-            continue
-            
-        cabang_api = CABANG_MAPPING.get(cabang_csv, cabang_csv)
-        print(f"   Mapping: '{cabang_csv}' -> '{cabang_api}'")
+    for nama in cabang_csv:
+        cabang_api = CABANG_MAPPING.get(nama, nama)
+        print(f"   Mapping: '{nama}' -> '{cabang_api}'")
         data[cabang_api] = {}
-        
-        for day in range(1, 32):
-            col_idx = day + 2
-            if col_idx < len(row):
-                value = clean_currency(row.iloc[col_idx])
-                if value > 0:
-                    tanggal = f"2025-12-{day:02d}"
-                    data[cabang_api][tanggal] = value
+    
+    long = parse_settlement_long(file_path, year, month)
+    for cabang, tanggal, amount in zip(long['cabang'], long['tanggal'], long['amount']):
+        data[cabang][tanggal] = float(amount)
     
     return data
 
-def fetch_api_data(year=2025, month=12):
-    """Fetch data dari API untuk bulan tertentu"""
-    all_data = []
+def fetch_api_data(year=2025, month=12, max_workers=MAX_CONCURRENCY, store_path=DEFAULT_DB_PATH, update_customers=False):
+    """Fetch data dari API untuk bulan tertentu (store_path=None untuk fetch penuh tanpa store lokal).
+    update_customers: ikut update index pelanggan (customer_index) per halaman yang di-sync"""
     year_month = f"{year}-{month:02d}"
     dari_tanggal = f"{year}-{month:02d}-01"
-    sampai_tanggal = f"{year}-{month:02d}-31" if month == 12 else f"{year}-{month:02d}-30"
+    sampai_tanggal = f"{year}-{month:02d}-{calendar.monthrange(year, month)[1]:02d}"
+    params = {'dari_tanggal': dari_tanggal, 'sampai_tanggal': sampai_tanggal}
     
     endpoints = [
-        f"https://clinic.beautycenter.id/api/laporan-penjualan-perawatan?dari_tanggal={dari_tanggal}&sampai_tanggal={sampai_tanggal}",
-        f"https://clinic.beautycenter.id/api/laporan-penjualan-produk?dari_tanggal={dari_tanggal}&sampai_tanggal={sampai_tanggal}",
+        "laporan-penjualan-perawatan",
+        "laporan-penjualan-produk",
     ]
     
-    data_perawatan = []
-    data_produk = []
-    
-    for endpoint in endpoints:
+    if store_path:
+        print(f">> Sync store lokal {store_path} ({dari_tanggal} s/d {sampai_tanggal})")
+        store = TransactionStore(store_path)
         try:
-            print(f">> Mencoba endpoint: {endpoint}")
-            page = 1
-            max_pages = 200
-            endpoint_data = []
-            
-            while page <= max_pages:
+            customers = CustomerIndex(store) if update_customers else None
+            with ThreadPoolExecutor(max_workers=len(endpoints)) as pool:
+                futures = {
+                    endpoint: pool.submit(sync_endpoint, store, endpoint, params, max_workers, customers)
+                    for endpoint in endpoints
+                }
+            for endpoint, future in futures.items():
                 try:
-                    url = f"{endpoint}&page={page}" if "?" in endpoint else f"{endpoint}?page={page}"
-                    response = requests.get(url, timeout=30)
-                    
-                    if response.status_code != 200:
-                        print(f"   ❌ Error: status {response.status_code}")
-                        break
-                        
-                    result = response.json()
-                    data = result.get('data', [])
-                    
-                    if not data:
-                        break
-                        
-                    endpoint_data.extend(data)
-                    print(f"   Page {page}: {len(data)} records")
-                    
-                    if not result.get('next_page_url'):
-                        break
-                        
-                    page += 1
-                    
+                    future.result()
                 except Exception as e:
-                    print(f"   ❌ Error fetching page {page}: {e}")
-                    break
-            
-            if endpoint_data:
-                if "perawatan" in endpoint:
-                    data_perawatan = endpoint_data
-                    print(f"   ✅ Total {len(endpoint_data)} transaksi perawatan\n")
-                else:
-                    data_produk = endpoint_data
-                    print(f"   ✅ Total {len(endpoint_data)} transaksi produk\n")
-                    
+                    print(f"❌ Error sync endpoint {endpoint}: {e}")
+            print()
+            with metrics.stage('aggregation'):
+                return store.aggregate(dari_tanggal, sampai_tanggal, endpoints)
+        finally:
+            store.close()
+    
+    print(f">> Fetch paralel {', '.join(endpoints)} ({dari_tanggal} s/d {sampai_tanggal}, max {max_workers} request/endpoint)")
+    
+    # Rentang dipecah per hari dan di-fetch paralel; halaman langsung masuk akumulator per (cabang, tanggal)
+    aggregator = StreamingAggregator(year_month)
+    with ThreadPoolExecutor(max_workers=len(endpoints)) as pool:
+        futures = {
+            endpoint: pool.submit(aggregator.consume, endpoint, iter_sharded_pages(endpoint, params, max_workers=max_workers))
+            for endpoint in endpoints
+        }
+    
+    for endpoint, future in futures.items():
+        try:
+            count = future.result()
         except Exception as e:
             print(f"❌ Error dengan endpoint {endpoint}: {e}\n")
             continue
+        
+        if count:
+            jenis = "perawatan" if "perawatan" in endpoint else "produk"
+            print(f"   ✅ Total {count} transaksi {jenis}")
+    print()
     
-    all_data = data_perawatan + data_produk
-    
-    if not all_data:
+    jumlah_perawatan = aggregator.record_counts.get("laporan-penjualan-perawatan", 0)
+    jumlah_produk = aggregator.record_counts.get("laporan-penjualan-produk", 0)
+    if not jumlah_perawatan + jumlah_produk:
         print("❌ Tidak ada data yang berhasil di-fetch dari semua endpoint")
         return {}
     
-    print(f">> Total gabungan: {len(all_data)} transaksi (Perawatan: {len(data_perawatan)}, Produk: {len(data_produk)})\n")
-    
-    aggregated = {}
-    for record in all_data:
-        tanggal = record.get('tanggal_transaksi') or record.get('tanggal') or record.get('created_at', '')
-        if isinstance(tanggal, str) and ' ' in tanggal:
-            tanggal = tanggal.split(' ')[0]
-        
-        if not tanggal or not str(tanggal).startswith(year_month):
-            continue
-            
-        cabang = record.get('nama_clinic') or record.get('nama_klinik') or record.get('klinik', '')
-        total_bayar = float(record.get('total_bayar') or record.get('total') or record.get('nominal') or 0)
-        
-        if not cabang:
-            continue
-        
-        if cabang not in aggregated:
-            aggregated[cabang] = {}
-        if tanggal not in aggregated[cabang]:
-            aggregated[cabang][tanggal] = 0
-        
-        aggregated[cabang][tanggal] += total_bayar
-    
-    return aggregated
+    print(f">> Total gabungan: {jumlah_perawatan + jumlah_produk} transaksi (Perawatan: {jumlah_perawatan}, Produk: {jumlah_produk})\n")
+    # Mode streaming: agregasi per halaman jalan di thread fetch (StreamingAggregator.add_page), di sini hanya hasil akhirnya
+    with metrics.stage('aggregation'):
+        return aggregator.result()
 
 def compare_data(csv_data, api_data):
     """Bandingkan data CSV settlement dengan data API - FOKUS BEAUTY CENTER & RUMAH CANTIK"""
+    result = reconcile(csv_data, api_data)
+    render_comparison(result)
+    return result
+
+def render_comparison(result):
+    """Tampilkan hasil reconcile() (ringkasan per kategori + detail cabang yang beda > threshold)"""
     
     print("=" * 100)
     print("=== HASIL PERBANDINGAN DATA SETTLEMENT vs API POS ===")
     print("=" * 100)
     print()
     
-    all_cabang = set(csv_data.keys()) | set(api_data.keys())
-    
-    # Pisahkan Beauty Center/Rumah Cantik vs Klinik
-    beauty_center_cabang = [c for c in all_cabang if 'Beauty Center' in c or 'Rumah Cantik' in c or 'Rumah cantik' in c]
-    klinik_cabang = [c for c in all_cabang if 'Klinik' in c or 'Clinic' in c or 'Cinic' in c]
-    
-    total_csv_bc = 0
-    total_api_bc = 0
-    total_selisih_bc = 0
-    
-    total_csv_klinik = 0
-    total_api_klinik = 0
-    total_selisih_klinik = 0
-    
-    cabang_with_diff_bc = []
-    cabang_with_diff_klinik = []
+    beauty_center = result.category_totals[KATEGORI_BEAUTY_CENTER]
+    total_csv_bc, total_api_bc, total_selisih_bc = beauty_center['settlement'], beauty_center['pos'], beauty_center['selisih']
+    klinik = result.category_totals[KATEGORI_KLINIK]
+    total_csv_klinik, total_api_klinik, total_selisih_klinik = klinik['settlement'], klinik['pos'], klinik['selisih']
     
-    for cabang in sorted(all_cabang):
-        csv_cabang = csv_data.get(cabang, {})
-        api_cabang = api_data.get(cabang, {})
-        
-        total_csv_cabang = sum(csv_cabang.values())
-        total_api_cabang = sum(api_cabang.values())
-        selisih_cabang = total_csv_cabang - total_api_cabang
-        
-        is_beauty_center = cabang in beauty_center_cabang
-        is_klinik = cabang in klinik_cabang
-        
-        if is_beauty_center:
-            total_csv_bc += total_csv_cabang
-            total_api_bc += total_api_cabang
-            total_selisih_bc += selisih_cabang
-            
-            if abs(selisih_cabang) > 1000:
-                cabang_with_diff_bc.append({
-                    'cabang': cabang,
-                    'total_csv': total_csv_cabang,
-                    'total_api': total_api_cabang,
-                    'selisih': selisih_cabang
-                })
-        
-        elif is_klinik:
-            total_csv_klinik += total_csv_cabang
-            total_api_klinik += total_api_cabang
-            total_selisih_klinik += selisih_cabang
-            
-            if abs(selisih_cabang) > 1000:
-                cabang_with_diff_klinik.append({
-                    'cabang': cabang,
-                    'total_csv': total_csv_cabang,
-                    'total_api': total_api_cabang,
-                    'selisih': selisih_cabang
-                })
+    cabang_with_diff_bc = result.flagged_branches(KATEGORI_BEAUTY_CENTER)
+    cabang_with_diff_klinik = result.flagged_branches(KATEGORI_KLINIK)
     
     # TAMPILKAN RINGKASAN BEAUTY CENTER & RUMAH CANTIK
-    print(f"=== RINGKASAN BEAUTY CENTER & RUMAH CANTIK SAJA (Desember 2025) ===")
+    print(f"=== RINGKASAN BEAUTY CENTER & RUMAH CANTIK SAJA ({result.period}) ===")
     print(f"-" * 100)
     print(f"{'Total Settlement (CSV)':.<50} Rp {total_csv_bc:>20,.0f}")
     print(f"{'Total POS (API)':.<50} Rp {total_api_bc:>20,.0f}")
@@ -291,20 +305,71 @@ def compare_data(csv_data, api_data):
             print(f"   Selisih:          Rp {item['selisih']:>15,.0f}")
             print()
 
+DEFAULT_CSV_FILE = r"c:\Users\akuci\Downloads\Dashboard All Branch 2025 - Desember.csv"
+
 def main():
+    parser = argparse.ArgumentParser(description="Bandingkan data settlement (CSV) dengan data POS (API)")
+    parser.add_argument("csv_file", nargs="?", default=DEFAULT_CSV_FILE, help="File CSV settlement")
+    parser.add_argument("--refresh", action="store_true", help="Abaikan cache API di disk dan fetch ulang")
+    parser.add_argument("--no-cache", action="store_true", help="Jangan baca/tulis cache API di disk")
+    parser.add_argument("--metrics-json", help="Simpan ringkasan metrik run (JSON) ke file ini")
+    parser.add_argument("--metrics-prom", help="Simpan metrik format Prometheus (textfile collector) ke file ini")
+    parser.add_argument("--drill-down", action="store_true",
+                        help="Cari transaksi POS yang menjelaskan tiap selisih harian Beauty Center (dari store lokal)")
+    parser.add_argument("--customers", action="store_true",
+                        help="Sekalian update index pelanggan (customer_index) saat sync store lokal")
+    parser.add_argument("--profile", nargs="?", const=default_output_dir(), metavar="DIR",
+                        help="Profile tiap stage (cProfile .prof + collapsed stacks untuk flamegraph), default profiles/<waktu>")
+    args = parser.parse_args()
+    
+    api_client.response_cache.refresh = args.refresh
+    api_client.response_cache.enabled = not args.no_cache
+    
     print("=== Memulai Analisis Perbandingan Data Settlement vs API POS ===")
     print("    FOKUS: Beauty Center & Rumah Cantik\n")
     
-    csv_file = r"c:\Users\akuci\Downloads\Dashboard All Branch 2025 - Desember.csv"
+    csv_file = args.csv_file
+    
+    profiler = None
+    if args.profile:
+        profiler = StageProfiler(args.profile)
+        profiler.start()
     
     print("Parsing data CSV settlement...")
-    csv_data = parse_csv_settlement(csv_file)
-    print(f"Berhasil parse {len(csv_data)} cabang dari CSV\n")
+    with metrics.stage('parse_csv_settlement'):
+        year, month = detect_settlement_period(csv_file)
+        csv_data = parse_csv_settlement(csv_file, year, month)
+    print(f"Berhasil parse {len(csv_data)} cabang dari CSV ({year}-{month:02d})\n")
+    
+    with metrics.stage('fetch_api_data'):
+        api_data = fetch_api_data(year=year, month=month, update_customers=args.customers)
+    print(f"Berhasil fetch {len(api_data)} cabang dari API")
+    print(f"Cache API: {api_client.response_cache.hits} hit, {api_client.response_cache.misses} miss\n")
     
-    api_data = fetch_api_data(year=2025, month=12)
-    print(f"Berhasil fetch {len(api_data)} cabang dari API\n")
+    with metrics.stage('compare_data'):
+        result = compare_data(csv_data, api_data)
     
-    compare_data(csv_data, api_data)
+    if args.drill_down:
+        with metrics.stage('drill_down'):
+            store = TransactionStore(DEFAULT_DB_PATH)
+            try:
+                attribution = attribute_cells(store, result.flagged_cells(KATEGORI_BEAUTY_CENTER))
+            finally:
+                store.close()
+        print()
+        render_attribution(attribution)
+    
+    print()
+    metrics.print_summary()
+    if profiler:
+        files = profiler.stop()
+        print(f"   ✅ Profile disimpan di {args.profile} ({len(files)} file, flamegraph: combined.folded)")
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+        print(f"   ✅ Metrik JSON disimpan ke {args.metrics_json}")
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+        print(f"   ✅ Metrik Prometheus disimpan ke {args.metrics_prom}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,272 @@
+import re
+import argparse
+from datetime import date, timedelta
+
+from transaction_store import TransactionStore, DEFAULT_DB_PATH, ENDPOINT_TABLES, RecordKeys, record_date, record_amount
+
+# Index pelanggan lintas endpoint (produk & perawatan) di store SQLite yang sama.
+# Tiap transaksi dipetakan ke kunci pasien ternormalisasi (no_telp, no_rm, atau nama per cabang), lalu ringkasan
+# per (pasien, cabang) dijaga incremental, jadi retensi / repeat rate / CLV tidak perlu scan seluruh histori.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS customer_visits (
+    record_key TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    customer_key TEXT NOT NULL,
+    nama_clinic TEXT NOT NULL,
+    tanggal TEXT NOT NULL,
+    total REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (endpoint, record_key)
+);
+CREATE INDEX IF NOT EXISTS idx_customer_visits_customer ON customer_visits (customer_key, nama_clinic);
+CREATE INDEX IF NOT EXISTS idx_customer_visits_clinic_tanggal ON customer_visits (nama_clinic, tanggal);
+CREATE INDEX IF NOT EXISTS idx_customer_visits_endpoint_tanggal ON customer_visits (endpoint, tanggal);
+
+CREATE TABLE IF NOT EXISTS customer_alias (
+    alias TEXT PRIMARY KEY,
+    customer_key TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS customer_stats (
+    customer_key TEXT NOT NULL,
+    nama_clinic TEXT NOT NULL,
+    first_visit TEXT NOT NULL,
+    last_visit TEXT NOT NULL,
+    visit_days INTEGER NOT NULL,
+    transactions INTEGER NOT NULL,
+    total REAL NOT NULL,
+    PRIMARY KEY (customer_key, nama_clinic)
+);
+CREATE INDEX IF NOT EXISTS idx_customer_stats_clinic ON customer_stats (nama_clinic, first_visit);
+"""
+
+LOOKUP_BATCH = 500  # Jumlah parameter per SELECT ... IN (...), di bawah batas variabel SQLite
+
+REPEAT_MIN_VISITS = 2  # Pelanggan repeat = datang di minimal 2 hari berbeda di cabang yang sama
+
+def normalize_phone(value):
+    """'+62 857-4807-3226' / '6285748073226' / '85748073226' -> '085748073226', None kalau bukan nomor HP valid"""
+    digits = re.sub(r'\D', '', str(value or ''))
+    if digits.startswith('62'):
+        digits = '0' + digits[2:]
+    elif digits.startswith('8'):
+        digits = '0' + digits
+    if not digits.startswith('08') or not 10 <= len(digits) <= 13:
+        return None
+    if len(set(digits[2:])) <= 1:  # Nomor isian asal, mis. 08000000000
+        return None
+    return digits
+
+def normalize_rm(value):
+    rm = re.sub(r'\s+', '', str(value or '')).upper()
+    return rm if rm and rm != '-' else None
+
+def customer_keys(record, nama_clinic):
+    """Kandidat kunci pasien, urut prioritas: no_telp, no_rm, lalu nama (hanya berlaku di cabang itu)"""
+    keys = []
+    phone = normalize_phone(record.get('no_telp'))
+    if phone:
+        keys.append(f"telp:{phone}")
+    rm = normalize_rm(record.get('no_rm'))
+    if rm:
+        keys.append(f"rm:{rm}")
+    if not keys:
+        nama = ' '.join(str(record.get('nama_pembeli') or record.get('nama_pasien') or '').lower().split())
+        if nama and nama != '-':
+            keys.append(f"nama:{nama_clinic}|{nama}")
+    return keys
+
+class CustomerIndex:
+    """Kunjungan per pasien + ringkasan per (pasien, cabang), disimpan di koneksi TransactionStore"""
+
+    def __init__(self, store):
+        self.store = store
+        with store.lock, store.conn:
+            store.conn.executescript(SCHEMA)
+
+    def lookup(self, query, values, params=()):
+        """Jalankan 'query' (berakhiran IN ({})) per batch LOOKUP_BATCH nilai, return semua baris.
+        params: parameter sebelum IN (...)"""
+        values = list(values)
+        rows = []
+        for start in range(0, len(values), LOOKUP_BATCH):
+            batch = values[start:start + LOOKUP_BATCH]
+            rows.extend(self.store.conn.execute(query.format(', '.join('?' * len(batch))), (*params, *batch)).fetchall())
+        return rows
+
+    def resolve(self, keys, aliases, stored):
+        """Kunci kanonik: alias yang sudah dikenal dari kandidat mana pun, kalau tidak kandidat pertama.
+        Kandidat lain dicatat sebagai alias ke kunci itu (tidak ada merge dua pasien yang sudah terpisah).
+        aliases: alias baru di halaman ini; stored: alias dari customer_alias untuk kandidat halaman ini"""
+        known = [aliases[key] for key in keys if key in aliases]
+        if not known:
+            known = [stored[key] for key in keys if key in stored]
+        canonical = known[0] if known else keys[0]
+        for key in keys:
+            aliases.setdefault(key, canonical)
+        return canonical
+
+    def add(self, endpoint, records, keys=None):
+        """Masukkan satu halaman record (idempotent per record_key); return jumlah kunjungan yang tercatat.
+        keys: RecordKeys bersama lintas halaman satu sync, sama seperti TransactionStore.upsert"""
+        keys = keys or RecordKeys()
+        pending = []
+        for record in records:
+            nama_clinic = record.get('nama_clinic') or record.get('nama_klinik') or record.get('klinik')
+            candidates = customer_keys(record, nama_clinic) if nama_clinic else []
+            if candidates:
+                pending.append((keys(record), candidates, nama_clinic, record_date(record), record_amount(endpoint, record)))
+        if not pending:
+            return 0
+
+        rows = []
+        aliases = {}
+        with self.store.lock, self.store.conn:
+            conn = self.store.conn
+            # Alias dan kunjungan lama satu halaman diambil dengan beberapa SELECT IN, bukan satu query per record
+            stored = dict(self.lookup(
+                "SELECT alias, customer_key FROM customer_alias WHERE alias IN ({})",
+                {key for _, candidates, *_ in pending for key in candidates}))
+            for record_key, candidates, nama_clinic, tanggal, total in pending:
+                rows.append((record_key, endpoint, self.resolve(candidates, aliases, stored), nama_clinic, tanggal, total))
+
+            dirty = set(self.lookup(
+                "SELECT customer_key, nama_clinic FROM customer_visits WHERE endpoint = ? AND record_key IN ({})",
+                [row[0] for row in rows], (endpoint,)))
+            dirty.update((row[2], row[3]) for row in rows)
+            conn.executemany("INSERT OR IGNORE INTO customer_alias VALUES (?, ?)", aliases.items())
+            conn.executemany("INSERT OR REPLACE INTO customer_visits VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.refresh_stats(dirty)
+        return len(rows)
+
+    def delete_range(self, endpoint, dari_tanggal, sampai_tanggal):
+        """Pasangan dengan TransactionStore.delete_range (hari yang di-fetch ulang)"""
+        with self.store.lock, self.store.conn:
+            conn = self.store.conn
+            dirty = set(conn.execute(
+                "SELECT DISTINCT customer_key, nama_clinic FROM customer_visits "
+                "WHERE endpoint = ? AND tanggal BETWEEN ? AND ?", (endpoint, dari_tanggal, sampai_tanggal)).fetchall())
+            conn.execute("DELETE FROM customer_visits WHERE endpoint = ? AND tanggal BETWEEN ? AND ?",
+                         (endpoint, dari_tanggal, sampai_tanggal))
+            self.refresh_stats(dirty)
+
+    def refresh_stats(self, pairs):
+        """Hitung ulang ringkasan hanya untuk (pasien, cabang) yang berubah (pakai index customer_key)"""
+        pairs = list(pairs)
+        self.store.conn.executemany("DELETE FROM customer_stats WHERE customer_key = ? AND nama_clinic = ?", pairs)
+        self.store.conn.executemany(
+            "INSERT INTO customer_stats SELECT customer_key, nama_clinic, MIN(tanggal), MAX(tanggal), "
+            "COUNT(DISTINCT tanggal), COUNT(*), SUM(total) FROM customer_visits "
+            "WHERE customer_key = ? AND nama_clinic = ? GROUP BY customer_key, nama_clinic",
+            pairs,
+        )
+
+    def rebuild(self, dari_tanggal, sampai_tanggal):
+        """Isi index dari transaksi yang sudah ada di store (backfill store lama)"""
+        total = 0
+        for endpoint in ENDPOINT_TABLES:
+            total += self.add(endpoint, self.store.records(endpoint, None, dari_tanggal, sampai_tanggal))
+        return total
+
+    def active_customers(self, dari_tanggal, sampai_tanggal):
+        """{nama_clinic: set kunci pasien} yang datang di rentang itu (hanya baris rentang, via index tanggal)"""
+        with self.store.lock:
+            rows = self.store.conn.execute(
+                "SELECT DISTINCT nama_clinic, customer_key FROM customer_visits WHERE tanggal BETWEEN ? AND ?",
+                (dari_tanggal, sampai_tanggal)).fetchall()
+        active = {}
+        for nama_clinic, customer_key in rows:
+            active.setdefault(nama_clinic, set()).add(customer_key)
+        return active
+
+    def branch_report(self, dari_tanggal=None, sampai_tanggal=None):
+        """Per cabang: pelanggan, repeat rate, CLV (total belanja rata-rata per pasien) dari customer_stats.
+        Dengan rentang: pelanggan aktif, baru, dan retensi = aktif periode sebelumnya (panjang sama) yang datang lagi."""
+        with self.store.lock:
+            rows = self.store.conn.execute(
+                "SELECT nama_clinic, COUNT(*), SUM(visit_days >= ?), SUM(visit_days), SUM(total) "
+                "FROM customer_stats GROUP BY nama_clinic", (REPEAT_MIN_VISITS,)).fetchall()
+        report = {
+            nama_clinic: {
+                'customers': customers,
+                'repeat_customers': repeat,
+                'repeat_rate': repeat / customers,
+                'visits_per_customer': visits / customers,
+                'clv': total / customers,
+            }
+            for nama_clinic, customers, repeat, visits, total in rows
+        }
+        if not dari_tanggal:
+            return report
+
+        dari = date.fromisoformat(dari_tanggal)
+        length = date.fromisoformat(sampai_tanggal) - dari + timedelta(days=1)
+        current = self.active_customers(dari_tanggal, sampai_tanggal)
+        previous = self.active_customers((dari - length).isoformat(), (dari - timedelta(days=1)).isoformat())
+        with self.store.lock:
+            new_rows = self.store.conn.execute(
+                "SELECT nama_clinic, COUNT(*) FROM customer_stats WHERE first_visit BETWEEN ? AND ? GROUP BY nama_clinic",
+                (dari_tanggal, sampai_tanggal)).fetchall()
+        new_customers = dict(new_rows)
+        for nama_clinic, stats in report.items():
+            active = current.get(nama_clinic, set())
+            before = previous.get(nama_clinic, set())
+            stats['active'] = len(active)
+            stats['new'] = new_customers.get(nama_clinic, 0)
+            stats['retention'] = len(active & before) / len(before) if before else None
+        return report
+
+    def visits(self, customer):
+        """Riwayat kunjungan satu pasien (no_telp / no_rm apa pun formatnya, atau kunci kanonik)"""
+        phone = normalize_phone(customer)
+        candidates = [customer] + ([f"telp:{phone}"] if phone else []) + [f"rm:{normalize_rm(customer)}"]
+        with self.store.lock:
+            for key in candidates:
+                row = self.store.conn.execute(
+                    "SELECT customer_key FROM customer_alias WHERE alias = ?", (key,)).fetchone()
+                if row:
+                    return self.store.conn.execute(
+                        "SELECT tanggal, nama_clinic, endpoint, total FROM customer_visits "
+                        "WHERE customer_key = ? ORDER BY tanggal", (row[0],)).fetchall()
+        return []
+
+def print_report(report, with_period=False):
+    header = f"{'Cabang':<32} {'Pasien':>8} {'Repeat':>8} {'Repeat %':>9} {'Kunj/ps':>8} {'CLV':>16}"
+    if with_period:
+        header += f" {'Aktif':>7} {'Baru':>7} {'Retensi':>8}"
+    print(header)
+    print("=" * len(header))
+    for nama_clinic, stats in sorted(report.items(), key=lambda item: item[1]['clv'], reverse=True):
+        line = (f"{nama_clinic:<32} {stats['customers']:>8} {stats['repeat_customers']:>8} {stats['repeat_rate']:>8.1%} "
+                f"{stats['visits_per_customer']:>8.2f} Rp {stats['clv']:>13,.0f}")
+        if with_period:
+            retention = f"{stats['retention']:.1%}" if stats['retention'] is not None else '-'
+            line += f" {stats['active']:>7} {stats['new']:>7} {retention:>8}"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Retensi, repeat rate & CLV per cabang dari index pelanggan store lokal")
+    parser.add_argument("--dari", help="Periode retensi: dari_tanggal (YYYY-MM-DD)")
+    parser.add_argument("--sampai", help="Periode retensi: sampai_tanggal (YYYY-MM-DD)")
+    parser.add_argument("--rebuild", nargs=2, metavar=("DARI", "SAMPAI"), help="Backfill index dari transaksi di store")
+    parser.add_argument("--pasien", help="Tampilkan riwayat kunjungan satu no_telp / no_rm")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="File store SQLite")
+    args = parser.parse_args()
+
+    store = TransactionStore(args.db)
+    try:
+        index = CustomerIndex(store)
+        if args.rebuild:
+            print(f">> Backfill index pelanggan {args.rebuild[0]} s/d {args.rebuild[1]}")
+            print(f"   ✅ {index.rebuild(*args.rebuild)} kunjungan\n")
+        if args.pasien:
+            for tanggal, nama_clinic, endpoint, total in index.visits(args.pasien):
+                print(f"{tanggal} {nama_clinic:<32} {endpoint:<30} Rp {total:>13,.0f}")
+            return
+        with_period = bool(args.dari and args.sampai)
+        print_report(index.branch_report(args.dari, args.sampai) if with_period else index.branch_report(), with_period)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
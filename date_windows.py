@@ -0,0 +1,64 @@
+import calendar
+from datetime import date, timedelta
+
+from response_cache import today_wib
+
+# Aturan rentang tanggal filter dashboard (daily, weekly, monthly, yearly, ytd), sama persis dengan
+# switch(filter) di app/api/sales/route.js dan app/api/sales-progress/route.js.
+
+FILTERS = ('daily', 'weekly', 'monthly', 'yearly', 'ytd')
+
+# Dua route punya definisi minggu berbeda:
+# - sales-progress: minggu 1 = tanggal 1-7, minggu berikutnya per 7 hari, dipotong di akhir bulan
+# - sales: minggu 1 mulai Senin pertama bulan itu, 7 hari penuh (bisa lewat ke bulan berikutnya)
+WEEK_RULE_PROGRESS = 'progress'
+WEEK_RULE_SALES = 'sales'
+
+def week_range_progress(year, month, week):
+    """Minggu ke-n versi app/api/sales-progress/route.js"""
+    last_day = calendar.monthrange(year, month)[1]
+    start_day = 1 + (week - 1) * 7
+    end_day = min(start_day + 6, last_day)
+    # new Date(year, month, startDay) di JS melimpah ke bulan berikutnya kalau startDay > akhir bulan
+    start = date(year, month, 1) + timedelta(days=start_day - 1)
+    return start, date(year, month, 1) + timedelta(days=end_day - 1)
+
+def week_range_sales(year, month, week):
+    """Minggu ke-n versi app/api/sales/route.js (mulai Senin pertama)"""
+    first_day = date(year, month, 1)
+    day_of_week = (first_day.weekday() + 1) % 7  # JS getDay(): Minggu = 0
+    days_until_monday = 1 if day_of_week == 0 else (8 - day_of_week) % 7
+    start = first_day + timedelta(days=days_until_monday + (week - 1) * 7)
+    return start, start + timedelta(days=6)
+
+def weeks_in_month(year, month, week_rule=WEEK_RULE_PROGRESS):
+    """Nomor minggu yang jatuh (mulai) di bulan itu"""
+    weeks = []
+    week = 1
+    while True:
+        start, _ = (week_range_progress if week_rule == WEEK_RULE_PROGRESS else week_range_sales)(year, month, week)
+        if start.month != month or start.year != year:
+            return weeks
+        weeks.append(week)
+        week += 1
+
+def filter_range(filter, date_str=None, week=None, month=None, year=None, today=None, week_rule=WEEK_RULE_PROGRESS):
+    """(startDateStr, endDateStr) untuk satu filter dashboard; today default hari ini WIB"""
+    today = date.fromisoformat(today or today_wib())
+    year = int(year) if year else today.year
+    month = int(month) if month else today.month
+
+    if filter == 'daily':
+        start = end = date.fromisoformat(date_str) if date_str else today
+    elif filter == 'weekly':
+        week_range = week_range_progress if week_rule == WEEK_RULE_PROGRESS else week_range_sales
+        start, end = week_range(year, month, int(week) if week else 1)
+    elif filter == 'monthly':
+        start, end = date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+    elif filter == 'yearly':
+        start, end = date(year, 1, 1), date(year, 12, 31)
+    elif filter == 'ytd':
+        start, end = date(year, 1, 1), today
+    else:
+        start = end = today
+    return start.isoformat(), end.isoformat()
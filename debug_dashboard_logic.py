@@ -1,5 +1,11 @@
-import requests
 import json
+import argparse
+import api_client
+from range_sharding import fetch_sharded
+
+parser = argparse.ArgumentParser(description="Debug logika fetch dashboard (per clinic vs fetch semua)")
+parser.add_argument("--refresh", action="store_true", help="Abaikan cache API di disk dan fetch ulang")
+api_client.response_cache.refresh = parser.parse_args().refresh
 
 print("=== DEBUG DASHBOARD FETCHING LOGIC ===")
 print()
@@ -22,27 +28,10 @@ for clinic_id, clinic_name in clinics:
     print(f"\n{clinic_name} (ID: {clinic_id})")
     
     # Produk
-    url_produk = f"https://clinic.beautycenter.id/api/laporan-penjualan-produk?nama_cabang={clinic_id}&dari_tanggal={tanggal}&sampai_tanggal={tanggal}"
-    resp_produk = requests.get(url_produk, timeout=30)
-    
-    produk_data = []
-    for page in range(1, 10):
-        url = f"https://clinic.beautycenter.id/api/laporan-penjualan-produk?nama_cabang={clinic_id}&dari_tanggal={tanggal}&sampai_tanggal={tanggal}&page={page}"
-        resp = requests.get(url, timeout=30)
-        data = resp.json().get('data', [])
-        if not data:
-            break
-        produk_data.extend(data)
+    produk_data = fetch_sharded('laporan-penjualan-produk', {'nama_cabang': clinic_id, 'dari_tanggal': tanggal, 'sampai_tanggal': tanggal})
     
     # Perawatan
-    perawatan_data = []
-    for page in range(1, 10):
-        url = f"https://clinic.beautycenter.id/api/laporan-penjualan-perawatan?klinik={clinic_id}&dari_tanggal={tanggal}&sampai_tanggal={tanggal}&page={page}"
-        resp = requests.get(url, timeout=30)
-        data = resp.json().get('data', [])
-        if not data:
-            break
-        perawatan_data.extend(data)
+    perawatan_data = fetch_sharded('laporan-penjualan-perawatan', {'klinik': clinic_id, 'dari_tanggal': tanggal, 'sampai_tanggal': tanggal})
     
     print(f"  Produk: {len(produk_data)} transaksi")
     print(f"  Perawatan: {len(perawatan_data)} transaksi")
@@ -74,23 +63,9 @@ total_correct = {}
 # Fetch all data tanpa filter clinic
 print(f"\nFetch semua data tanggal {tanggal}...")
 
-all_produk = []
-for page in range(1, 100):
-    url = f"https://clinic.beautycenter.id/api/laporan-penjualan-produk?dari_tanggal={tanggal}&sampai_tanggal={tanggal}&page={page}"
-    resp = requests.get(url, timeout=30)
-    data = resp.json().get('data', [])
-    if not data:
-        break
-    all_produk.extend(data)
+all_produk = fetch_sharded('laporan-penjualan-produk', {'dari_tanggal': tanggal, 'sampai_tanggal': tanggal})
 
-all_perawatan = []
-for page in range(1, 100):
-    url = f"https://clinic.beautycenter.id/api/laporan-penjualan-perawatan?dari_tanggal={tanggal}&sampai_tanggal={tanggal}&page={page}"
-    resp = requests.get(url, timeout=30)
-    data = resp.json().get('data', [])
-    if not data:
-        break
-    all_perawatan.extend(data)
+all_perawatan = fetch_sharded('laporan-penjualan-perawatan', {'dari_tanggal': tanggal, 'sampai_tanggal': tanggal})
 
 print(f"Total produk: {len(all_produk)}")
 print(f"Total perawatan: {len(all_perawatan)}")
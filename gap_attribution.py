@@ -0,0 +1,173 @@
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+
+from aggregation import parse_rupiah_sen, sen_to_rupiah
+from transaction_store import ENDPOINT_TABLES, AMOUNT_FIELDS, record_date
+
+# Drill-down selisih per (cabang, tanggal): cari transaksi POS yang menjelaskan gap settlement vs POS.
+# Transaksi di-index per nominal dan metode_pembayaran (hash), kombinasi dicari dengan subset-sum terbatas
+# (maksimal MAX_SUBSET_SIZE transaksi, MAX_STATES jumlah parsial), jadi tetap cepat untuk ratusan transaksi per hari.
+
+MAX_SUBSET_SIZE = 4
+MAX_STATES = 200_000
+TOLERANCE_SEN = 1000 * 100  # Sama dengan threshold match compare_data (Rp 1.000)
+ADJACENT_DAYS = 1  # Settlement lebih besar: cari transaksi POS yang tercatat +/- 1 hari
+
+def transaction_amount(endpoint, record):
+    for field in AMOUNT_FIELDS.get(endpoint, ("total_bayar", "total", "nominal")):
+        if record.get(field):
+            return parse_rupiah_sen(record[field])
+    return 0
+
+def transaction_label(record):
+    if record.get('nomor_transaksi'):
+        return record['nomor_transaksi']
+    nama = record.get('nama_pembeli') or record.get('nama_pasien') or '-'
+    item = record.get('nama_treatment') or record.get('nama_produk') or ''
+    return f"{nama} ({item})" if item else nama
+
+class PosIndex:
+    """Hash index transaksi POS: nominal -> transaksi, (nominal, metode) -> transaksi, metode -> total"""
+
+    def __init__(self, transactions):
+        self.transactions = transactions  # list dict: endpoint, amount (sen), metode, tanggal, label
+        self.by_amount = {}
+        self.by_amount_metode = {}
+        self.metode_totals = {}
+        for i, transaction in enumerate(transactions):
+            amount, metode = transaction['amount'], transaction['metode']
+            self.by_amount.setdefault(amount, []).append(i)
+            self.by_amount_metode.setdefault((amount, metode), []).append(i)
+            self.metode_totals[metode] = self.metode_totals.get(metode, 0) + amount
+        self.amounts = sorted(self.by_amount)
+
+    @classmethod
+    def from_records(cls, endpoint_records):
+        """endpoint_records: iterable (endpoint, record JSON)"""
+        return cls([
+            {
+                'endpoint': endpoint,
+                'amount': transaction_amount(endpoint, record),
+                'metode': record.get('metode_pembayaran') or '-',
+                'tanggal': record_date(record),
+                'label': transaction_label(record),
+            }
+            for endpoint, record in endpoint_records
+        ])
+
+    def amounts_near(self, target, tolerance):
+        """Nominal unik dalam [target - tolerance, target + tolerance] (bisect di daftar nominal terurut)"""
+        return self.amounts[bisect_left(self.amounts, target - tolerance):bisect_right(self.amounts, target + tolerance)]
+
+    def find_metode(self, target, tolerance=TOLERANCE_SEN):
+        """Metode pembayaran yang totalnya sama dengan target (mis. satu batch EDC belum di-settle)"""
+        return [metode for metode, total in self.metode_totals.items() if abs(total - target) <= tolerance]
+
+    def find_subset(self, target, tolerance=TOLERANCE_SEN, max_size=MAX_SUBSET_SIZE, max_states=MAX_STATES):
+        """Kombinasi terkecil transaksi (index) yang jumlahnya = target +/- tolerance, atau None.
+        Tiap level: jumlah parsial k-1 transaksi di-join dengan index nominal untuk transaksi ke-k."""
+        if target <= 0 or not self.transactions:
+            return None
+        layer = {0: ()}  # jumlah parsial -> index transaksi (satu representasi per jumlah)
+        seen = {0}
+        states = 0
+        for size in range(1, max_size + 1):
+            # Join: adakah satu transaksi lagi yang melengkapi jumlah parsial ke target?
+            for partial, used in layer.items():
+                for amount in self.amounts_near(target - partial, tolerance):
+                    for i in self.by_amount[amount]:
+                        if i not in used:
+                            return used + (i,)
+            if size == max_size or states >= max_states:
+                return None
+
+            # Perluas ke level berikutnya, jumlah yang sudah pernah tercapai (dengan lebih sedikit transaksi) dilewati.
+            # Kalau batas state tercapai, level yang sudah terbentuk masih di-join sekali lagi lalu berhenti.
+            # Jumlah parsial yang tidak mungkin mencapai target dengan sisa transaksi juga dilewati (batas bawah nominal).
+            remaining = max_size - size
+            next_layer = {}
+            for partial, used in layer.items():
+                lowest = target - tolerance - partial - remaining * self.amounts[-1]
+                for amount in self.amounts[bisect_left(self.amounts, lowest):]:
+                    total = partial + amount
+                    if total > target + tolerance or states >= max_states:
+                        break
+                    if total in seen:
+                        continue
+                    i = next((i for i in self.by_amount[amount] if i not in used), None)
+                    if i is None:
+                        continue
+                    seen.add(total)
+                    next_layer[total] = used + (i,)
+                    states += 1
+            if not next_layer:
+                return None
+            layer = next_layer
+        return None
+
+def attribute_gap(cell, same_day, adjacent=None):
+    """Penjelasan selisih satu sel hasil reconcile().flagged_cells().
+    same_day: PosIndex transaksi POS cabang & tanggal itu; adjacent: PosIndex transaksi hari sekitar"""
+    gap = round(cell['selisih'] * 100)
+    result = {**cell, 'jenis': 'tidak_terjelaskan', 'transaksi': [], 'metode': []}
+
+    if gap < 0:
+        # POS lebih besar: transaksi POS mana yang belum masuk settlement
+        result['metode'] = same_day.find_metode(-gap)
+        subset = same_day.find_subset(-gap)
+        if subset is not None:
+            result['jenis'] = 'pos_belum_settle'
+            result['transaksi'] = [same_day.transactions[i] for i in subset]
+        elif result['metode']:
+            result['jenis'] = 'metode_belum_settle'
+    elif adjacent is not None:
+        # Settlement lebih besar: mungkin transaksinya tercatat di POS pada hari lain
+        subset = adjacent.find_subset(gap)
+        if subset is not None:
+            result['jenis'] = 'pos_beda_tanggal'
+            result['transaksi'] = [adjacent.transactions[i] for i in subset]
+        else:
+            result['jenis'] = 'tidak_ada_di_pos'
+    return result
+
+def load_cell_indexes(store, cabang, tanggal, adjacent_days=ADJACENT_DAYS):
+    """(PosIndex hari itu, PosIndex hari sekitar tanpa hari itu) dari TransactionStore"""
+    day = date.fromisoformat(tanggal)
+    dari = (day - timedelta(days=adjacent_days)).isoformat()
+    sampai = (day + timedelta(days=adjacent_days)).isoformat()
+    same_day, adjacent = [], []
+    for endpoint in ENDPOINT_TABLES:
+        for record in store.records(endpoint, cabang, dari, sampai):
+            (same_day if record_date(record) == tanggal else adjacent).append((endpoint, record))
+    return PosIndex.from_records(same_day), PosIndex.from_records(adjacent)
+
+def attribute_cells(store, cells):
+    """Drill-down semua sel yang di-flag"""
+    results = []
+    for cell in cells:
+        same_day, adjacent = load_cell_indexes(store, cell['cabang'], cell['tanggal'])
+        results.append(attribute_gap(cell, same_day, adjacent))
+    return results
+
+def render_attribution(results):
+    print("=" * 100)
+    print("=== DRILL-DOWN SELISIH HARIAN (transaksi yang menjelaskan gap) ===")
+    print("=" * 100)
+    print()
+    for item in results:
+        print(f"📍 {item['cabang']} {item['tanggal']}: selisih Rp {item['selisih']:,.0f} "
+              f"(Settlement Rp {item['settlement']:,.0f}, POS Rp {item['pos']:,.0f})")
+        if item['jenis'] == 'pos_belum_settle':
+            print("   → Transaksi POS yang belum masuk settlement:")
+        elif item['jenis'] == 'pos_beda_tanggal':
+            print("   → Kemungkinan tercatat di POS pada tanggal lain:")
+        elif item['jenis'] == 'metode_belum_settle':
+            print(f"   → Sama dengan total metode {', '.join(item['metode'])} (kemungkinan batch belum di-settle)")
+        elif item['jenis'] == 'tidak_ada_di_pos':
+            print(f"   → Nominal Rp {item['selisih']:,.0f} tidak ada di POS (tidak ada kombinasi transaksi yang cocok)")
+        else:
+            print("   → Tidak ada kombinasi transaksi yang cocok")
+        for transaction in item['transaksi']:
+            print(f"      - {transaction['tanggal']} {transaction['label']:<40} {transaction['metode']:<15} "
+                  f"Rp {sen_to_rupiah(transaction['amount']):>12,.0f}")
+        print()
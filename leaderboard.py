@@ -0,0 +1,136 @@
+import math
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import api_client
+from api_client import get_json, MAX_CONCURRENCY
+from range_sharding import iter_sharded_pages, parse_date
+from aggregation import parse_rupiah_sen, sen_to_rupiah
+from response_cache import today_wib
+
+# Leaderboard Beauty Center / Rumah Cantik seperti fetchLeaderboardData (app/api/sales/route.js),
+# tapi tiap endpoint cukup di-fetch sekali untuk semua cabang lalu dipartisi lokal per nama_clinic.
+
+PRODUK_ENDPOINT = "laporan-penjualan-produk"
+PERAWATAN_ENDPOINT = "laporan-penjualan-perawatan"
+UPSTREAM_PER_PAGE = 15  # per_page dari API (lihat getlaporanpembayaran.json)
+
+# Sama dengan MOCK_CLINICS di route.js, dipakai kalau endpoint klinik gagal
+MOCK_CLINICS = [
+    {"id": 2, "nama_clinic": "Beauty Center Bantul"},
+    {"id": 3, "nama_clinic": "Beauty Center Godean"},
+    {"id": 4, "nama_clinic": "Beauty Center Kaliurang"},
+    {"id": 5, "nama_clinic": "Beauty Center Kotagede"},
+    {"id": 6, "nama_clinic": "Beauty Center Maguwoharjo"},
+    {"id": 7, "nama_clinic": "Beauty Center Muntilan"},
+    {"id": 8, "nama_clinic": "Beauty Center Parangtritis"},
+    {"id": 10, "nama_clinic": "Beauty Center Prambanan"},
+    {"id": 11, "nama_clinic": "Beauty Center Wates"},
+    {"id": 14, "nama_clinic": "Rumah Cantik Rajawali"},
+]
+
+def fetch_clinics():
+    """Daftar klinik dari API, fallback ke MOCK_CLINICS"""
+    clinics = get_json("klinik")
+    if not isinstance(clinics, list):
+        print("❌ Error fetching clinics, pakai MOCK_CLINICS")
+        return MOCK_CLINICS
+    return clinics
+
+def is_leaderboard_clinic(name):
+    """Filter route.js: Beauty Center / Rumah Cantik, kecuali Piyungan (tutup)"""
+    return ('Beauty Center' in name or 'Rumah Cantik' in name) and 'Piyungan' not in name
+
+def leaderboard_clinics(clinics):
+    return [c for c in clinics if is_leaderboard_clinic(c.get('nama_clinic') or c.get('name') or '')]
+
+def leaderboard_rows(clinics, product_totals, treatment_totals):
+    """Baris /api/sales (id, name, total, productTotal, treatmentTotal) dari total sen per nama_clinic, urut total turun"""
+    rows = []
+    for clinic in leaderboard_clinics(clinics):
+        name = clinic.get('nama_clinic') or clinic.get('name')
+        product, treatment = product_totals.get(name, 0), treatment_totals.get(name, 0)
+        rows.append({
+            'id': clinic['id'],
+            'name': name,
+            'total': sen_to_rupiah(product + treatment),
+            'productTotal': sen_to_rupiah(product),
+            'treatmentTotal': sen_to_rupiah(treatment),
+        })
+    # sort stabil seperti Array.prototype.sort: seri tetap urut daftar klinik
+    rows.sort(key=lambda row: row['total'], reverse=True)
+    return rows
+
+def partition_endpoint(endpoint, params, amount_field, max_workers=MAX_CONCURRENCY):
+    """Fetch satu endpoint sekali untuk semua cabang: return ({nama_clinic: total sen}, {nama_clinic: jumlah record})"""
+    # Satu shard untuk seluruh rentang; range_sharding baru memecah kalau melebihi batas halaman
+    shard_days = (parse_date(params['sampai_tanggal']) - parse_date(params['dari_tanggal'])).days + 1
+    totals, counts = {}, {}
+    for records in iter_sharded_pages(endpoint, params, shard_days=shard_days, max_workers=max_workers):
+        for record in records:
+            name = record.get('nama_clinic')
+            totals[name] = totals.get(name, 0) + parse_rupiah_sen(record.get(amount_field))
+            counts[name] = counts.get(name, 0) + 1
+    return totals, counts
+
+def per_clinic_request_cost(counts, clinics):
+    """Estimasi request strategi per-clinic route.js: minimal 1 halaman per cabang per endpoint"""
+    return sum(
+        max(1, math.ceil(endpoint_counts.get(clinic['nama_clinic'], 0) / UPSTREAM_PER_PAGE))
+        for endpoint_counts in counts
+        for clinic in clinics
+    )
+
+def fetch_leaderboard(dari_tanggal, sampai_tanggal, clinics=None, max_workers=MAX_CONCURRENCY):
+    """Leaderboard rentang tanggal dengan fetch-once per endpoint.
+    Return (rows, stats): rows sama dengan output /api/sales, stats berisi penghematan request"""
+    clinics = leaderboard_clinics(clinics if clinics is not None else fetch_clinics())
+    params = {'dari_tanggal': dari_tanggal, 'sampai_tanggal': sampai_tanggal}
+    requests_before = api_client.request_count
+    cache_hits_before = api_client.response_cache.hits
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        produk = pool.submit(partition_endpoint, PRODUK_ENDPOINT, params, 'total_bayar', max_workers)
+        perawatan = pool.submit(partition_endpoint, PERAWATAN_ENDPOINT, params, 'total_pembayaran', max_workers)
+    product_totals, product_counts = produk.result()
+    treatment_totals, treatment_counts = perawatan.result()
+
+    rows = leaderboard_rows(clinics, product_totals, treatment_totals)
+
+    # Halaman dari cache disk tetap dihitung sebagai biaya fetch-once: penghematan hanya dari strategi, bukan dari cache
+    requests_used = api_client.request_count - requests_before
+    cache_hits = api_client.response_cache.hits - cache_hits_before
+    requests_per_clinic = per_clinic_request_cost([product_counts, treatment_counts], clinics)
+    stats = {
+        'requests': requests_used,
+        'cache_hits': cache_hits,
+        'requests_per_clinic': requests_per_clinic,
+        'requests_saved': requests_per_clinic - (requests_used + cache_hits),
+    }
+    return rows, stats
+
+def print_leaderboard(rows, stats=None):
+    print(f"{'#':<3} {'Cabang':<32} {'Total':>16} {'Produk':>16} {'Perawatan':>16}")
+    print("=" * 87)
+    for rank, row in enumerate(rows, 1):
+        print(f"{rank:<3} {row['name']:<32} Rp {row['total']:>13,.0f} Rp {row['productTotal']:>13,.0f} Rp {row['treatmentTotal']:>13,.0f}")
+    if stats:
+        print()
+        print(f"Request fetch-once: {stats['requests']} (+{stats['cache_hits']} dari cache) | "
+              f"estimasi per-clinic: {stats['requests_per_clinic']} | hemat: {stats['requests_saved']}")
+
+def main():
+    today = today_wib()
+    parser = argparse.ArgumentParser(description="Leaderboard cabang (fetch sekali per endpoint, partisi lokal)")
+    parser.add_argument("--dari", default=today, help="dari_tanggal (YYYY-MM-DD)")
+    parser.add_argument("--sampai", default=today, help="sampai_tanggal (YYYY-MM-DD)")
+    parser.add_argument("--refresh", action="store_true", help="Abaikan cache API di disk dan fetch ulang")
+    args = parser.parse_args()
+    api_client.response_cache.refresh = args.refresh
+
+    rows, stats = fetch_leaderboard(args.dari, args.sampai)
+    print()
+    print_leaderboard(rows, stats)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import json
+import argparse
+import threading
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+import api_client
+from api_client import MAX_CONCURRENCY
+from aggregation import DATE_FIELDS, CLINIC_FIELDS, first_value, parse_rupiah_sen
+from transactions import ENDPOINT_KINDS, clinic_ids, day_ordinal
+from date_windows import FILTERS, WEEK_RULE_PROGRESS, WEEK_RULE_SALES, filter_range, weeks_in_month
+from response_cache import today_wib
+from range_sharding import iter_sharded_pages
+from rollup import RollupIndex
+from leaderboard import PRODUK_ENDPOINT, PERAWATAN_ENDPOINT, fetch_clinics, leaderboard_clinics, print_leaderboard
+from transaction_store import TransactionStore
+
+# Semua view leaderboard dashboard (daily, weekly tiap minggu bulan ini, monthly, yearly, ytd) dari satu scan
+# 1 Januari s/d hari ini per endpoint. Record di-bucket per klinik per hari ke RollupIndex, jadi tiap window
+# cukup lookup prefix sum, bukan fetch per cabang per filter seperti fetchLeaderboardData di route.js.
+# Window yearly / monthly / minggu terakhir lewat dari hari ini, jadi sisa rentangnya ikut di-scan sebagai satu
+# shard (biasanya kosong = satu request) supaya hasilnya tetap sama persis dengan route.js.
+
+# Field nominal persis seperti route.js: parseFloat(p.total_bayar || 0) / parseFloat(t.total_pembayaran || 0)
+LEADERBOARD_AMOUNT_FIELDS = {
+    PRODUK_ENDPOINT: 'total_bayar',
+    PERAWATAN_ENDPOINT: 'total_pembayaran',
+}
+SCAN_SHARD_DAYS = 7  # Shard mingguan: beberapa shard jalan paralel, hari sepi tidak makan request sendiri
+EMPTY_TOTALS = {'productTotal': 0.0, 'treatmentTotal': 0.0, 'total': 0.0}
+
+class LeaderboardEngine:
+    """Rollup satu tahun berjalan + daftar cabang leaderboard; window apa pun di tahun itu tanpa fetch ulang"""
+
+    def __init__(self, clinics, today=None, week_rule=WEEK_RULE_PROGRESS):
+        self.clinics = leaderboard_clinics(clinics)
+        self.today = today or today_wib()
+        self.week_rule = week_rule
+        today = date.fromisoformat(self.today)
+        last_week = weeks_in_month(today.year, today.month, week_rule)[-1]
+        scan_end = max(f"{today.year}-12-31", filter_range('weekly', week=last_week, today=self.today, week_rule=week_rule)[1])
+        self.scan_range = (f"{today.year}-01-01", scan_end)
+        self.index = RollupIndex()
+        self.n_records = 0
+        # rescan mengganti hari berjalan sekaligus, window tidak melihat setengah jadi; add (dua endpoint paralel,
+        # juga dari dalam rescan) menambah index dan n_records di bawah lock yang sama
+        self.lock = threading.RLock()
+
+    def add(self, endpoint, records):
+        """Bucket satu halaman ke index per (klinik, hari) dengan field nominal route.js"""
+        field = LEADERBOARD_AMOUNT_FIELDS[endpoint]
+        clinics, days, amounts = [], [], []
+        for record in records:
+            clinic = clinic_ids.id(first_value(record, CLINIC_FIELDS))
+            day = day_ordinal(first_value(record, DATE_FIELDS))
+            if clinic < 0 or not day:
+                continue
+            clinics.append(clinic)
+            days.append(day)
+            amounts.append(parse_rupiah_sen(record.get(field)))
+        with self.lock:
+            self.index.add_daily(ENDPOINT_KINDS[endpoint], clinics, days, amounts)
+            self.n_records += len(records)
+
+    def fetch(self, dari_tanggal, handle, max_workers=MAX_CONCURRENCY):
+        """Fetch dari_tanggal s/d akhir scan per endpoint (dua endpoint paralel), tiap halaman ke handle(endpoint, records)"""
+        ranges = []
+        if dari_tanggal <= self.today:
+            ranges.append((dari_tanggal, self.today, SCAN_SHARD_DAYS))
+        rest_start = max(dari_tanggal, (date.fromisoformat(self.today) + timedelta(days=1)).isoformat())
+        if rest_start <= self.scan_range[1]:
+            rest_days = (date.fromisoformat(self.scan_range[1]) - date.fromisoformat(rest_start)).days + 1
+            ranges.append((rest_start, self.scan_range[1], rest_days))
+
+        def scan_endpoint(endpoint):
+            for range_start, range_end, shard_days in ranges:
+                params = {'dari_tanggal': range_start, 'sampai_tanggal': range_end}
+                for records in iter_sharded_pages(endpoint, params, shard_days=shard_days, max_workers=max_workers):
+                    handle(endpoint, records)
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            list(pool.map(scan_endpoint, LEADERBOARD_AMOUNT_FIELDS))
+
+    def scan(self, max_workers=MAX_CONCURRENCY):
+        """Satu scan YTD semua cabang sekaligus"""
+        self.fetch(self.scan_range[0], self.add, max_workers)
+        return self
+
+    def rescan(self, dari_tanggal, max_workers=MAX_CONCURRENCY):
+        """Scan ulang dari_tanggal s/d akhir scan (hari yang belum tutup); index baru diganti setelah fetch selesai"""
+        pages = []
+        self.fetch(dari_tanggal, lambda endpoint, records: pages.append((endpoint, records)), max_workers)
+        with self.lock:
+            self.index.reset_range(dari_tanggal, self.scan_range[1])
+            for endpoint, records in pages:
+                self.add(endpoint, records)
+
+    def load_store(self, store):
+        """Isi dari TransactionStore lokal (rentang scan harus sudah di-sync)"""
+        for endpoint in LEADERBOARD_AMOUNT_FIELDS:
+            self.add(endpoint, store.records(endpoint, None, *self.scan_range))
+        return self
+
+    def window(self, filter, date_str=None, week=None, month=None, year=None, week_rule=None):
+        """Baris leaderboard persis /api/sales (id, name, total, productTotal, treatmentTotal) untuk satu filter.
+        week_rule default aturan engine; dua aturan bisa dipakai selama minggunya masih dalam rentang scan"""
+        dari_tanggal, sampai_tanggal = filter_range(filter, date_str, week, month, year, self.today, week_rule or self.week_rule)
+        if dari_tanggal < self.scan_range[0] or sampai_tanggal > self.scan_range[1]:
+            raise ValueError(f"Window {dari_tanggal} s/d {sampai_tanggal} di luar scan {self.scan_range[0]} s/d {self.scan_range[1]}")
+        with self.lock:
+            totals = self.index.totals(dari_tanggal, sampai_tanggal)
+        rows = []
+        for clinic in self.clinics:
+            name = clinic.get('nama_clinic') or clinic.get('name')
+            clinic_totals = totals.get(name, EMPTY_TOTALS)
+            rows.append({
+                'id': clinic['id'],
+                'name': name,
+                'total': clinic_totals['total'],
+                'productTotal': clinic_totals['productTotal'],
+                'treatmentTotal': clinic_totals['treatmentTotal'],
+            })
+        # sort stabil seperti Array.prototype.sort: seri tetap urut daftar klinik
+        rows.sort(key=lambda row: row['total'], reverse=True)
+        return rows
+
+    def all_windows(self, week_rule=None):
+        """Semua view dashboard tanpa parameter: {'daily', 'weekly': {minggu: rows}, 'monthly', 'yearly', 'ytd'}"""
+        today = date.fromisoformat(self.today)
+        week_rule = week_rule or self.week_rule
+        views = {}
+        for filter in FILTERS:
+            if filter == 'weekly':
+                views[filter] = {
+                    week: self.window(filter, week=week, week_rule=week_rule)
+                    for week in weeks_in_month(today.year, today.month, week_rule)
+                }
+            else:
+                views[filter] = self.window(filter, week_rule=week_rule)
+        return views
+
+def build_engine(today=None, week_rule=WEEK_RULE_PROGRESS, clinics=None, db_path=None, max_workers=MAX_CONCURRENCY):
+    """Engine siap pakai: scan API (atau store lokal kalau db_path diisi)"""
+    engine = LeaderboardEngine(clinics if clinics is not None else fetch_clinics(), today, week_rule)
+    if db_path:
+        store = TransactionStore(db_path)
+        try:
+            return engine.load_store(store)
+        finally:
+            store.close()
+    return engine.scan(max_workers)
+
+def main():
+    parser = argparse.ArgumentParser(description="Semua window leaderboard (daily/weekly/monthly/yearly/ytd) dari satu scan YTD")
+    parser.add_argument("--today", help="Tanggal acuan (YYYY-MM-DD), default hari ini WIB")
+    parser.add_argument("--week-rule", choices=(WEEK_RULE_PROGRESS, WEEK_RULE_SALES), default=WEEK_RULE_PROGRESS)
+    parser.add_argument("--db", help="Pakai store SQLite lokal, bukan API")
+    parser.add_argument("--json", action="store_true", help="Cetak semua view sebagai JSON")
+    parser.add_argument("--refresh", action="store_true", help="Abaikan cache API di disk dan fetch ulang")
+    args = parser.parse_args()
+    api_client.response_cache.refresh = args.refresh
+
+    requests_before = api_client.request_count
+    engine = build_engine(args.today, args.week_rule, db_path=args.db)
+    views = engine.all_windows()
+    if args.json:
+        print(json.dumps(views, ensure_ascii=False, indent=2))
+        return
+
+    print(f">> Scan {engine.scan_range[0]} s/d {engine.today} (+ sisa s/d {engine.scan_range[1]}): {engine.n_records} record, "
+          f"{api_client.request_count - requests_before} request\n")
+    for filter, rows in views.items():
+        for week, week_rows in (rows.items() if filter == 'weekly' else [(None, rows)]):
+            label = f"{filter} minggu {week}" if week else filter
+            dari_tanggal, sampai_tanggal = filter_range(filter, week=week, today=engine.today, week_rule=engine.week_rule)
+            print(f"📅 {label}: {dari_tanggal} s/d {sampai_tanggal}")
+            print_leaderboard(week_rows)
+            print()
+
+if __name__ == "__main__":
+    main()
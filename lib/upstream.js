@@ -0,0 +1,291 @@
+// Upstream helpers shared by /api/sales and /api/sales-progress: WIB dates, the paged fetch with retries,
+// dedup and range splitting, and the day-range cache that answers overlapping date ranges from cached days.
+
+export const CACHE_DURATION = 5 * 60 * 1000; // 5 minutes in milliseconds
+
+// Helper to get date in YYYY-MM-DD format for WIB (UTC+7)
+export function getWIBDate(date = new Date()) {
+  const utcOffset = 7 * 60; // 7 hours in minutes
+  const localTime = new Date(date.getTime() + (utcOffset * 60 * 1000));
+  return localTime.toISOString().split('T')[0];
+}
+
+export function getWIBDateStr(date = new Date()) {
+  // Get local date parts to avoid timezone issues
+  const year = date.getFullYear();
+  const month = String(date.getMonth() + 1).padStart(2, '0');
+  const day = String(date.getDate()).padStart(2, '0');
+  return `${year}-${month}-${day}`;
+}
+
+// Split a YYYY-MM-DD range into two halves, or null if it is a single day
+export function splitDateRange(startDateStr, endDateStr) {
+  if (!startDateStr || !endDateStr || startDateStr >= endDateStr) return null;
+  const start = new Date(`${startDateStr}T00:00:00Z`);
+  const end = new Date(`${endDateStr}T00:00:00Z`);
+  const days = Math.round((end - start) / 86400000);
+  const middle = new Date(start.getTime() + Math.floor(days / 2) * 86400000);
+  const afterMiddle = new Date(middle.getTime() + 86400000);
+  const toStr = (d) => d.toISOString().split('T')[0];
+  return [[startDateStr, toStr(middle)], [toStr(afterMiddle), endDateStr]];
+}
+
+// Pagination dedup key: id, then nomor_transaksi; records with neither (perawatan) are always kept
+export function markSeen(seen, record) {
+  const key = record?.id ?? (record?.nomor_transaksi ? `no:${record.nomor_transaksi}` : null);
+  if (key === null) return true;
+  if (seen.has(key)) return false;
+  seen.add(key);
+  return true;
+}
+
+// Records inserted while a walk was running sit on the newest pages: re-read from page 1 until a known record shows up
+export async function fetchInsertedRecords(endpoint, params, seen, maxPages) {
+  const inserted = [];
+  const queryParams = new URLSearchParams(params);
+  for (let page = 1; page <= maxPages; page++) {
+    queryParams.set('page', page.toString());
+    try {
+      const response = await fetch(`https://clinic.beautycenter.id/api/${endpoint}?${queryParams.toString()}`, {
+        headers: { 'Accept': 'application/json' },
+        cache: 'no-store'
+      });
+      if (!response.ok) break;
+      const result = await response.json();
+      const data = result?.data || [];
+      const fresh = data.filter((record) => markSeen(seen, record));
+      inserted.push(...fresh);
+      if (fresh.length < data.length || !result.next_page_url) break;
+    } catch (error) {
+      break;
+    }
+  }
+  return inserted;
+}
+
+export async function fetchWithParams(endpoint, params, maxPages = 50) {
+  let allData = [];
+  let page = 1;
+  let hasMorePages = true;
+  const seen = new Set(); // Keys of records already collected (inserts during the walk shift page boundaries)
+  let duplicates = 0;
+  let incomplete = false; // A page was given up on: the result is partial and must not be cached per day
+  // maxPages: safety limit per date range; larger ranges are split below instead of truncated
+  const maxRetries = 3; // Max retry attempts for 500 errors
+
+  // Construct base query params
+  const queryParams = new URLSearchParams(params);
+
+  // A single day cannot be split: it keeps paging past maxPages with what it has, instead of restarting
+  const halves = splitDateRange(params.dari_tanggal, params.sampai_tanggal);
+
+  while (hasMorePages && (page <= maxPages || !halves)) {
+    if (page === maxPages + 1) {
+      console.log(`⚠️ ${endpoint} ${params.dari_tanggal} has more than ${maxPages} pages in one day, continuing without limit...`);
+    }
+    // Update page parameter
+    queryParams.set('page', page.toString());
+    const url = `https://clinic.beautycenter.id/api/${endpoint}?${queryParams.toString()}`;
+    
+    let retryCount = 0;
+    let success = false;
+    
+    // Retry loop for this page
+    while (!success && retryCount <= maxRetries) {
+      try {
+        const response = await fetch(url, {
+          headers: { 'Accept': 'application/json' },
+          cache: 'no-store'
+        });
+        
+        // Handle rate limiting
+        if (response.status === 429) {
+          console.log(`⚠️ Rate limit hit for ${endpoint} page ${page}, waiting 3s...`);
+          await new Promise(resolve => setTimeout(resolve, 3000));
+          retryCount++;
+          continue;
+        }
+        
+        // Handle server errors (500, 502, 503, 504) with retry
+        if (response.status >= 500 && response.status < 600) {
+          retryCount++;
+          if (retryCount <= maxRetries) {
+            const waitTime = Math.min(1000 * Math.pow(2, retryCount - 1), 5000); // Exponential backoff, max 5s
+            console.log(`⚠️ API Error ${response.status} for ${endpoint} page ${page}, retry ${retryCount}/${maxRetries} in ${waitTime}ms...`);
+            await new Promise(resolve => setTimeout(resolve, waitTime));
+            continue;
+          } else {
+            console.error(`❌ API Error ${response.status} for ${url} after ${maxRetries} retries, skipping...`);
+            break; // Give up on this page
+          }
+        }
+        
+        // Handle other non-OK responses
+        if (!response.ok) {
+          console.error(`API Error ${response.status} for ${url}`);
+          break;
+        }
+        
+        const result = await response.json();
+        const data = result?.data || [];
+        
+        if (data.length > 0) {
+          const fresh = data.filter((record) => markSeen(seen, record));
+          duplicates += data.length - fresh.length;
+          allData = allData.concat(fresh);
+          
+          if (result.next_page_url) {
+            page++;
+            // Minimal delay since rate limit is now 500/min
+            await new Promise(resolve => setTimeout(resolve, 150));
+          } else {
+            hasMorePages = false;
+          }
+        } else {
+          hasMorePages = false;
+        }
+        
+        success = true; // Mark as successful
+        
+      } catch (error) {
+        retryCount++;
+        if (retryCount <= maxRetries) {
+          const waitTime = Math.min(1000 * Math.pow(2, retryCount - 1), 5000);
+          console.error(`⚠️ Network error for ${url}, retry ${retryCount}/${maxRetries} in ${waitTime}ms...`, error.message);
+          await new Promise(resolve => setTimeout(resolve, waitTime));
+        } else {
+          console.error(`❌ Error fetching ${url} after ${maxRetries} retries:`, error);
+          break;
+        }
+      }
+    }
+    
+    // If we failed all retries, move to next page or stop
+    if (!success) {
+      incomplete = true;
+      break;
+    }
+  }
+
+  // Page limit reached but more pages remain: split the date range instead of truncating
+  if (hasMorePages && page > maxPages && halves) {
+    console.log(`✂️ ${endpoint} ${params.dari_tanggal}..${params.sampai_tanggal} exceeds ${maxPages} pages, splitting range...`);
+    let shardedData = [];
+    for (const [dari_tanggal, sampai_tanggal] of halves) {
+      const shard = await fetchWithParams(endpoint, { ...params, dari_tanggal, sampai_tanggal }, maxPages);
+      incomplete = incomplete || shard.incomplete;
+      shardedData = shardedData.concat(shard);
+    }
+    shardedData.incomplete = incomplete;
+    return shardedData;
+  }
+
+  // Duplicates mean new transactions pushed records down while paging: fetch the inserted ones too
+  if (duplicates > 0) {
+    console.log(`⚠️ ${endpoint}: ${duplicates} duplicate records from shifted pages dropped, re-reading newest pages...`);
+    allData = allData.concat(await fetchInsertedRecords(endpoint, params, seen, maxPages));
+  }
+
+  allData.incomplete = incomplete;
+  return allData;
+}
+
+// ============ DAY-RANGE CACHE (per endpoint + clinic) ============
+// Daily totals per (endpoint, clinic, day) plus the day intervals already covered, so an overlapping date range
+// (Dec 1-31, then Dec 15-20, then Nov 20-Dec 10) is answered from cached days and only the gaps go upstream.
+// Days before today (WIB) are closed and kept; today and later are refetched after CACHE_DURATION.
+const rangeCache = new Map();
+
+function addDays(dateStr, days) {
+  const date = new Date(`${dateStr}T00:00:00Z`);
+  date.setUTCDate(date.getUTCDate() + days);
+  return date.toISOString().split('T')[0];
+}
+
+// Insert [start, end] into a sorted list of disjoint day intervals, merging overlapping and adjacent ones
+function addInterval(intervals, start, end) {
+  const merged = [];
+  let placed = false;
+  for (const [s, e] of intervals) {
+    if (addDays(e, 1) < start) {
+      merged.push([s, e]);
+    } else if (s > addDays(end, 1)) {
+      if (!placed) merged.push([start, end]);
+      placed = true;
+      merged.push([s, e]);
+    } else {
+      start = s < start ? s : start;
+      end = e > end ? e : end;
+    }
+  }
+  if (!placed) merged.push([start, end]);
+  return merged;
+}
+
+// Sub-ranges of [start, end] that cannot be answered from the cache entry
+function missingRanges(entry, start, end, today) {
+  const gaps = [];
+  const closedEnd = end < today ? end : addDays(today, -1);
+  let cursor = start;
+  for (const [s, e] of entry.intervals) {
+    if (cursor > closedEnd || s > closedEnd) break;
+    if (e < cursor) continue;
+    if (s > cursor) gaps.push([cursor, addDays(s, -1)]);
+    cursor = addDays(e, 1);
+  }
+  if (cursor <= closedEnd) gaps.push([cursor, closedEnd]);
+  for (let day = start > today ? start : today; day <= end; day = addDays(day, 1)) {
+    const fetchedAt = entry.live.get(day);
+    if (fetchedAt && Date.now() - fetchedAt < CACHE_DURATION) continue;
+    const last = gaps[gaps.length - 1];
+    if (last && addDays(last[1], 1) === day) last[1] = day;
+    else gaps.push([day, day]);
+  }
+  return gaps;
+}
+
+// Sum of amountField over [start, end] for one clinic filter, fetching only the days not cached yet
+export async function fetchRangeTotal(endpoint, params, amountField, start, end) {
+  const key = `${endpoint}?${new URLSearchParams(params).toString()}`;
+  if (!rangeCache.has(key)) rangeCache.set(key, { days: new Map(), intervals: [], live: new Map() });
+  const entry = rangeCache.get(key);
+  const today = getWIBDate();
+  const gaps = missingRanges(entry, start, end, today);
+  let total = 0;
+  let records = 0;
+
+  for (const [dari_tanggal, sampai_tanggal] of gaps) {
+    const data = await fetchWithParams(endpoint, { ...params, dari_tanggal, sampai_tanggal });
+    records += data.length;
+    let complete = !data.incomplete;
+    const sums = new Map();
+    data.forEach(record => {
+      const amount = parseFloat(record[amountField] || 0);
+      const day = String(record.tanggal_transaksi || record.tanggal || record.created_at || '').slice(0, 10);
+      if (day < dari_tanggal || day > sampai_tanggal) {
+        // No day inside the gap to file it under: counted for this answer only, the gap stays uncached
+        total += amount;
+        complete = false;
+        return;
+      }
+      sums.set(day, (sums.get(day) || 0) + amount);
+    });
+
+    for (let day = dari_tanggal; day <= sampai_tanggal; day = addDays(day, 1)) entry.days.delete(day);
+    sums.forEach((amount, day) => entry.days.set(day, amount));
+    if (complete) {
+      if (dari_tanggal < today) {
+        entry.intervals = addInterval(entry.intervals, dari_tanggal, sampai_tanggal < today ? sampai_tanggal : addDays(today, -1));
+      }
+      const fetchedAt = Date.now();
+      for (let day = dari_tanggal > today ? dari_tanggal : today; day <= sampai_tanggal; day = addDays(day, 1)) {
+        entry.live.set(day, fetchedAt);
+      }
+    }
+  }
+
+  entry.days.forEach((amount, day) => {
+    if (day >= start && day <= end) total += amount;
+  });
+  return { total, records, gaps };
+}
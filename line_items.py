@@ -0,0 +1,232 @@
+import argparse
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregation import DATE_FIELDS, CLINIC_FIELDS, first_value, parse_rupiah_sen, sen_to_rupiah
+from transactions import Interner, clinic_ids, day_ordinal, KIND_PRODUK, KIND_PERAWATAN, ENDPOINT_KINDS
+from transaction_store import TransactionStore, DEFAULT_DB_PATH, ENDPOINT_TABLES, AMOUNT_FIELDS
+
+# Index line item dari nama_treatment / nama_produk (string dipisah koma).
+# String di-tokenize sekali saat ingest, nama item di-intern jadi ID integer, lalu dibuat inverted index
+# item -> transaksi. Pendapatan transaksi dibagi ke item-itemnya sesuai SPLIT_RULES.
+
+ITEM_FIELDS = {
+    KIND_PRODUK: 'nama_produk',
+    KIND_PERAWATAN: 'nama_treatment',
+}
+JENIS_NAMES = {KIND_PRODUK: 'produk', KIND_PERAWATAN: 'perawatan'}
+
+SPLIT_EQUAL = 'equal'  # Dibagi rata ke semua item
+SPLIT_FIRST = 'first'  # Semua ke item pertama
+SPLIT_WEIGHTED = 'weighted'  # Proporsional bobot per item (mis. harga list), item tanpa bobot = 1
+SPLIT_RULES = (SPLIT_EQUAL, SPLIT_FIRST, SPLIT_WEIGHTED)
+FREE_PREFIXES = ('free ', 'gratis ')  # Item bonus (mis. "Free PDT") tidak dapat bagian pendapatan
+
+def split_items(text):
+    """'Facial Greentea, Oxy Glow, Free PDT' -> ['Facial Greentea', 'Oxy Glow', 'Free PDT']"""
+    if not text:
+        return []
+    return [item.strip() for item in str(text).split(',') if item.strip()]
+
+def is_free_item(name):
+    return name.lower().startswith(FREE_PREFIXES)
+
+def split_revenue(amount, items, rule=SPLIT_EQUAL, weights=None):
+    """Bagi amount (sen) ke item; hasil integer sen yang jumlahnya tepat = amount (sisa ke pecahan terbesar)"""
+    if not items:
+        return []
+    if rule == SPLIT_FIRST:
+        return [amount] + [0] * (len(items) - 1)
+    if rule == SPLIT_WEIGHTED:
+        item_weights = [0 if is_free_item(item) else (weights or {}).get(item, 1) for item in items]
+    else:
+        item_weights = [0 if is_free_item(item) else 1 for item in items]
+    total_weight = sum(item_weights)
+    if not total_weight:
+        item_weights, total_weight = [1] * len(items), len(items)
+
+    exact = [amount * weight / total_weight for weight in item_weights]
+    shares = [int(value // 1) for value in exact]
+    remainder = amount - sum(shares)
+    for i in sorted(range(len(items)), key=lambda i: exact[i] - shares[i], reverse=True)[:remainder]:
+        shares[i] += 1
+    return shares
+
+def load_weights(path):
+    """Bobot SPLIT_WEIGHTED dari file JSON {nama item: bobot}, mis. harga list per treatment"""
+    with open(path, encoding='utf-8') as f:
+        weights = json.load(f)
+    if not isinstance(weights, dict) or not all(isinstance(w, (int, float)) and w >= 0 for w in weights.values()):
+        raise ValueError(f"{path}: harus objek JSON {{nama item: bobot >= 0}}")
+    return weights
+
+class LineItemIndex:
+    """Line item kolumnar (item, transaksi, klinik, hari, bagian pendapatan) + inverted index item -> transaksi"""
+
+    def __init__(self, rule=SPLIT_EQUAL, weights=None, clinics=None):
+        self.rule = rule
+        self.weights = weights
+        self.clinics = clinics or clinic_ids
+        self.items = Interner()
+        self.item_kinds = {}  # item id -> KIND_PRODUK / KIND_PERAWATAN
+        self.n_transactions = 0
+        self.columns = {name: np.empty(0, dtype=np.int64) for name in ('item', 'transaction', 'clinic', 'day', 'amount')}
+        self.pending = []
+        self.postings = None  # (offsets, transaction ids) urut item, dibuat ulang kalau ada data baru
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, records):
+        """Tokenize satu halaman / satu endpoint; string nama item hanya di-split sekali di sini"""
+        kind = ENDPOINT_KINDS.get(endpoint, KIND_PRODUK)
+        field = ITEM_FIELDS[kind]
+        amount_fields = AMOUNT_FIELDS.get(endpoint, ("total_bayar", "total", "nominal"))
+        tokens = {}  # Cache tokenize per string utuh (kombinasi item banyak berulang)
+        rows = []
+        with self.lock:
+            transaction = self.n_transactions
+            self.n_transactions += len(records)
+        for record in records:
+            text = record.get(field) or ''
+            item_ids = tokens.get(text)
+            if item_ids is None:
+                names = split_items(text)
+                item_ids = tokens[text] = [self.items.id(name) for name in names]
+                for item_id in item_ids:
+                    self.item_kinds.setdefault(item_id, kind)
+            amount = next((parse_rupiah_sen(record[f]) for f in amount_fields if record.get(f)), 0)
+            shares = split_revenue(amount, [self.items.name(i) for i in item_ids], self.rule, self.weights)
+            clinic = self.clinics.id(first_value(record, CLINIC_FIELDS))
+            day = day_ordinal(first_value(record, DATE_FIELDS))
+            for item_id, share in zip(item_ids, shares):
+                rows.append((item_id, transaction, clinic, day, share))
+            transaction += 1
+        if rows:
+            with self.lock:
+                self.pending.append(np.array(rows, dtype=np.int64))
+
+    def consolidate(self):
+        with self.lock:
+            if not self.pending:
+                return
+            table = np.concatenate([np.column_stack(list(self.columns.values()))] + self.pending)
+            self.pending = []
+            for i, name in enumerate(self.columns):
+                self.columns[name] = table[:, i]
+            self.postings = None
+
+    def inverted_index(self):
+        """CSR: transaksi untuk item i = transactions[offsets[i]:offsets[i + 1]]"""
+        self.consolidate()
+        if self.postings is None:
+            order = np.argsort(self.columns['item'], kind='stable')
+            counts = np.bincount(self.columns['item'], minlength=max(self.items.names, default=0) + 1)
+            offsets = np.concatenate([[0], np.cumsum(counts)])
+            self.postings = (offsets, self.columns['transaction'][order])
+        return self.postings
+
+    def transactions_with(self, name):
+        """ID transaksi (urutan ingest) yang berisi item ini"""
+        item_id = self.items.ids.get(name)
+        if item_id is None:
+            return np.empty(0, dtype=np.int64)
+        offsets, transactions = self.inverted_index()
+        return transactions[offsets[item_id]:offsets[item_id + 1]]
+
+    def mask(self, clinic=None, dari_tanggal=None, sampai_tanggal=None, kind=None):
+        self.consolidate()
+        mask = np.ones(len(self.columns['item']), dtype=bool)
+        if clinic is not None:
+            mask &= self.columns['clinic'] == self.clinics.id(clinic)
+        if dari_tanggal:
+            mask &= self.columns['day'] >= day_ordinal(dari_tanggal)
+        if sampai_tanggal:
+            mask &= self.columns['day'] <= day_ordinal(sampai_tanggal)
+        if kind is not None:
+            kinds = np.zeros(max(self.items.names, default=0) + 1, dtype=bool)
+            kinds[[item_id for item_id, item_kind in self.item_kinds.items() if item_kind == kind]] = True
+            mask &= kinds[self.columns['item']]
+        return mask
+
+    def ranked(self, revenue, count, n, by):
+        """DataFrame top-N dari total per item id (argpartition, lalu urut)"""
+        score = revenue if by == 'revenue' else count
+        top = np.flatnonzero(count)
+        if len(top) > n:
+            top = top[np.argpartition(-score[top], n - 1)[:n]]
+        top = top[np.argsort(-score[top], kind='stable')]
+        return pd.DataFrame({
+            'item': [self.items.name(i) for i in top],
+            'jenis': [JENIS_NAMES.get(self.item_kinds.get(int(i))) for i in top],
+            'revenue': [sen_to_rupiah(int(value)) for value in revenue[top]],
+            'count': count[top],
+        })
+
+    def top_items(self, n=10, clinic=None, dari_tanggal=None, sampai_tanggal=None, kind=None, by='revenue'):
+        """Top-N item (bincount per item id); return DataFrame item, jenis, revenue, count"""
+        mask = self.mask(clinic, dari_tanggal, sampai_tanggal, kind)
+        size = max(self.items.names, default=0) + 1
+        items = self.columns['item'][mask]
+        revenue = np.bincount(items, weights=self.columns['amount'][mask], minlength=size).astype(np.int64)
+        return self.ranked(revenue, np.bincount(items, minlength=size), n, by)
+
+    def top_items_per_clinic(self, n=10, dari_tanggal=None, sampai_tanggal=None, kind=None, by='revenue'):
+        """{nama_clinic: DataFrame top-N}; satu bincount atas kunci (klinik, item) untuk semua cabang"""
+        mask = self.mask(None, dari_tanggal, sampai_tanggal, kind) & (self.columns['clinic'] >= 0)
+        size = max(self.items.names, default=0) + 1
+        clinics, rows = np.unique(self.columns['clinic'][mask], return_inverse=True)
+        keys = rows.ravel() * size + self.columns['item'][mask]
+        revenue = np.bincount(keys, weights=self.columns['amount'][mask], minlength=len(clinics) * size)
+        count = np.bincount(keys, minlength=len(clinics) * size)
+        revenue = revenue.astype(np.int64).reshape(len(clinics), size)
+        count = count.reshape(len(clinics), size)
+        return {
+            self.clinics.name(clinic): self.ranked(revenue[row], count[row], n, by)
+            for row, clinic in enumerate(clinics)
+        }
+
+    @classmethod
+    def from_store(cls, store, dari_tanggal, sampai_tanggal, rule=SPLIT_EQUAL, weights=None):
+        index = cls(rule, weights)
+        for endpoint in ENDPOINT_TABLES:
+            index.add(endpoint, store.records(endpoint, None, dari_tanggal, sampai_tanggal))
+        return index
+
+def main():
+    parser = argparse.ArgumentParser(description="Top-N treatment / produk per cabang dari store lokal")
+    parser.add_argument("--dari", required=True, help="dari_tanggal (YYYY-MM-DD)")
+    parser.add_argument("--sampai", required=True, help="sampai_tanggal (YYYY-MM-DD)")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--jenis", choices=('produk', 'perawatan'), help="Hanya produk atau perawatan")
+    parser.add_argument("--cabang", help="Satu cabang saja (nama_clinic)")
+    parser.add_argument("--by", choices=('revenue', 'count'), default='revenue')
+    parser.add_argument("--rule", choices=SPLIT_RULES, default=SPLIT_EQUAL, help="Aturan bagi pendapatan ke item")
+    parser.add_argument("--weights", help="File JSON {nama item: bobot} untuk --rule weighted")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="File store SQLite")
+    args = parser.parse_args()
+    if (args.rule == SPLIT_WEIGHTED) != bool(args.weights):
+        parser.error("--rule weighted harus dipakai bersama --weights")
+    try:
+        weights = load_weights(args.weights) if args.weights else None
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    store = TransactionStore(args.db)
+    try:
+        index = LineItemIndex.from_store(store, args.dari, args.sampai, args.rule, weights)
+    finally:
+        store.close()
+    kind = {'produk': KIND_PRODUK, 'perawatan': KIND_PERAWATAN}.get(args.jenis)
+
+    tables = ({args.cabang: index.top_items(args.top, args.cabang, kind=kind, by=args.by)} if args.cabang
+              else index.top_items_per_clinic(args.top, kind=kind, by=args.by))
+    with pd.option_context('display.width', 200, 'display.float_format', '{:,.0f}'.format):
+        for cabang, table in sorted(tables.items()):
+            print(f"📍 {cabang}")
+            print(table.to_string(index=False))
+            print()
+
+if __name__ == "__main__":
+    main()
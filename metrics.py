@@ -0,0 +1,237 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+# Instrumentasi run rekonsiliasi: timer per stage, histogram latency halaman per endpoint,
+# bytes, retry, 429 dan record/detik. Diekspor sebagai ringkasan JSON dan textfile Prometheus (node_exporter).
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)  # Detik
+METRIC_PREFIX = "settlement"
+
+def endpoint_name(url):
+    """Nama endpoint dari URL lengkap (segmen terakhir path, tanpa query)"""
+    return url.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.bytes = 0
+        self.records = 0
+        self.pages = 0
+        self.duplicates = 0  # Record dobel karena batas halaman bergeser (dibuang oleh PageGuard)
+        self.repair_pages = 0  # Halaman yang dibaca ulang untuk menambal pergeseran
+        self.latency_sum = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # Slot terakhir: +Inf
+        self.decode_seconds = 0.0
+        self.first_request = None
+        self.last_response = None
+
+    def observe_latency(self, seconds):
+        self.latency_sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[i] += 1
+                return
+        self.latency_buckets[-1] += 1
+
+    def records_per_second(self):
+        if not self.records or self.first_request is None or self.last_response is None:
+            return 0.0
+        elapsed = self.last_response - self.first_request
+        return self.records / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        cumulative, buckets = 0, {}
+        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), self.latency_buckets):
+            cumulative += count
+            buckets['+Inf' if bound == float('inf') else str(bound)] = cumulative
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'errors': self.errors,
+            'bytes': self.bytes,
+            'pages': self.pages,
+            'records': self.records,
+            'duplicates': self.duplicates,
+            'repair_pages': self.repair_pages,
+            'records_per_second': round(self.records_per_second(), 1),
+            'latency_seconds_sum': round(self.latency_sum, 4),
+            'latency_seconds_mean': round(self.latency_sum / self.requests, 4) if self.requests else 0.0,
+            'latency_buckets': buckets,
+            'json_decode_seconds': round(self.decode_seconds, 4),
+        }
+
+class Metrics:
+    """Kumpulan metrik satu run; aman dipakai bersama oleh thread fetch"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stage_hooks = []  # Objek dengan enter_stage(name) / exit_stage(name), mis. profiling.StageProfiler
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.stages = {}  # nama stage -> detik (urut sesuai eksekusi)
+            self.nested_stages = set()  # Stage di dalam stage lain (tidak dihitung dua kali di duration_seconds)
+            self.active_stages = []
+            self.endpoints = {}
+
+    def endpoint(self, url):
+        name = endpoint_name(url)
+        if name not in self.endpoints:
+            self.endpoints[name] = EndpointStats()
+        return self.endpoints[name]
+
+    @contextmanager
+    def stage(self, name):
+        """Ukur durasi satu stage: `with metrics.stage('fetch_api_data'): ...` (boleh bersarang)"""
+        with self.lock:
+            if self.active_stages:
+                self.nested_stages.add(name)
+            self.active_stages.append(name)
+        for hook in self.stage_hooks:
+            hook.enter_stage(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            for hook in reversed(self.stage_hooks):
+                hook.exit_stage(name)
+            with self.lock:
+                self.active_stages.pop()
+                self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+    def observe_request(self, url, seconds, status=None, size=0):
+        """Satu request HTTP selesai (status None = network error)"""
+        now = time.monotonic()
+        with self.lock:
+            stats = self.endpoint(url)
+            stats.requests += 1
+            stats.observe_latency(seconds)
+            stats.bytes += size
+            if stats.first_request is None:
+                stats.first_request = now - seconds
+            stats.last_response = now
+            if status == 429:
+                stats.rate_limited += 1
+            elif status is None or status >= 400:
+                stats.errors += 1
+
+    def observe_retry(self, url):
+        with self.lock:
+            self.endpoint(url).retries += 1
+
+    def observe_decode(self, url, seconds):
+        with self.lock:
+            self.endpoint(url).decode_seconds += seconds
+
+    def observe_page(self, url, records):
+        """Satu halaman data diterima (dipanggil di tempat progress per halaman dicetak)"""
+        with self.lock:
+            stats = self.endpoint(url)
+            stats.pages += 1
+            stats.records += records
+
+    def observe_duplicates(self, url, records):
+        with self.lock:
+            self.endpoint(url).duplicates += records
+
+    def observe_repair(self, url):
+        """Satu halaman dibaca ulang karena batas halaman bergeser"""
+        with self.lock:
+            self.endpoint(url).repair_pages += 1
+
+    def summary(self):
+        with self.lock:
+            endpoints = {name: stats.summary() for name, stats in sorted(self.endpoints.items())}
+            stages = {name: round(seconds, 4) for name, seconds in self.stages.items()}
+            duration = sum(seconds for name, seconds in self.stages.items() if name not in self.nested_stages)
+        return {
+            'started_at': self.started_at,
+            'duration_seconds': round(duration, 4),
+            'stages': stages,
+            'endpoints': endpoints,
+            'totals': {
+                key: sum(stats[key] for stats in endpoints.values())
+                for key in ('requests', 'retries', 'rate_limited', 'errors', 'bytes', 'pages', 'records',
+                            'duplicates', 'repair_pages')
+            },
+        }
+
+    def write_json(self, path):
+        write_atomic(path, json.dumps(self.summary(), indent=2))
+
+    def prometheus_text(self):
+        """Format exposition Prometheus untuk textfile collector node_exporter"""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{val}"' for key, val in labels.items())
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}" if label_text else f"{METRIC_PREFIX}_{name} {value}")
+
+        endpoints = summary['endpoints']
+        metric("last_run_timestamp_seconds", "gauge", "Waktu mulai run terakhir", [({}, summary['started_at'])])
+        metric("stage_duration_seconds", "gauge", "Durasi per stage pipeline",
+               [({'stage': name}, seconds) for name, seconds in summary['stages'].items()])
+        for key, help_text in (
+            ('requests', "Request HTTP terkirim (termasuk retry)"),
+            ('retries', "Retry request"),
+            ('rate_limited', "Response 429"),
+            ('errors', "Response error / network error"),
+            ('bytes', "Bytes body response"),
+            ('pages', "Halaman data diterima"),
+            ('records', "Record transaksi diterima"),
+            ('duplicates', "Record dobel dibuang karena batas halaman bergeser"),
+            ('repair_pages', "Halaman dibaca ulang untuk menambal pergeseran batas halaman"),
+        ):
+            metric(f"{key}_total", "counter", help_text, [({'endpoint': name}, stats[key]) for name, stats in endpoints.items()])
+        metric("records_per_second", "gauge", "Throughput record per endpoint",
+               [({'endpoint': name}, stats['records_per_second']) for name, stats in endpoints.items()])
+        metric("json_decode_seconds", "gauge", "Waktu decode JSON per endpoint",
+               [({'endpoint': name}, stats['json_decode_seconds']) for name, stats in endpoints.items()])
+
+        lines.append(f"# HELP {METRIC_PREFIX}_page_latency_seconds Latency request per endpoint")
+        lines.append(f"# TYPE {METRIC_PREFIX}_page_latency_seconds histogram")
+        for name, stats in endpoints.items():
+            for bound, count in stats['latency_buckets'].items():
+                lines.append(f'{METRIC_PREFIX}_page_latency_seconds_bucket{{endpoint="{name}",le="{bound}"}} {count}')
+            lines.append(f'{METRIC_PREFIX}_page_latency_seconds_sum{{endpoint="{name}"}} {stats["latency_seconds_sum"]}')
+            lines.append(f'{METRIC_PREFIX}_page_latency_seconds_count{{endpoint="{name}"}} {stats["requests"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        write_atomic(path, self.prometheus_text())
+
+    def print_summary(self):
+        summary = self.summary()
+        print(">> Metrik run")
+        for name, seconds in summary['stages'].items():
+            print(f"   {name:<24} {seconds:>8.2f}s")
+        for name, stats in summary['endpoints'].items():
+            print(f"   {name}: {stats['requests']} request, {stats['retries']} retry, {stats['rate_limited']}x 429, "
+                  f"{stats['bytes'] / 1024:,.0f} KB, {stats['records']} record ({stats['records_per_second']:,.0f}/s), "
+                  f"latency rata-rata {stats['latency_seconds_mean'] * 1000:.0f} ms")
+
+def write_atomic(path, text):
+    """Tulis ke file sementara lalu rename, supaya collector tidak membaca file setengah jadi"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+metrics = Metrics()  # Instance bersama untuk satu proses
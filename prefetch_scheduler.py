@@ -0,0 +1,296 @@
+import time
+import calendar
+import argparse
+from datetime import date, datetime, timedelta, time as clock_time
+
+import api_client
+from api_client import MAX_CONCURRENCY, PageFetchFailed
+from range_sharding import fetch_sharded
+from response_cache import WIB
+from transaction_store import TransactionStore, DEFAULT_DB_PATH, ENDPOINT_TABLES, record_amount
+
+# Prefetch malam hari: setelah jam tutup, hari yang sudah tutup di-fetch sekali lalu total per cabang per endpoint
+# di-materialize ke store lokal, bersama total bulan & tahun. Siang hari cukup hari ini yang di-fetch (totals()).
+# Jam dipisah (SystemClock / FakeClock), jadi jadwal bisa diuji dengan stand-in API tanpa menunggu malam.
+# Cache disk menilai immutable dari tanggal WIB asli, bukan jam scheduler: fetch ulang settle dan hari yang belum
+# tutup selalu langsung ke API, supaya input kasir yang telat tidak tertutup halaman lama di cache.
+
+CLOSING_TIME = "21:00"  # Jam tutup cabang (WIB); hari ini dianggap tutup setelah jam ini
+SETTLE_DAYS = 1  # Hari tutup di-fetch ulang sekali lagi N malam kemudian (koreksi / input telat kasir)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS closed_days (
+    tanggal TEXT PRIMARY KEY,
+    materialized_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS closed_day_totals (
+    endpoint TEXT NOT NULL,
+    nama_clinic TEXT NOT NULL,
+    tanggal TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (endpoint, nama_clinic, tanggal)
+);
+CREATE INDEX IF NOT EXISTS idx_closed_day_totals_tanggal ON closed_day_totals (tanggal);
+
+CREATE TABLE IF NOT EXISTS period_totals (
+    endpoint TEXT NOT NULL,
+    nama_clinic TEXT NOT NULL,
+    periode TEXT NOT NULL,
+    total REAL NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (endpoint, nama_clinic, periode)
+);
+"""
+
+class SystemClock:
+    def now(self):
+        return datetime.now(WIB)
+
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class FakeClock:
+    """Jam palsu untuk uji: sleep() langsung memajukan waktu"""
+
+    def __init__(self, start):
+        self.current = start if start.tzinfo else start.replace(tzinfo=WIB)
+
+    def now(self):
+        return self.current
+
+    def sleep(self, seconds):
+        self.current += timedelta(seconds=seconds)
+
+def parse_clock_time(value):
+    hours, minutes = value.split(':')
+    return clock_time(int(hours), int(minutes))
+
+def consecutive_ranges(days):
+    """['2025-12-01', '2025-12-02', '2025-12-05'] -> [('2025-12-01', '2025-12-02'), ('2025-12-05', '2025-12-05')]"""
+    ranges = []
+    for day in sorted(days):
+        if ranges and date.fromisoformat(ranges[-1][1]) + timedelta(days=1) == date.fromisoformat(day):
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+def period_days(periode):
+    """Jumlah hari periode 'YYYY-MM' atau 'YYYY'"""
+    if len(periode) == 7:
+        return calendar.monthrange(int(periode[:4]), int(periode[5:]))[1]
+    return 366 if calendar.isleap(int(periode)) else 365
+
+class PrefetchScheduler:
+    """Materialize hari tutup ke TransactionStore (raw + total per hari / bulan / tahun) tiap malam"""
+
+    def __init__(self, store, clock=None, closing_time=CLOSING_TIME, dari_tanggal=None, settle_days=SETTLE_DAYS,
+                 max_workers=MAX_CONCURRENCY):
+        self.store = store
+        self.clock = clock or SystemClock()
+        self.closing_time = parse_clock_time(closing_time)
+        self.dari_tanggal = dari_tanggal  # Awal backfill; default 1 Januari tahun berjalan
+        self.settle_days = settle_days
+        self.max_workers = max_workers
+        with store.lock, store.conn:
+            store.conn.executescript(SCHEMA)
+
+    def closing_at(self, day):
+        return datetime.combine(day, self.closing_time, tzinfo=self.clock.now().tzinfo)
+
+    def last_closed_day(self, now=None):
+        now = now or self.clock.now()
+        return now.date() if now >= self.closing_at(now.date()) else now.date() - timedelta(days=1)
+
+    def next_run(self, now=None):
+        """Jam tutup berikutnya (hari ini kalau belum lewat, kalau sudah besok)"""
+        now = now or self.clock.now()
+        closing = self.closing_at(now.date())
+        return closing if now < closing else closing + timedelta(days=1)
+
+    def pending_days(self, now=None):
+        """Hari tutup yang belum di-materialize, atau di-materialize sebelum masa settle-nya lewat"""
+        now = now or self.clock.now()
+        last_closed = self.last_closed_day(now)
+        start = date.fromisoformat(self.dari_tanggal) if self.dari_tanggal else date(last_closed.year, 1, 1)
+        with self.store.lock:
+            materialized = dict(self.store.conn.execute(
+                "SELECT tanggal, materialized_at FROM closed_days WHERE tanggal BETWEEN ? AND ?",
+                (start.isoformat(), last_closed.isoformat()),
+            ).fetchall())
+        pending = []
+        day = start
+        while day <= last_closed:
+            final_after = self.closing_at(day + timedelta(days=self.settle_days))
+            materialized_at = materialized.get(day.isoformat())
+            if materialized_at is None or (datetime.fromisoformat(materialized_at) < final_after <= now):
+                pending.append(day.isoformat())
+            day += timedelta(days=1)
+        return pending
+
+    def materialize(self, days):
+        """Fetch ulang hari-hari ini (raw ke store), lalu tulis total per (endpoint, cabang, hari).
+        Rentang yang ada request gagal tidak ditandai tutup, dicoba lagi run berikutnya. Return hari yang berhasil.
+        Hari yang sudah pernah di-materialize (fetch ulang settle) dilewatkan dari cache disk"""
+        settling = set()
+        if days:
+            with self.store.lock:
+                settling = {row[0] for row in self.store.conn.execute(
+                    "SELECT tanggal FROM closed_days WHERE tanggal BETWEEN ? AND ?", (min(days), max(days)))} & set(days)
+        batches = [(day_range, True) for day_range in consecutive_ranges(set(days) - settling)]
+        batches += [(day_range, False) for day_range in consecutive_ranges(settling)]
+
+        done = []
+        for (dari_tanggal, sampai_tanggal), cached in batches:
+            failures_before = api_client.failure_count
+            params = {'dari_tanggal': dari_tanggal, 'sampai_tanggal': sampai_tanggal}
+            try:
+                fetched = {endpoint: fetch_sharded(endpoint, params, max_workers=self.max_workers, cached=cached)
+                           for endpoint in ENDPOINT_TABLES}
+            except PageFetchFailed:
+                fetched = None
+            if fetched is None or api_client.failure_count != failures_before:
+                print(f"   ⚠️  {dari_tanggal} s/d {sampai_tanggal}: ada request gagal, dicoba lagi run berikutnya")
+                continue
+
+            for endpoint, records in fetched.items():
+                self.store.delete_range(endpoint, dari_tanggal, sampai_tanggal)
+                self.store.upsert(endpoint, records)
+            range_days = [day for day in days if dari_tanggal <= day <= sampai_tanggal]
+            materialized_at = self.clock.now().isoformat(timespec='seconds')
+            with self.store.lock, self.store.conn:
+                conn = self.store.conn
+                conn.execute("DELETE FROM closed_day_totals WHERE tanggal BETWEEN ? AND ?", (dari_tanggal, sampai_tanggal))
+                for endpoint, table in ENDPOINT_TABLES.items():
+                    conn.execute(
+                        f"INSERT INTO closed_day_totals SELECT ?, nama_clinic, tanggal, SUM(total_sen) / 100.0, COUNT(*) FROM {table} "
+                        "WHERE tanggal BETWEEN ? AND ? AND nama_clinic IS NOT NULL AND nama_clinic != '' "
+                        "GROUP BY nama_clinic, tanggal",
+                        (endpoint, dari_tanggal, sampai_tanggal),
+                    )
+                conn.executemany("INSERT OR REPLACE INTO closed_days VALUES (?, ?)", [(day, materialized_at) for day in range_days])
+            done.extend(range_days)
+
+        self.refresh_periods({day[:7] for day in done} | {day[:4] for day in done})
+        return done
+
+    def refresh_periods(self, periods):
+        """Hitung ulang total bulan ('YYYY-MM') / tahun ('YYYY') dari total harian hari tutup"""
+        with self.store.lock, self.store.conn:
+            for periode in periods:
+                self.store.conn.execute("DELETE FROM period_totals WHERE periode = ?", (periode,))
+                self.store.conn.execute(
+                    "INSERT INTO period_totals SELECT endpoint, nama_clinic, ?, SUM(total), SUM(count) "
+                    "FROM closed_day_totals WHERE tanggal LIKE ? GROUP BY endpoint, nama_clinic",
+                    (periode, f"{periode}%"),
+                )
+
+    def complete_periods(self, dari_tanggal, sampai_tanggal):
+        """Periode (tahun lalu bulan) yang seluruhnya di dalam rentang dan semua harinya sudah tutup"""
+        with self.store.lock:
+            counts = dict(self.store.conn.execute(
+                "SELECT substr(tanggal, 1, 7), COUNT(*) FROM closed_days WHERE tanggal BETWEEN ? AND ? GROUP BY 1",
+                (dari_tanggal, sampai_tanggal),
+            ).fetchall())
+        months = [month for month, count in counts.items() if count == period_days(month)
+                  and f"{month}-01" >= dari_tanggal and f"{month}-{period_days(month):02d}" <= sampai_tanggal]
+        years = {month[:4] for month in months if sum(m[:4] == month[:4] for m in months) == 12}
+        return sorted(years) + sorted(month for month in months if month[:4] not in years)
+
+    def run_once(self):
+        """Satu run malam: materialize semua hari tutup yang tertunda"""
+        now = self.clock.now()
+        days = self.pending_days(now)
+        if not days:
+            print(f">> Prefetch {now:%Y-%m-%d %H:%M}: semua hari tutup sudah ter-materialize")
+            return []
+        requests_before = api_client.request_count
+        print(f">> Prefetch {now:%Y-%m-%d %H:%M}: {len(days)} hari ({days[0]} s/d {days[-1]})")
+        done = self.materialize(days)
+        print(f"   ✅ {len(done)} hari di-materialize, {api_client.request_count - requests_before} request")
+        return done
+
+    def run_forever(self, runs=None):
+        """Tidur sampai jam tutup berikutnya lalu run_once, berulang (runs: batas jumlah run, untuk uji)"""
+        completed = 0
+        while runs is None or completed < runs:
+            wait = (self.next_run() - self.clock.now()).total_seconds()
+            self.clock.sleep(max(wait, 0))
+            try:
+                self.run_once()
+            except Exception as e:  # Run gagal: hari tetap tertunda, diulang malam berikutnya
+                print(f"   ❌ Prefetch gagal: {e}")
+            completed += 1
+
+    def totals(self, dari_tanggal, sampai_tanggal):
+        """{nama_clinic: {endpoint: total}} rentang tanggal: bulan / tahun utuh dari period_totals, hari tutup lain dari
+        closed_day_totals, hanya hari yang belum tutup (biasanya hari ini) yang di-fetch ke API"""
+        totals = {}
+
+        def add(rows):
+            for endpoint, nama_clinic, total in rows:
+                clinic_totals = totals.setdefault(nama_clinic, {})
+                clinic_totals[endpoint] = clinic_totals.get(endpoint, 0.0) + total
+
+        periods = self.complete_periods(dari_tanggal, sampai_tanggal)
+        with self.store.lock:
+            closed = {row[0] for row in self.store.conn.execute(
+                "SELECT tanggal FROM closed_days WHERE tanggal BETWEEN ? AND ?", (dari_tanggal, sampai_tanggal))}
+            for periode in periods:
+                add(self.store.conn.execute(
+                    "SELECT endpoint, nama_clinic, total FROM period_totals WHERE periode = ?", (periode,)).fetchall())
+            rest = sorted(day for day in closed if not any(day.startswith(periode) for periode in periods))
+            for day_start, day_end in consecutive_ranges(rest):
+                add(self.store.conn.execute(
+                    "SELECT endpoint, nama_clinic, SUM(total) FROM closed_day_totals WHERE tanggal BETWEEN ? AND ? "
+                    "GROUP BY endpoint, nama_clinic", (day_start, day_end)).fetchall())
+
+        open_days = []
+        day = date.fromisoformat(dari_tanggal)
+        while day <= date.fromisoformat(sampai_tanggal):
+            if day.isoformat() not in closed:
+                open_days.append(day.isoformat())
+            day += timedelta(days=1)
+        for day_start, day_end in consecutive_ranges(open_days):
+            for endpoint in ENDPOINT_TABLES:
+                records = fetch_sharded(endpoint, {'dari_tanggal': day_start, 'sampai_tanggal': day_end},
+                                        max_workers=self.max_workers, cached=False)
+                add([(endpoint, *row) for row in self.live_totals(endpoint, records)])
+        return totals
+
+    def live_totals(self, endpoint, records):
+        """(nama_clinic, total) record hari yang belum tutup, aturan nominal sama dengan store"""
+        sums = {}
+        for record in records:
+            nama_clinic = record.get('nama_clinic') or record.get('nama_klinik') or record.get('klinik')
+            if nama_clinic:
+                sums[nama_clinic] = sums.get(nama_clinic, 0.0) + record_amount(endpoint, record)
+        return sums.items()
+
+def main():
+    parser = argparse.ArgumentParser(description="Prefetch malam: materialize total hari tutup, bulan, dan tahun ke store lokal")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="File store SQLite")
+    parser.add_argument("--closing", default=CLOSING_TIME, help="Jam tutup WIB (HH:MM)")
+    parser.add_argument("--dari", help="Awal backfill (YYYY-MM-DD), default 1 Januari tahun berjalan")
+    parser.add_argument("--settle-days", type=int, default=SETTLE_DAYS, help="Fetch ulang hari tutup N malam kemudian")
+    parser.add_argument("--once", action="store_true", help="Satu run sekarang lalu keluar")
+    parser.add_argument("--fake-now", help="Jam palsu awal (YYYY-MM-DDTHH:MM), untuk uji dengan stand-in API")
+    parser.add_argument("--runs", type=int, help="Berhenti setelah N run (default terus jalan)")
+    args = parser.parse_args()
+
+    clock = FakeClock(datetime.fromisoformat(args.fake_now)) if args.fake_now else SystemClock()
+    store = TransactionStore(args.db)
+    try:
+        scheduler = PrefetchScheduler(store, clock, args.closing, args.dari, args.settle_days)
+        if args.once:
+            scheduler.run_once()
+        else:
+            print(f">> Scheduler jalan, run berikutnya {scheduler.next_run():%Y-%m-%d %H:%M}")
+            scheduler.run_forever(args.runs)
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+import os
+import sys
+import time
+import cProfile
+import threading
+
+from metrics import metrics
+
+# Profiling per stage untuk compare_settlement_fixed --profile.
+# cProfile per stage (thread utama, dibuka dengan snakeviz / pstats) + sampling profiler semua thread
+# (fetch jalan di ThreadPoolExecutor) yang ditulis sebagai collapsed stacks untuk flamegraph.pl / speedscope.
+
+SAMPLE_INTERVAL = 0.005  # Detik antar sampel stack
+MAX_STACK_DEPTH = 128
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def collapse_stack(frame):
+    """Stack frame (root dulu) dalam format collapsed: 'a;b;c'"""
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class StageProfiler:
+    """Dipasang ke metrics.stage: tiap stage diprofile cProfile, semua thread disampel selama run"""
+
+    def __init__(self, output_dir, interval=SAMPLE_INTERVAL):
+        self.output_dir = output_dir
+        self.interval = interval
+        self.stack = []  # [(nama stage, cProfile.Profile)] untuk stage bersarang
+        self.samples = {}  # (stage, collapsed stack) -> jumlah sampel
+        self.files = []
+        self.lock = threading.Lock()  # stack diubah thread utama, samples ditulis thread sampler
+        self.stop_event = threading.Event()
+        self.sampler = None
+
+    def start(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        metrics.stage_hooks.append(self)
+        self.sampler = threading.Thread(target=self.sample_loop, name="stage-profiler", daemon=True)
+        self.sampler.start()
+
+    def stop(self):
+        """Hentikan sampler dan tulis file collapsed stacks; return daftar file yang ditulis"""
+        self.stop_event.set()
+        self.sampler.join()
+        metrics.stage_hooks.remove(self)
+
+        with self.lock:
+            stages = sorted({stage for stage, _ in self.samples})
+        for stage in stages:
+            self.write_folded(os.path.join(self.output_dir, f"{stage}.folded"), stage)
+        self.write_folded(os.path.join(self.output_dir, "combined.folded"))
+        return self.files
+
+    def enter_stage(self, name):
+        # cProfile hanya satu per thread: profile stage luar dijeda selama stage dalam berjalan
+        profile = cProfile.Profile()
+        with self.lock:
+            if self.stack:
+                self.stack[-1][1].disable()
+            self.stack.append((name, profile))
+        profile.enable()
+
+    def exit_stage(self, name):
+        with self.lock:
+            _, profile = self.stack.pop()
+            outer = self.stack[-1][1] if self.stack else None
+        profile.disable()
+        path = os.path.join(self.output_dir, f"{name}.prof")
+        profile.dump_stats(path)
+        self.files.append(path)
+        if outer is not None:
+            outer.enable()
+
+    def sample_loop(self):
+        own_thread = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            with self.lock:
+                stage = self.stack[-1][0] if self.stack else "other"
+            stacks = [collapse_stack(frame) for thread_id, frame in sys._current_frames().items() if thread_id != own_thread]
+            with self.lock:
+                for stack in stacks:
+                    key = (stage, stack)
+                    self.samples[key] = self.samples.get(key, 0) + 1
+
+    def write_folded(self, path, stage=None):
+        """Satu baris per stack: 'stage;frame;frame count' (stage=None: semua stage digabung)"""
+        with self.lock:
+            samples = sorted(self.samples.items())
+        with open(path, 'w', encoding='utf-8') as f:
+            for (sample_stage, stack), count in samples:
+                if stage is None:
+                    f.write(f"{sample_stage};{stack} {count}\n")
+                elif sample_stage == stage:
+                    f.write(f"{stack} {count}\n")
+        self.files.append(path)
+
+def default_output_dir():
+    return os.path.join("profiles", time.strftime("%Y%m%d-%H%M%S"))
@@ -0,0 +1,177 @@
+import time
+import bisect
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import api_client
+from api_client import MAX_CONCURRENCY
+from aggregation import DATE_FIELDS, CLINIC_FIELDS, first_value, parse_rupiah_sen
+from leaderboard import fetch_clinics, leaderboard_rows, print_leaderboard
+from leaderboard_engine import LEADERBOARD_AMOUNT_FIELDS
+from range_sharding import iter_sharded_pages
+from response_cache import LIVE_TTL, today_wib
+from transactions import day_ordinal, ordinal_date
+
+# Cache rentang tanggal: total per (endpoint, cabang, hari) + index interval hari yang sudah tercakup per endpoint.
+# Query rentang apa pun (1-31 Des, lalu 15-20 Des, lalu 20 Nov - 10 Des) dijawab dari hari yang sudah ada,
+# hanya celahnya yang di-fetch lalu digabung. Hari tutup (sebelum hari ini WIB) tidak berubah; hari ini dan
+# sesudahnya di-fetch ulang setelah live_ttl, sama seperti cache disk (response_cache).
+
+class IntervalIndex:
+    """Interval hari (ordinal) yang tercakup: terurut, tidak overlap, interval bersebelahan digabung"""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    @property
+    def n_days(self):
+        return sum(end - start + 1 for start, end in zip(self.starts, self.ends))
+
+    def add(self, start, end):
+        i = bisect.bisect_left(self.ends, start - 1)  # Interval pertama yang menyentuh / setelah start
+        j = bisect.bisect_right(self.starts, end + 1)  # Interval sesudah j tidak menyentuh end
+        if i < j:
+            start, end = min(start, self.starts[i]), max(end, self.ends[j - 1])
+        self.starts[i:j] = [start]
+        self.ends[i:j] = [end]
+
+    def gaps(self, start, end):
+        """Sub-rentang [start, end] yang belum tercakup: [(awal, akhir)]"""
+        gaps = []
+        cursor = start
+        i = bisect.bisect_left(self.ends, start)
+        while cursor <= end and i < len(self.starts) and self.starts[i] <= end:
+            if self.starts[i] > cursor:
+                gaps.append((cursor, self.starts[i] - 1))
+            cursor = max(cursor, self.ends[i] + 1)
+            i += 1
+        if cursor <= end:
+            gaps.append((cursor, end))
+        return gaps
+
+class RangeCache:
+    """Leaderboard rentang tanggal dari total harian yang sudah di-fetch; hanya celah yang ke API"""
+
+    def __init__(self, today=today_wib, live_ttl=LIVE_TTL, max_workers=MAX_CONCURRENCY):
+        self.today = today  # Fungsi tanggal hari ini (bisa diganti untuk uji dengan data stand-in)
+        self.live_ttl = live_ttl
+        self.max_workers = max_workers
+        self.days = {endpoint: {} for endpoint in LEADERBOARD_AMOUNT_FIELDS}  # endpoint -> {ordinal hari: {nama_clinic: sen}}
+        self.covered = {endpoint: IntervalIndex() for endpoint in LEADERBOARD_AMOUNT_FIELDS}  # Hari tutup
+        self.live = {endpoint: {} for endpoint in LEADERBOARD_AMOUNT_FIELDS}  # Hari belum tutup -> waktu fetch (monotonic)
+        self.lock = threading.Lock()
+        self.days_fetched = 0
+        self.days_cached = 0
+
+    def missing(self, endpoint, start, end):
+        """Celah (ordinal awal, akhir) rentang yang belum bisa dijawab dari cache"""
+        today = day_ordinal(self.today())
+        now = time.monotonic()
+        with self.lock:
+            gaps = self.covered[endpoint].gaps(start, min(end, today - 1)) if start < today else []
+            live = self.live[endpoint]
+            for day in range(max(start, today), end + 1):
+                if day in live and now - live[day] < self.live_ttl:
+                    continue
+                if gaps and gaps[-1][1] == day - 1:
+                    gaps[-1] = (gaps[-1][0], day)
+                else:
+                    gaps.append((day, day))
+        return gaps
+
+    def fetch_gap(self, endpoint, start, end):
+        """Fetch satu celah, bucket per (hari, cabang), ganti isi cache hari-hari itu.
+        Return {nama_clinic: sen} record yang tidak bisa di-bucket ke hari dalam celah (ikut jawaban, tidak di-cache).
+        Halaman yang gagal (termasuk baca ulang) di-raise sebagai PageFetchFailed oleh walk celah ini sendiri,
+        jadi tidak ada yang di-cache dan tidak terpengaruh request gagal endpoint lain yang jalan bersamaan"""
+        field = LEADERBOARD_AMOUNT_FIELDS[endpoint]
+        params = {'dari_tanggal': ordinal_date(start), 'sampai_tanggal': ordinal_date(end)}
+        sums, unbucketed = {}, {}
+        for records in iter_sharded_pages(endpoint, params, shard_days=end - start + 1, max_workers=self.max_workers):
+            for record in records:
+                nama_clinic = first_value(record, CLINIC_FIELDS)
+                if not nama_clinic:
+                    continue
+                day = day_ordinal(first_value(record, DATE_FIELDS))
+                bucket = sums.setdefault(day, {}) if start <= day <= end else unbucketed
+                bucket[nama_clinic] = bucket.get(nama_clinic, 0) + parse_rupiah_sen(record.get(field))
+        # Ada record tanpa tanggal: hasil dipakai untuk jawaban ini saja, celah di-fetch lagi nanti
+        complete = not unbucketed
+
+        today = day_ordinal(self.today())
+        with self.lock:
+            days = self.days[endpoint]
+            for day in range(start, end + 1):
+                days.pop(day, None)
+            days.update(sums)
+            self.days_fetched += end - start + 1
+            if complete:
+                if start < today:
+                    self.covered[endpoint].add(start, min(end, today - 1))
+                fetched_at = time.monotonic()
+                for day in range(max(start, today), end + 1):
+                    self.live[endpoint][day] = fetched_at
+        return unbucketed
+
+    def totals(self, dari_tanggal, sampai_tanggal):
+        """{endpoint: {nama_clinic: sen}} rentang tanggal; celah kedua endpoint di-fetch paralel"""
+        start, end = day_ordinal(dari_tanggal), day_ordinal(sampai_tanggal)
+        if not start or not end:
+            raise ValueError(f"Rentang tidak valid: {dari_tanggal} s/d {sampai_tanggal}")
+
+        def fill(endpoint):
+            totals = {}
+            gaps = self.missing(endpoint, start, end)
+            for gap_start, gap_end in gaps:
+                for nama_clinic, sen in self.fetch_gap(endpoint, gap_start, gap_end).items():
+                    totals[nama_clinic] = totals.get(nama_clinic, 0) + sen
+            with self.lock:
+                self.days_cached += (end - start + 1) - sum(gap_end - gap_start + 1 for gap_start, gap_end in gaps)
+                days = self.days[endpoint]
+                for day in range(start, end + 1):
+                    for nama_clinic, sen in days.get(day, {}).items():
+                        totals[nama_clinic] = totals.get(nama_clinic, 0) + sen
+            return totals
+
+        with ThreadPoolExecutor(max_workers=len(LEADERBOARD_AMOUNT_FIELDS)) as pool:
+            return dict(zip(LEADERBOARD_AMOUNT_FIELDS, pool.map(fill, LEADERBOARD_AMOUNT_FIELDS)))
+
+    def leaderboard(self, dari_tanggal, sampai_tanggal, clinics):
+        """Baris /api/sales (id, name, total, productTotal, treatmentTotal) rentang tanggal"""
+        produk, perawatan = self.totals(dari_tanggal, sampai_tanggal).values()
+        return leaderboard_rows(clinics, produk, perawatan)
+
+def parse_range(value):
+    """'2025-12-01:2025-12-31' -> ('2025-12-01', '2025-12-31'); satu tanggal = satu hari"""
+    dari_tanggal, _, sampai_tanggal = value.partition(':')
+    return dari_tanggal, sampai_tanggal or dari_tanggal
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard beberapa rentang tanggal berurutan; hari yang sudah di-fetch dipakai ulang")
+    parser.add_argument("ranges", nargs='+', type=parse_range, help="Rentang DARI:SAMPAI (YYYY-MM-DD:YYYY-MM-DD)")
+    parser.add_argument("--today", help="Tanggal acuan (YYYY-MM-DD), default hari ini WIB")
+    parser.add_argument("--refresh", action="store_true", help="Abaikan cache API di disk dan fetch ulang")
+    args = parser.parse_args()
+    api_client.response_cache.refresh = args.refresh
+
+    cache = RangeCache(today=(lambda: args.today) if args.today else today_wib)
+    clinics = fetch_clinics()
+    for dari_tanggal, sampai_tanggal in args.ranges:
+        gaps = {endpoint: cache.missing(endpoint, day_ordinal(dari_tanggal), day_ordinal(sampai_tanggal))
+                for endpoint in LEADERBOARD_AMOUNT_FIELDS}
+        requests_before = api_client.request_count
+        started = time.perf_counter()
+        rows = cache.leaderboard(dari_tanggal, sampai_tanggal, clinics)
+        fetched = sorted({(ordinal_date(start), ordinal_date(end)) for endpoint_gaps in gaps.values() for start, end in endpoint_gaps})
+        print(f">> {dari_tanggal} s/d {sampai_tanggal}: {api_client.request_count - requests_before} request, "
+              f"{time.perf_counter() - started:.2f}s, celah di-fetch: {', '.join(f'{start} s/d {end}' for start, end in fetched) or '-'}")
+        print_leaderboard(rows)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+from collections import deque
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from api_client import iter_pages, PageLimitReached, MAX_CONCURRENCY, MAX_PAGES
+
+# Pecah rentang dari_tanggal..sampai_tanggal jadi shard kecil yang di-fetch paralel.
+# Shard yang masih melebihi batas halaman dipecah lagi, shard yang halamannya gagal di-raise (PageFetchFailed),
+# jadi total tidak pernah terpotong diam-diam.
+DEFAULT_SHARD_DAYS = 1
+PAGE_WORKERS_PER_SHARD = 2
+
+def parse_date(value):
+    return date.fromisoformat(str(value)[:10])
+
+def split_range(dari_tanggal, sampai_tanggal, shard_days=DEFAULT_SHARD_DAYS):
+    """Pecah rentang jadi list (dari, sampai) berurutan, masing-masing maksimal shard_days hari"""
+    start, end = parse_date(dari_tanggal), parse_date(sampai_tanggal)
+    shards = []
+    while start <= end:
+        shard_end = min(start + timedelta(days=shard_days - 1), end)
+        shards.append((start.isoformat(), shard_end.isoformat()))
+        start = shard_end + timedelta(days=1)
+    return shards
+
+def bisect_range(dari_tanggal, sampai_tanggal):
+    """Bagi rentang jadi dua bagian, atau None kalau tinggal satu hari"""
+    start, end = parse_date(dari_tanggal), parse_date(sampai_tanggal)
+    if start >= end:
+        return None
+    middle = start + (end - start) // 2
+    return (start.isoformat(), middle.isoformat()), ((middle + timedelta(days=1)).isoformat(), end.isoformat())
+
+def fetch_shard(endpoint, params, max_pages=MAX_PAGES, page_workers=PAGE_WORKERS_PER_SHARD, cached=True):
+    """Semua record satu shard; kalau lebih dari max_pages halaman, shard dipecah dua (rekursif).
+    Raise PageFetchFailed kalau ada halaman yang gagal setelah semua retry"""
+    halves = bisect_range(params['dari_tanggal'], params['sampai_tanggal'])
+    if halves is None:
+        # Satu hari tidak bisa dipecah lagi: langsung walk tanpa batas halaman, tidak ada halaman yang di-fetch dua kali
+        max_pages = float('inf')
+    try:
+        return [record for page in iter_pages(endpoint, params, page_workers, max_pages, strict=True, cached=cached) for record in page]
+    except PageLimitReached:
+        print(f"   ✂️  {endpoint} {params['dari_tanggal']}..{params['sampai_tanggal']} > {max_pages} halaman, dipecah jadi 2 shard")
+        records = []
+        for dari_tanggal, sampai_tanggal in halves:
+            shard_params = {**params, 'dari_tanggal': dari_tanggal, 'sampai_tanggal': sampai_tanggal}
+            records.extend(fetch_shard(endpoint, shard_params, max_pages, page_workers, cached))
+        return records
+
+def iter_sharded_pages(endpoint, params, shard_days=DEFAULT_SHARD_DAYS, max_workers=MAX_CONCURRENCY, max_pages=MAX_PAGES,
+                       cached=True):
+    """Generator record per shard (urut tanggal); maksimal max_workers shard di-fetch bersamaan.
+    Shard yang gagal tidak dilewati: PageFetchFailed diteruskan ke pemanggil. cached=False: lewati cache disk"""
+    shards = deque(split_range(params['dari_tanggal'], params['sampai_tanggal'], shard_days))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()
+
+        def submit_next():
+            if shards:
+                dari_tanggal, sampai_tanggal = shards.popleft()
+                shard_params = {**params, 'dari_tanggal': dari_tanggal, 'sampai_tanggal': sampai_tanggal}
+                pending.append(pool.submit(fetch_shard, endpoint, shard_params, max_pages, PAGE_WORKERS_PER_SHARD, cached))
+
+        while len(pending) < max_workers and shards:
+            submit_next()
+
+        try:
+            while pending:
+                records = pending.popleft().result()
+                submit_next()
+                if records:
+                    yield records
+        finally:
+            for future in pending:
+                future.cancel()
+
+def fetch_sharded(endpoint, params, shard_days=DEFAULT_SHARD_DAYS, max_workers=MAX_CONCURRENCY, max_pages=MAX_PAGES, cached=True):
+    """Semua record rentang tanggal, di-fetch per shard secara paralel"""
+    return [record for records in iter_sharded_pages(endpoint, params, shard_days, max_workers, max_pages, cached) for record in records]
@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+# Engine rekonsiliasi settlement vs POS: satu matriks (cabang x tanggal) untuk masing-masing sumber,
+# selisih per sel / cabang / kategori / grand total dihitung vectorized sekali jalan.
+# Tampilan (print) ada di compare_settlement_fixed.compare_data.
+
+THRESHOLD = 1000  # Selisih di bawah Rp 1.000 dianggap match
+
+KATEGORI_BEAUTY_CENTER = 'beauty_center'
+KATEGORI_KLINIK = 'klinik'
+KATEGORI_LAINNYA = 'lainnya'
+KATEGORI = (KATEGORI_BEAUTY_CENTER, KATEGORI_KLINIK, KATEGORI_LAINNYA)
+
+BEAUTY_CENTER_PATTERN = r"Beauty Center|Rumah Cantik|Rumah cantik"
+KLINIK_PATTERN = r"Klinik|Clinic|Cinic"
+
+NAMA_BULAN_ID = {1: "Januari", 2: "Februari", 3: "Maret", 4: "April", 5: "Mei", 6: "Juni", 7: "Juli",
+                 8: "Agustus", 9: "September", 10: "Oktober", 11: "November", 12: "Desember"}
+
+def classify_branches(branches):
+    """Kategori per cabang (urutan sama dengan compare_data lama: Beauty Center dicek dulu)"""
+    names = pd.Series(branches, dtype=object)
+    return np.where(
+        names.str.contains(BEAUTY_CENTER_PATTERN),
+        KATEGORI_BEAUTY_CENTER,
+        np.where(names.str.contains(KLINIK_PATTERN), KATEGORI_KLINIK, KATEGORI_LAINNYA),
+    ).astype(object)
+
+def fill_matrix(data, branch_index, date_index):
+    """{cabang: {tanggal: total}} -> matriks float (cabang x tanggal)"""
+    rows, cols, values = [], [], []
+    for cabang, per_tanggal in data.items():
+        row = branch_index[cabang]
+        for tanggal, total in per_tanggal.items():
+            rows.append(row)
+            cols.append(date_index[tanggal])
+            values.append(total)
+    matrix = np.zeros((len(branch_index), len(date_index)))
+    np.add.at(matrix, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), np.asarray(values, dtype=float))
+    return matrix
+
+def period_label(dates):
+    """'Desember 2025' kalau semua tanggal dalam satu bulan, selain itu rentang tanggal"""
+    if not len(dates):
+        return "-"
+    months = {tanggal[:7] for tanggal in dates}
+    if len(months) == 1:
+        year, month = next(iter(months)).split('-')
+        return f"{NAMA_BULAN_ID[int(month)]} {year}"
+    return f"{dates[0]} s/d {dates[-1]}"
+
+class ReconciliationResult:
+    """Hasil rekonsiliasi terstruktur; matriks sejajar dengan `branches` (baris) dan `dates` (kolom)"""
+
+    def __init__(self, branches, dates, settlement, pos, threshold=THRESHOLD):
+        self.branches = branches
+        self.dates = dates
+        self.threshold = threshold
+        self.category = classify_branches(branches)
+        self.settlement = settlement
+        self.pos = pos
+        self.diff = settlement - pos
+
+        # Level cabang: jumlah per baris
+        self.branch_settlement = settlement.sum(axis=1)
+        self.branch_pos = pos.sum(axis=1)
+        self.branch_diff = self.branch_settlement - self.branch_pos
+
+        # Level kategori: bincount dengan kode kategori sebagai kunci
+        codes = np.array([KATEGORI.index(c) for c in self.category], dtype=np.intp)
+        self.category_totals = {
+            kategori: {'settlement': float(settlement_total), 'pos': float(pos_total), 'selisih': float(settlement_total - pos_total)}
+            for kategori, settlement_total, pos_total in zip(
+                KATEGORI,
+                np.bincount(codes, weights=self.branch_settlement, minlength=len(KATEGORI)),
+                np.bincount(codes, weights=self.branch_pos, minlength=len(KATEGORI)),
+            )
+        }
+        self.grand_total = {
+            'settlement': float(self.branch_settlement.sum()),
+            'pos': float(self.branch_pos.sum()),
+            'selisih': float(self.branch_diff.sum()),
+        }
+
+    @property
+    def period(self):
+        return period_label(self.dates)
+
+    def flagged_branches(self, kategori):
+        """Cabang satu kategori dengan selisih total > threshold, urut nama"""
+        mask = (self.category == kategori) & (np.abs(self.branch_diff) > self.threshold)
+        return [
+            {'cabang': self.branches[i], 'total_csv': float(self.branch_settlement[i]),
+             'total_api': float(self.branch_pos[i]), 'selisih': float(self.branch_diff[i])}
+            for i in np.flatnonzero(mask)
+        ]
+
+    def flagged_cells(self, kategori=None):
+        """Sel (cabang, tanggal) dengan selisih harian > threshold, untuk drill-down"""
+        mask = np.abs(self.diff) > self.threshold
+        if kategori is not None:
+            mask &= (self.category == kategori)[:, None]
+        return [
+            {'cabang': self.branches[row], 'tanggal': self.dates[col], 'settlement': float(self.settlement[row, col]),
+             'pos': float(self.pos[row, col]), 'selisih': float(self.diff[row, col])}
+            for row, col in zip(*np.nonzero(mask))
+        ]
+
+    def to_dict(self):
+        """Bentuk JSON-friendly (tanpa matriks penuh)"""
+        return {
+            'period': self.period,
+            'threshold': self.threshold,
+            'grand_total': self.grand_total,
+            'categories': self.category_totals,
+            'branches': [
+                {'cabang': cabang, 'kategori': kategori, 'total_csv': float(settlement_total),
+                 'total_api': float(pos_total), 'selisih': float(selisih)}
+                for cabang, kategori, settlement_total, pos_total, selisih in zip(
+                    self.branches, self.category, self.branch_settlement, self.branch_pos, self.branch_diff)
+            ],
+            'flagged_cells': self.flagged_cells(),
+        }
+
+def reconcile(csv_data, api_data, threshold=THRESHOLD):
+    """Sejajarkan settlement (csv_data) dan POS (api_data) ke matriks (cabang x tanggal) lalu hitung selisihnya"""
+    branches = sorted(set(csv_data) | set(api_data))
+    dates = sorted({tanggal for data in (csv_data, api_data) for per_tanggal in data.values() for tanggal in per_tanggal})
+    branch_index = {cabang: i for i, cabang in enumerate(branches)}
+    date_index = {tanggal: i for i, tanggal in enumerate(dates)}
+    return ReconciliationResult(
+        branches,
+        dates,
+        fill_matrix(csv_data, branch_index, date_index),
+        fill_matrix(api_data, branch_index, date_index),
+        threshold,
+    )
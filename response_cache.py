@@ -0,0 +1,94 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# Cache halaman API di disk (gzip). Query yang seluruhnya hari lalu dianggap tidak berubah lagi,
+# query yang mencakup hari ini hanya disimpan sebentar.
+DEFAULT_CACHE_DIR = os.path.join(".cache", "api")
+LIVE_TTL = 5 * 60  # Detik, sama dengan CACHE_DURATION di app/api/sales/route.js
+WIB = timezone(timedelta(hours=7))
+
+def today_wib():
+    """Tanggal hari ini (YYYY-MM-DD) zona WIB, sama seperti dashboard"""
+    return datetime.now(WIB).date().isoformat()
+
+def normalize_url(url, params=None):
+    """URL kanonik: host lowercase, query digabung dengan params lalu diurutkan"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query += [(key, str(value)) for key, value in (params or {}).items()]
+    return f"{parts.scheme}://{parts.netloc.lower()}{parts.path.rstrip('/')}?{urlencode(sorted(query))}"
+
+def is_immutable(normalized_url, today=None):
+    """True kalau query punya batas akhir tanggal dan batas itu sebelum hari ini"""
+    query = dict(parse_qsl(urlsplit(normalized_url).query))
+    sampai_tanggal = query.get('sampai_tanggal') or query.get('tanggal')
+    return bool(sampai_tanggal) and sampai_tanggal < (today or today_wib())
+
+class ResponseCache:
+    """Cache response JSON per URL ternormalisasi, disimpan sebagai file .json.gz"""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, live_ttl=LIVE_TTL, enabled=True, refresh=False):
+        self.directory = directory
+        self.live_ttl = live_ttl
+        self.enabled = enabled
+        self.refresh = refresh  # True: abaikan isi cache (tetap ditulis ulang dengan data baru)
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def path(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.json.gz")
+
+    def get(self, url, params=None):
+        """Data dari cache, atau None kalau tidak ada / kadaluarsa / mode refresh"""
+        if not self.enabled:
+            return None
+        key = normalize_url(url, params)
+        path = self.path(key)
+        if self.refresh or not os.path.exists(path):
+            self.count(hit=False)
+            return None
+        try:
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.count(hit=False)
+            return None
+
+        if not entry.get('immutable') and time.time() - entry.get('fetched_at', 0) > self.live_ttl:
+            self.count(hit=False)
+            return None
+        self.count(hit=True)
+        return entry['data']
+
+    def put(self, url, params, data):
+        """Simpan response; ditulis ke file sementara lalu di-rename supaya aman dari thread lain"""
+        if not self.enabled:
+            return
+        key = normalize_url(url, params)
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {
+            'url': key,
+            'fetched_at': time.time(),
+            'immutable': is_immutable(key),
+            'data': data,
+        }
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def count(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
@@ -0,0 +1,196 @@
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregation import DATE_FIELDS, CLINIC_FIELDS, first_value, parse_rupiah_sen, sen_to_rupiah
+from transactions import Interner, clinic_ids, day_ordinal, ordinal_date
+from transaction_store import TransactionStore, DEFAULT_DB_PATH, ENDPOINT_TABLES, AMOUNT_FIELDS
+
+# Cube pendapatan (OLAP sederhana) atas klinik x tanggal x metode_pembayaran x kasir x jenis (produk/perawatan).
+# Dibangun sekali jalan dari transaksi yang sudah di-fetch, disimpan sebagai base cuboid (satu baris per kombinasi
+# dimensi), jadi slice / dice / roll-up cukup filter + group by di array kecil, tanpa fetch ulang.
+
+DIMENSIONS = ('clinic', 'tanggal', 'metode', 'kasir', 'jenis')
+MEASURES = ('revenue', 'tax', 'discount', 'final', 'count')
+
+JENIS = {
+    "laporan-penjualan-produk": 'produk',
+    "laporan-penjualan-perawatan": 'perawatan',
+}
+KOSONG = '-'  # Nilai dimensi yang tidak ada di record (mis. perawatan tidak punya nama_kasir)
+
+def record_facts(endpoint, record):
+    """Nilai measure satu record dalam sen: (revenue, tax, discount, final)"""
+    revenue = 0
+    for field in AMOUNT_FIELDS.get(endpoint, ("total_bayar", "total", "nominal")):
+        if record.get(field):
+            revenue = parse_rupiah_sen(record[field])
+            break
+    tax = parse_rupiah_sen(record.get('tax_total'))
+    discount = parse_rupiah_sen(record.get('potongan'))
+    # Hanya field yang tidak ada / null yang jatuh ke revenue; "0.00" (potongan >= total) tetap final 0
+    final_pembayaran = record.get('final_pembayaran')
+    final = revenue if final_pembayaran is None else parse_rupiah_sen(final_pembayaran)
+    return revenue, tax, discount, final
+
+class RevenueCube:
+    """Base cuboid: kode dimensi (int) + measure (sen) per kombinasi unik, diisi per halaman / per endpoint"""
+
+    def __init__(self, clinics=None):
+        self.members = {
+            'clinic': clinics or clinic_ids,
+            'metode': Interner(),
+            'kasir': Interner(),
+            'jenis': Interner({1: 'produk', 2: 'perawatan'}),
+        }
+        self.codes = {dimension: np.empty(0, dtype=np.int64) for dimension in DIMENSIONS}
+        self.values = {measure: np.empty(0, dtype=np.int64) for measure in MEASURES}
+        self.pending = []  # Potongan baru yang belum digabung ke base cuboid
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, records):
+        """Tambahkan record satu endpoint (satu pass, hanya kode & measure yang disimpan)"""
+        jenis = self.members['jenis'].id(JENIS.get(endpoint, endpoint))
+        rows = []
+        for record in records:
+            tanggal = first_value(record, DATE_FIELDS)
+            rows.append((
+                self.members['clinic'].id(first_value(record, CLINIC_FIELDS) or KOSONG),
+                day_ordinal(tanggal),
+                self.members['metode'].id(record.get('metode_pembayaran') or KOSONG),
+                self.members['kasir'].id(record.get('nama_kasir') or KOSONG),
+                jenis,
+            ) + record_facts(endpoint, record) + (1,))
+        if rows:
+            with self.lock:
+                self.pending.append(np.array(rows, dtype=np.int64))
+
+    def consolidate(self):
+        """Gabungkan potongan baru ke base cuboid (group by semua dimensi)"""
+        with self.lock:
+            if not self.pending:
+                return
+            chunks = [np.column_stack([self.codes[d] for d in DIMENSIONS] + [self.values[m] for m in MEASURES])] + self.pending
+            self.pending = []
+            table = np.concatenate(chunks)
+            keys, inverse = np.unique(table[:, :len(DIMENSIONS)], axis=0, return_inverse=True)
+            sums = np.zeros((len(keys), len(MEASURES)), dtype=np.int64)
+            np.add.at(sums, inverse.ravel(), table[:, len(DIMENSIONS):])
+            for i, dimension in enumerate(DIMENSIONS):
+                self.codes[dimension] = keys[:, i]
+            for i, measure in enumerate(MEASURES):
+                self.values[measure] = sums[:, i]
+
+    def __len__(self):
+        self.consolidate()
+        return len(self.codes['clinic'])
+
+    def member_codes(self, dimension, selector):
+        """Kode anggota dimensi yang cocok dengan selector (list nilai atau fungsi nama -> bool)"""
+        names = self.members[dimension].names
+        if callable(selector):
+            return [code for code, name in names.items() if selector(name)]
+        if isinstance(selector, str):
+            selector = [selector]
+        wanted = set(selector)
+        return [code for code, name in names.items() if name in wanted]
+
+    def mask(self, where):
+        """Slice / dice: where = {dimensi: nilai | [nilai] | fungsi}, tanggal: (dari, sampai) atau [tanggal]"""
+        mask = np.ones(len(self.codes['clinic']), dtype=bool)
+        for dimension, selector in (where or {}).items():
+            codes = self.codes[dimension]
+            if dimension == 'tanggal':
+                if isinstance(selector, tuple):
+                    dari_tanggal, sampai_tanggal = selector
+                    mask &= (codes >= day_ordinal(dari_tanggal)) & (codes <= day_ordinal(sampai_tanggal))
+                else:
+                    selector = [selector] if isinstance(selector, str) else selector
+                    mask &= np.isin(codes, [day_ordinal(tanggal) for tanggal in selector])
+            else:
+                mask &= np.isin(codes, self.member_codes(dimension, selector))
+        return mask
+
+    def decode(self, dimension, codes):
+        if dimension == 'tanggal':
+            return [ordinal_date(code) if code > 0 else KOSONG for code in codes]
+        members = self.members[dimension]
+        return [members.name(code) for code in codes]
+
+    def query(self, by=(), where=None, measures=MEASURES):
+        """Roll-up ke dimensi `by` setelah slice/dice `where`; return DataFrame (measure uang dalam Rupiah)"""
+        self.consolidate()
+        mask = self.mask(where)
+        by = list(by)
+        values = {measure: self.values[measure][mask] for measure in measures}
+
+        if by:
+            keys, inverse = np.unique(np.column_stack([self.codes[d][mask] for d in by]), axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            columns = {dimension: self.decode(dimension, keys[:, i]) for i, dimension in enumerate(by)}
+            for measure, column in values.items():
+                totals = np.zeros(len(keys), dtype=np.int64)
+                np.add.at(totals, inverse, column)
+                columns[measure] = totals
+        else:
+            columns = {measure: [int(column.sum())] for measure, column in values.items()}
+
+        result = pd.DataFrame(columns)
+        for measure in measures:
+            if measure != 'count':
+                result[measure] = result[measure].map(sen_to_rupiah)
+        return result.sort_values(by).reset_index(drop=True) if by else result
+
+    def pivot(self, rows, columns, measure='revenue', where=None):
+        """Tabel silang, mis. pivot(['clinic', 'tanggal'], 'metode', where={'metode': ['QRIS BSI', 'TUNAI']})"""
+        rows = [rows] if isinstance(rows, str) else list(rows)
+        table = self.query(rows + [columns], where, measures=(measure,))
+        return table.pivot_table(index=rows, columns=columns, values=measure, aggfunc='sum', fill_value=0)
+
+    @classmethod
+    def from_store(cls, store, dari_tanggal, sampai_tanggal):
+        cube = cls()
+        for endpoint in ENDPOINT_TABLES:
+            cube.add(endpoint, store.records(endpoint, None, dari_tanggal, sampai_tanggal))
+        return cube
+
+def parse_where(items):
+    """['metode=QRIS BSI,TUNAI', 'tanggal=2025-12-01..2025-12-31'] -> dict where"""
+    where = {}
+    for item in items or []:
+        dimension, _, value = item.partition('=')
+        if dimension == 'tanggal' and '..' in value:
+            where[dimension] = tuple(value.split('..', 1))
+        else:
+            where[dimension] = value.split(',')
+    return where
+
+def main():
+    parser = argparse.ArgumentParser(description="Query cube pendapatan dari store lokal (slice / dice / roll-up)")
+    parser.add_argument("--dari", required=True, help="dari_tanggal (YYYY-MM-DD)")
+    parser.add_argument("--sampai", required=True, help="sampai_tanggal (YYYY-MM-DD)")
+    parser.add_argument("--by", nargs="*", default=['clinic'], choices=DIMENSIONS, help="Dimensi hasil (roll-up)")
+    parser.add_argument("--where", nargs="*", help="Filter dimensi, mis. metode=QRIS BSI,TUNAI atau tanggal=2025-12-01..2025-12-07")
+    parser.add_argument("--pivot", choices=DIMENSIONS, help="Dimensi yang dijadikan kolom")
+    parser.add_argument("--measure", default='revenue', choices=MEASURES)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="File store SQLite")
+    args = parser.parse_args()
+
+    store = TransactionStore(args.db)
+    try:
+        cube = RevenueCube.from_store(store, args.dari, args.sampai)
+    finally:
+        store.close()
+    print(f">> Cube {args.dari} s/d {args.sampai}: {len(cube)} sel\n")
+
+    where = parse_where(args.where)
+    with pd.option_context('display.max_rows', 500, 'display.width', 200, 'display.float_format', '{:,.0f}'.format):
+        if args.pivot:
+            print(cube.pivot(args.by, args.pivot, args.measure, where))
+        else:
+            print(cube.query(args.by, where))
+
+if __name__ == "__main__":
+    main()
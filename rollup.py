@@ -0,0 +1,192 @@
+import argparse
+import threading
+from datetime import date
+
+import numpy as np
+
+from transactions import KIND_PRODUK, KIND_PERAWATAN, ENDPOINT_KINDS, clinic_ids, day_ordinal, ordinal_date
+from aggregation import sen_to_rupiah
+from date_windows import FILTERS, WEEK_RULE_PROGRESS, WEEK_RULE_SALES, filter_range
+from leaderboard import is_leaderboard_clinic, print_leaderboard
+from transaction_store import TransactionStore, DEFAULT_DB_PATH, ENDPOINT_TABLES
+
+# Rollup index pendapatan per klinik per hari (produk & perawatan) dengan prefix sum,
+# jadi total window apa pun (harian, minggu, bulan, tahun, YTD) = dua lookup, tanpa fetch ulang.
+
+KINDS = (KIND_PRODUK, KIND_PERAWATAN)
+INITIAL_DAYS = 32
+
+class RollupIndex:
+    """daily[kind, klinik, hari] dalam sen + prefix[kind, klinik, i] = jumlah daily sebelum hari ke-i"""
+
+    def __init__(self, clinics=None):
+        self.clinics = clinics or clinic_ids
+        self.rows = {}  # clinic id -> baris
+        self.row_clinics = []  # baris -> clinic id
+        self.origin = None  # Ordinal hari pertama (kolom 0)
+        self.n_days = 0
+        self.daily = np.zeros((len(KINDS), 0, INITIAL_DAYS), dtype=np.int64)
+        self.prefix = np.zeros((len(KINDS), 0, INITIAL_DAYS + 1), dtype=np.int64)
+        self.dirty_from = None  # Kolom pertama yang prefix-nya belum dihitung ulang
+        self.lock = threading.Lock()
+
+    def row(self, clinic_id):
+        row = self.rows.get(clinic_id)
+        if row is None:
+            row = self.rows[clinic_id] = len(self.row_clinics)
+            self.row_clinics.append(clinic_id)
+            if row >= self.daily.shape[1]:
+                extra = max(row + 1 - self.daily.shape[1], 8)
+                self.daily = np.pad(self.daily, ((0, 0), (0, extra), (0, 0)))
+                self.prefix = np.pad(self.prefix, ((0, 0), (0, extra), (0, 0)))
+        return row
+
+    def cover(self, first_day, last_day):
+        """Pastikan kolom untuk ordinal first_day..last_day ada (kapasitas digandakan, geser kalau mundur)"""
+        if self.origin is None:
+            self.origin = first_day
+        if first_day < self.origin:
+            shift = self.origin - first_day
+            self.daily = np.pad(self.daily, ((0, 0), (0, 0), (shift, 0)))
+            self.prefix = np.pad(self.prefix, ((0, 0), (0, 0), (shift, 0)))
+            self.origin = first_day
+            self.n_days += shift
+            self.dirty_from = 0
+        needed = last_day - self.origin + 1
+        if needed > self.daily.shape[2]:
+            capacity = max(needed, self.daily.shape[2] * 2)
+            self.daily = np.pad(self.daily, ((0, 0), (0, 0), (0, capacity - self.daily.shape[2])))
+            self.prefix = np.pad(self.prefix, ((0, 0), (0, 0), (0, capacity + 1 - self.prefix.shape[2])))
+        if needed > self.n_days:
+            self.mark_dirty(self.n_days)
+            self.n_days = needed
+
+    def mark_dirty(self, column):
+        self.dirty_from = column if self.dirty_from is None else min(self.dirty_from, column)
+
+    def add_daily(self, kind, clinic_ids_, days, amounts):
+        """Tambah total harian: array kind / clinic id / ordinal hari / sen (boleh berulang)"""
+        days = np.asarray(days, dtype=np.int64)
+        if not len(days):
+            return
+        with self.lock:
+            self.cover(int(days.min()), int(days.max()))
+            rows = np.array([self.row(int(clinic_id)) for clinic_id in clinic_ids_], dtype=np.intp)
+            columns = days - self.origin
+            np.add.at(self.daily, (np.broadcast_to(np.asarray(kind, dtype=np.intp), rows.shape), rows, columns),
+                      np.asarray(amounts, dtype=np.int64))
+            self.mark_dirty(int(columns.min()))
+
+    def add_transactions(self, packed):
+        """Tambah structured array transactions.TRANSACTION_DTYPE (hasil pack_records)"""
+        valid = packed[(packed['clinic'] >= 0) & (packed['day'] > 0) & (packed['kind'] >= 0)]
+        self.add_daily(valid['kind'], valid['clinic'], valid['day'], valid['amount'])
+
+    def reset_range(self, dari_tanggal, sampai_tanggal):
+        """Kosongkan rentang (dipakai sebelum memuat ulang hari yang belum tutup)"""
+        with self.lock:
+            if self.origin is None:
+                return
+            start = max(day_ordinal(dari_tanggal) - self.origin, 0)
+            end = min(day_ordinal(sampai_tanggal) - self.origin, self.n_days - 1)
+            if start <= end:
+                self.daily[:, :, start:end + 1] = 0
+                self.mark_dirty(start)
+
+    def refresh(self):
+        """Hitung ulang prefix sum mulai kolom kotor saja (hari baru di akhir = murah)"""
+        if self.dirty_from is None:
+            return
+        start = self.dirty_from
+        self.prefix[:, :, start + 1:self.n_days + 1] = (
+            self.prefix[:, :, start:start + 1] + np.cumsum(self.daily[:, :, start:self.n_days], axis=2)
+        )
+        self.dirty_from = None
+
+    def window(self, dari_tanggal, sampai_tanggal):
+        """Total sen per (kind, baris klinik) untuk rentang tanggal: O(1) per klinik"""
+        with self.lock:
+            self.refresh()
+            totals = np.zeros(self.prefix.shape[:2], dtype=np.int64)
+            if self.origin is None:
+                return totals
+            start = min(max(day_ordinal(dari_tanggal) - self.origin, 0), self.n_days)
+            end = min(max(day_ordinal(sampai_tanggal) - self.origin + 1, 0), self.n_days)
+            if start < end:
+                totals = self.prefix[:, :, end] - self.prefix[:, :, start]
+            return totals
+
+    def totals(self, dari_tanggal, sampai_tanggal):
+        """{nama_clinic: {'productTotal', 'treatmentTotal', 'total'}} dalam Rupiah"""
+        window = self.window(dari_tanggal, sampai_tanggal)
+        result = {}
+        for row, clinic_id in enumerate(self.row_clinics):
+            product = int(window[KIND_PRODUK, row])
+            treatment = int(window[KIND_PERAWATAN, row])
+            result[self.clinics.name(clinic_id)] = {
+                'productTotal': sen_to_rupiah(product),
+                'treatmentTotal': sen_to_rupiah(treatment),
+                'total': sen_to_rupiah(product + treatment),
+            }
+        return result
+
+    def leaderboard(self, filter, date_str=None, week=None, month=None, year=None, today=None, week_rule=WEEK_RULE_PROGRESS):
+        """Baris leaderboard seperti /api/sales untuk satu filter dashboard"""
+        dari_tanggal, sampai_tanggal = filter_range(filter, date_str, week, month, year, today, week_rule)
+        totals = self.totals(dari_tanggal, sampai_tanggal)
+        rows = []
+        for clinic_id, name in sorted(self.clinics.names.items()):
+            if not is_leaderboard_clinic(name):
+                continue
+            clinic_totals = totals.get(name, {'productTotal': 0.0, 'treatmentTotal': 0.0, 'total': 0.0})
+            rows.append({'id': clinic_id, 'name': name, **clinic_totals})
+        rows.sort(key=lambda row: row['total'], reverse=True)
+        return rows
+
+    @property
+    def date_range(self):
+        if self.origin is None:
+            return None
+        return ordinal_date(self.origin), ordinal_date(self.origin + self.n_days - 1)
+
+    def load_store(self, store, dari_tanggal, sampai_tanggal):
+        """Muat (ulang) rentang dari TransactionStore; panggil lagi untuk hari baru saja supaya incremental"""
+        self.reset_range(dari_tanggal, sampai_tanggal)
+        for endpoint in ENDPOINT_TABLES:
+            rows = store.daily_totals(endpoint, dari_tanggal, sampai_tanggal)
+            if not rows:
+                continue
+            names, tanggal, totals = zip(*rows)
+            self.add_daily(
+                ENDPOINT_KINDS[endpoint],
+                [self.clinics.id(name) for name in names],
+                [day_ordinal(value) for value in tanggal],
+                list(totals),
+            )
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaderboard dari rollup index store lokal (tanpa fetch API)")
+    parser.add_argument("--filter", choices=FILTERS, default='monthly')
+    parser.add_argument("--date", help="Tanggal untuk filter daily (YYYY-MM-DD)")
+    parser.add_argument("--week", type=int)
+    parser.add_argument("--month", type=int)
+    parser.add_argument("--year", type=int)
+    parser.add_argument("--week-rule", choices=(WEEK_RULE_PROGRESS, WEEK_RULE_SALES), default=WEEK_RULE_PROGRESS)
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="File store SQLite")
+    args = parser.parse_args()
+
+    dari_tanggal, sampai_tanggal = filter_range(args.filter, args.date, args.week, args.month, args.year, week_rule=args.week_rule)
+    year = date.fromisoformat(dari_tanggal).year
+    store = TransactionStore(args.db)
+    try:
+        index = RollupIndex()
+        index.load_store(store, f"{year}-01-01", f"{year}-12-31")
+    finally:
+        store.close()
+
+    print(f">> {args.filter}: {dari_tanggal} s/d {sampai_tanggal} (index {index.date_range})\n")
+    rows = index.leaderboard(args.filter, args.date, args.week, args.month, args.year, week_rule=args.week_rule)
+    print_leaderboard(rows)
+
+if __name__ == "__main__":
+    main()
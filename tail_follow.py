@@ -0,0 +1,152 @@
+import time
+import argparse
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import api_client
+from api_client import fetch_page, MAX_PAGES
+from aggregation import CLINIC_FIELDS, first_value, parse_rupiah_sen, sen_to_rupiah
+from leaderboard import PRODUK_ENDPOINT, fetch_clinics, leaderboard_rows, print_leaderboard
+from leaderboard_engine import LEADERBOARD_AMOUNT_FIELDS
+from response_cache import WIB, today_wib
+from transaction_store import RecordKeys
+
+# Tail-follow total hari ini. Produk urut id turun (terbaru dulu), jadi tiap poll cukup baca halaman 1 dan mundur
+# sampai ketemu record yang sudah dikenal (biasanya 1-2 request), lalu total per cabang ditambah selisihnya.
+# Perawatan urut abjad nama_pembeli, bukan waktu: record baru bisa masuk di halaman mana pun, jadi tiap poll hari ini
+# di-walk penuh (sehari hanya beberapa halaman) dan dibandingkan dengan poll sebelumnya.
+# Record dikenali lewat RecordKeys seperti store (id, atau hash isi + nomor kemunculan untuk perawatan).
+# Produk di-walk ulang penuh tiap RESYNC_EVERY poll untuk menangkap edit / hapus.
+
+POLL_INTERVAL = 10  # Detik antar poll
+RESYNC_EVERY = 60  # Poll; walk penuh produk hari ini sekali tiap N poll
+NEWEST_FIRST_ENDPOINTS = (PRODUK_ENDPOINT,)  # Endpoint yang halamannya urut id turun: boleh berhenti di record lama
+
+class TailFollower:
+    """Total berjalan per (endpoint, cabang) untuk satu hari, di-update incremental dari halaman teratas"""
+
+    def __init__(self, today=today_wib, max_pages=MAX_PAGES):
+        self.today = today  # Fungsi tanggal hari ini (bisa diganti untuk uji dengan data stand-in)
+        self.max_pages = max_pages
+        self.tanggal = None
+        self.known = {}  # endpoint -> set kunci RecordKeys yang sudah dijumlahkan
+        self.totals = {}  # endpoint -> {nama_clinic: sen}
+        self.polls = 0
+
+    def reset(self, tanggal):
+        self.tanggal = tanggal
+        self.known = {endpoint: set() for endpoint in LEADERBOARD_AMOUNT_FIELDS}
+        self.totals = {endpoint: {} for endpoint in LEADERBOARD_AMOUNT_FIELDS}
+        self.polls = 0
+
+    def walk(self, endpoint, stop_at_known):
+        """Walk halaman hari ini tanpa cache; return {kunci: record} yang belum dikenal.
+        stop_at_known: berhenti di halaman pertama yang memuat record dari poll sebelumnya (hanya endpoint urut id)"""
+        params = {'dari_tanggal': self.tanggal, 'sampai_tanggal': self.tanggal}
+        known = self.known[endpoint] if stop_at_known else set()
+        keys = RecordKeys()
+        # Insert selama walk menggeser halaman: record ber-id yang muncul lagi di halaman berikutnya dibuang
+        fresh = {}
+        for page in range(1, self.max_pages + 1):
+            result = fetch_page(endpoint, params, page, cached=False)
+            if not result or not result.get('data'):
+                break
+            reached_known = False
+            for record in result['data']:
+                key = keys(record)
+                if key in known:
+                    reached_known = True
+                elif key not in fresh:
+                    fresh[key] = record
+            if reached_known or not result.get('next_page_url'):
+                break
+        else:
+            print(f"   ⚠️  {endpoint}: batas {self.max_pages} halaman tercapai, tail mungkin terpotong")
+        return fresh
+
+    def apply(self, endpoint, records):
+        """Tambahkan record baru ({kunci: record}) ke total cabang; return {nama_clinic: selisih sen}"""
+        field = LEADERBOARD_AMOUNT_FIELDS[endpoint]
+        totals, deltas = self.totals[endpoint], {}
+        for key, record in records.items():
+            self.known[endpoint].add(key)
+            nama_clinic = first_value(record, CLINIC_FIELDS)
+            if not nama_clinic:
+                continue
+            amount = parse_rupiah_sen(record.get(field))
+            totals[nama_clinic] = totals.get(nama_clinic, 0) + amount
+            deltas[nama_clinic] = deltas.get(nama_clinic, 0) + amount
+        return deltas
+
+    def poll_endpoint(self, endpoint, resync):
+        if resync or endpoint not in NEWEST_FIRST_ENDPOINTS:
+            # Walk penuh: total dihitung ulang dari nol, selisihnya dilaporkan seperti record baru
+            before, known_before = dict(self.totals[endpoint]), self.known[endpoint]
+            records = self.walk(endpoint, stop_at_known=False)
+            self.known[endpoint], self.totals[endpoint] = set(), {}
+            self.apply(endpoint, records)
+            after = self.totals[endpoint]
+            deltas = {name: after.get(name, 0) - before.get(name, 0) for name in set(before) | set(after)}
+            new_records = len(self.known[endpoint] - known_before)
+            return new_records, {name: delta for name, delta in deltas.items() if delta}
+        records = self.walk(endpoint, stop_at_known=True)
+        return len(records), self.apply(endpoint, records)
+
+    def poll(self):
+        """Satu poll semua endpoint (paralel); hari berganti = mulai dari nol.
+        Return (record baru, {nama_clinic: selisih sen}, request)"""
+        tanggal = self.today()
+        if tanggal != self.tanggal:
+            self.reset(tanggal)
+        resync = self.polls % RESYNC_EVERY == 0
+        requests_before = api_client.request_count
+        with ThreadPoolExecutor(max_workers=len(LEADERBOARD_AMOUNT_FIELDS)) as pool:
+            results = list(pool.map(lambda endpoint: self.poll_endpoint(endpoint, resync), LEADERBOARD_AMOUNT_FIELDS))
+        self.polls += 1
+
+        deltas = {}
+        for _, endpoint_deltas in results:
+            for name, delta in endpoint_deltas.items():
+                deltas[name] = deltas.get(name, 0) + delta
+        return sum(count for count, _ in results), deltas, api_client.request_count - requests_before
+
+    def rows(self, clinics):
+        """Baris leaderboard hari ini (bentuk /api/sales) dari total berjalan"""
+        produk, perawatan = (self.totals[endpoint] for endpoint in LEADERBOARD_AMOUNT_FIELDS)
+        return leaderboard_rows(clinics, produk, perawatan)
+
+    def follow(self, interval=POLL_INTERVAL, polls=None, clinics=None, table=False):
+        """Poll terus tiap interval detik (polls: batas jumlah poll), cetak perubahan per cabang"""
+        clinics = clinics if clinics is not None else fetch_clinics()
+        done = 0
+        while polls is None or done < polls:
+            started = time.perf_counter()
+            count, deltas, requests_used = self.poll()
+            elapsed = time.perf_counter() - started
+            stamp = datetime.now(WIB).strftime('%H:%M:%S')
+            if deltas or done == 0:
+                print(f">> {stamp} {self.tanggal}: +{count} record, {requests_used} request, {elapsed:.2f}s")
+                for name, delta in sorted(deltas.items(), key=lambda item: -abs(item[1])):
+                    print(f"   {name:<32} {'+' if delta >= 0 else '-'}Rp {abs(sen_to_rupiah(delta)):>13,.0f}")
+                if table:
+                    print_leaderboard(self.rows(clinics))
+            done += 1
+            if polls is None or done < polls:
+                time.sleep(max(interval - elapsed, 0))
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail-follow total hari ini per cabang (poll halaman teratas saja)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="Detik antar poll")
+    parser.add_argument("--polls", type=int, help="Berhenti setelah N poll (default terus jalan)")
+    parser.add_argument("--tanggal", help="Ikuti tanggal ini, bukan hari ini WIB (uji dengan stand-in API)")
+    parser.add_argument("--table", action="store_true", help="Cetak leaderboard lengkap tiap ada perubahan")
+    args = parser.parse_args()
+
+    follower = TailFollower(today=(lambda: args.tanggal) if args.tanggal else today_wib)
+    try:
+        follower.follow(args.interval, args.polls, table=args.table)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
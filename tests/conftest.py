@@ -0,0 +1,52 @@
+import os
+import sys
+import threading
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+
+import api_client
+from api_client import TokenBucket
+from response_cache import ResponseCache
+from stand_in_api import create_server
+
+# Uji perilaku lewat stand-in API (benchmarks/stand_in_api.py) yang jalan di thread, tanpa jaringan.
+# Data stand-in hanya Desember 2025.
+
+@pytest.fixture(autouse=True)
+def offline_client(monkeypatch, tmp_path):
+    """api_client tanpa rate limit, tanpa backoff, cache disk mati (uji cache menyalakannya sendiri)"""
+    monkeypatch.setattr(api_client, 'limiter', TokenBucket(rate_per_minute=10**9, burst=10**6))
+    monkeypatch.setattr(api_client, 'backoff_seconds', lambda retry_count: 0)
+    monkeypatch.setattr(api_client, 'RATE_LIMIT_WAIT', 0)
+    monkeypatch.setattr(api_client, 'response_cache', ResponseCache(directory=str(tmp_path / "cache"), enabled=False))
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    """Factory: stand_in(transactions, **options) jalankan server stand-in dan arahkan api_client ke sana"""
+    servers = []
+
+    def start(transactions=2000, **options):
+        server = create_server(transactions, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        monkeypatch.setattr(api_client, 'API_BASE_URL', f"http://127.0.0.1:{server.server_address[1]}/api")
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def expected_totals(server, endpoints=None):
+    """Total stand-in {cabang: {tanggal: Rupiah}} (gabungan endpoint), pembanding hasil fetch"""
+    totals = {}
+    for endpoint, dataset in server.datasets.items():
+        if endpoints and endpoint not in endpoints:
+            continue
+        for (cabang, tanggal), total in dataset.totals().items():
+            totals.setdefault(cabang, {})[tanggal] = totals.get(cabang, {}).get(tanggal, 0) + total
+    return totals
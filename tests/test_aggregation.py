@@ -0,0 +1,37 @@
+from aggregation import StreamingAggregator, first_value, parse_rupiah_sen
+from api_client import iter_pages
+from conftest import expected_totals
+
+PRODUK = "laporan-penjualan-produk"
+
+def test_zero_amount_is_not_replaced_by_another_field():
+    aggregator = StreamingAggregator("2025-12")
+    aggregator.add_page(PRODUK, [
+        {'tanggal_transaksi': "2025-12-01", 'nama_clinic': "Beauty Center Bantul", 'total_bayar': 0, 'total': 150000},
+        {'tanggal_transaksi': "2025-12-01", 'nama_clinic': "Beauty Center Bantul", 'total_bayar': "25000.00", 'total': 1},
+    ])
+
+    assert aggregator.result() == {"Beauty Center Bantul": {"2025-12-01": 25000.0}}
+
+def test_first_value_falls_back_only_on_none():
+    assert first_value({'total_bayar': 0, 'total': 150000}, ('total_bayar', 'total')) == 0
+    assert first_value({'total_bayar': None, 'total': 150000}, ('total_bayar', 'total')) == 150000
+    assert first_value({}, ('total_bayar', 'total')) is None
+
+def test_month_filter_and_exact_sen():
+    aggregator = StreamingAggregator("2025-12")
+    page = [{'created_at': "2025-12-02 10:00:00", 'nama_clinic': "Beauty Center Wates", 'total_bayar': "0.10"}] * 1000
+    aggregator.add_page(PRODUK, page)
+    aggregator.add_page(PRODUK, [{'created_at': "2025-11-30", 'nama_clinic': "Beauty Center Wates", 'total_bayar': "5.00"}])
+
+    assert aggregator.result() == {"Beauty Center Wates": {"2025-12-02": 100.0}}
+    assert parse_rupiah_sen("-1250.5") == -125050
+
+def test_streamed_pages_match_stand_in(stand_in):
+    server = stand_in(1000)
+    aggregator = StreamingAggregator("2025-12")
+    params = {'dari_tanggal': "2025-12-01", 'sampai_tanggal': "2025-12-31"}
+    for endpoint in server.datasets:
+        aggregator.consume(endpoint, iter_pages(endpoint, params, max_workers=4))
+
+    assert aggregator.result() == expected_totals(server)
@@ -0,0 +1,34 @@
+import pytest
+
+from customer_index import CustomerIndex, LOOKUP_BATCH
+from transaction_store import TransactionStore
+
+PRODUK = "laporan-penjualan-produk"
+PERAWATAN = "laporan-penjualan-perawatan"
+CABANG = "Beauty Center Bantul"
+
+def visit(i, tanggal="2025-12-05", **fields):
+    return {'id': i, 'nama_clinic': CABANG, 'created_at': f"{tanggal} 10:00:00", 'total_bayar': "100000.00", **fields}
+
+@pytest.fixture
+def customers(tmp_path):
+    store = TransactionStore(str(tmp_path / "transaksi.db"))
+    yield CustomerIndex(store)
+    store.close()
+
+def test_alias_from_an_earlier_page_is_reused(customers):
+    customers.add(PRODUK, [visit(1, no_telp="0857-4807-3226", no_rm="RM 001")])
+    customers.add(PERAWATAN, [{'nama_pembeli': "Pasien 7", 'nama_clinic': CABANG, 'created_at': "2025-12-09",
+                               'total_pembayaran': "50000.00", 'no_rm': "rm001"}])
+
+    report = customers.branch_report()[CABANG]
+    assert (report['customers'], report['repeat_customers'], report['clv']) == (1, 1, 150000.0)
+
+def test_page_larger_than_lookup_batch(customers):
+    records = [visit(i, no_telp=f"0812{i:08d}") for i in range(1, LOOKUP_BATCH * 2 + 2)]
+
+    assert customers.add(PRODUK, records) == len(records)
+    # Halaman yang sama ditulis ulang: kunjungan lama ikut terbaca lintas batch, tidak dobel
+    assert customers.add(PRODUK, [{**record, 'created_at': "2025-12-06 10:00:00"} for record in records]) == len(records)
+    report = customers.branch_report()[CABANG]
+    assert (report['customers'], report['visits_per_customer'], report['repeat_customers']) == (len(records), 1, 0)
@@ -0,0 +1,12 @@
+from leaderboard import fetch_leaderboard
+from leaderboard_engine import build_engine
+
+def test_scan_counts_every_record_and_matches_sales_rows(stand_in):
+    server = stand_in(3000)
+
+    engine = build_engine(today="2025-12-31", max_workers=4)
+
+    # Dua endpoint di-scan paralel: n_records dihitung di bawah lock, tidak ada tambahan yang hilang
+    assert engine.n_records == sum(len(dataset.ids) for dataset in server.datasets.values())
+    rows, _ = fetch_leaderboard("2025-12-01", "2025-12-31", max_workers=4)
+    assert engine.window('monthly') == rows
@@ -0,0 +1,85 @@
+import math
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import api_client
+from api_client import PageGuard, SeenKeys, iter_pages
+
+PRODUK = "laporan-penjualan-produk"
+# sampai_tanggal di masa depan: rentang masih 'live', PageGuard membaca ulang setelah walk
+LIVE = {'dari_tanggal': "2025-12-01", 'sampai_tanggal': "2099-12-31"}
+
+def walk(dataset, inserts=0, deletes=0, pages=60, seed=0):
+    """Walk produk; selama `pages` halaman pertama, tiap halaman yang diterima diikuti insert / delete di stand-in
+    (halaman berikutnya sudah di-fetch paralel, jadi batasnya bergeser di tengah jalan). Return (id, request)"""
+    rng = np.random.default_rng(seed)
+    ids = []
+    before = api_client.request_count
+    for n, page in enumerate(iter_pages(PRODUK, LIVE, max_workers=4)):
+        ids.extend(record['id'] for record in page)
+        if n < pages:
+            if inserts:
+                dataset.insert(inserts, rng)
+            if deletes:
+                dataset.delete(deletes, rng)
+    return ids, api_client.request_count - before
+
+def assert_consistent(ids, dataset):
+    """Tiap record yang ada di akhir tepat sekali; sisanya hanya record yang dihapus selama walk"""
+    assert [id_ for id_, count in Counter(ids).items() if count > 1] == []
+    final = {int(id_) for id_ in dataset.ids}
+    assert final - set(ids) == set()
+    assert set(ids) - final <= set(dataset.deleted)
+
+def test_seen_keys_bitmap_and_hashes():
+    seen = SeenKeys()
+    assert [seen.add({'id': id_}) for id_ in (100, 90, 130, 90)] == [True, True, True, False]
+    assert seen.add({'nomor_transaksi': "P.1"}) and not seen.add({'nomor_transaksi': "P.1"})
+    assert seen.add({'nama_pembeli': "Pasien 7"}) and seen.add({'nama_pembeli': "Pasien 7"})
+    assert (len(seen), seen.count_above(90), seen.count_above(100), seen.count_above(130)) == (4, 2, 1, 0)
+
+@pytest.mark.parametrize('seed', [0, 1])
+def test_inserts_during_walk(stand_in, seed):
+    server = stand_in(3000)
+    dataset = server.datasets[PRODUK]
+
+    ids, requests = walk(dataset, inserts=3, seed=seed)
+
+    assert_consistent(ids, dataset)
+    # Yang dibaca ulang hanya halaman teratas dan batas yang bergeser, bukan walk kedua
+    assert requests < 1.5 * math.ceil(len(dataset.ids) / server.per_page)
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_inserts_and_deletes_during_walk(stand_in, seed):
+    server = stand_in(3000)
+    dataset = server.datasets[PRODUK]
+
+    ids, _ = walk(dataset, inserts=3, deletes=2, seed=seed)
+
+    assert dataset.deleted
+    assert_consistent(ids, dataset)
+
+def test_quiet_live_walk_only_rereads_the_top(stand_in, monkeypatch):
+    server = stand_in(3000)
+
+    def bridge(*args):
+        raise AssertionError("batas halaman dibaca ulang padahal data tidak berubah")
+    monkeypatch.setattr(PageGuard, 'bridge', bridge)
+
+    ids, _ = walk(server.datasets[PRODUK])
+
+    assert sorted(ids, reverse=True) == [int(id_) for id_ in server.datasets[PRODUK].ids]
+
+def test_failed_reread_fails_a_strict_walk(stand_in, monkeypatch):
+    stand_in(600)
+
+    def reread(self, page):
+        self.failures += 1
+        return None
+    monkeypatch.setattr(PageGuard, 'reread', reread)
+
+    assert sum(len(page) for page in iter_pages(PRODUK, LIVE)) == 300
+    with pytest.raises(api_client.PageFetchFailed):
+        list(iter_pages(PRODUK, LIVE, strict=True))
@@ -0,0 +1,76 @@
+import pytest
+
+import api_client
+import range_cache
+from api_client import PageFetchFailed
+from leaderboard import PRODUK_ENDPOINT, fetch_clinics, fetch_leaderboard
+from range_cache import IntervalIndex, RangeCache
+from transactions import day_ordinal
+
+def closed_cache(**options):
+    """Semua hari Desember 2025 sudah tutup"""
+    return RangeCache(today=lambda: "2026-01-01", max_workers=4, **options)
+
+def requests_for(call):
+    before = api_client.request_count
+    result = call()
+    return result, api_client.request_count - before
+
+def test_interval_index_merges_and_finds_gaps():
+    index = IntervalIndex()
+    for start, end in ((1, 3), (10, 12), (4, 5), (20, 20)):
+        index.add(start, end)
+
+    assert (index.starts, index.ends, index.n_days) == ([1, 10, 20], [5, 12, 20], 9)
+    assert index.gaps(2, 22) == [(6, 9), (13, 19), (21, 22)]
+    assert index.gaps(10, 12) == []
+
+def test_overlapping_ranges_are_answered_from_cached_days(stand_in):
+    stand_in(3000)
+    cache = closed_cache()
+    clinics = fetch_clinics()
+
+    rows, sent = requests_for(lambda: cache.leaderboard("2025-12-01", "2025-12-20", clinics))
+    assert rows == fetch_leaderboard("2025-12-01", "2025-12-20", max_workers=4)[0]
+
+    inner, sent_inner = requests_for(lambda: cache.leaderboard("2025-12-05", "2025-12-10", clinics))
+    assert sent > 0 and sent_inner == 0
+    assert inner == fetch_leaderboard("2025-12-05", "2025-12-10", max_workers=4)[0]
+
+    gaps = cache.missing(PRODUK_ENDPOINT, day_ordinal("2025-12-15"), day_ordinal("2025-12-31"))
+    assert gaps == [(day_ordinal("2025-12-21"), day_ordinal("2025-12-31"))]
+    assert cache.leaderboard("2025-12-15", "2025-12-31", clinics) == fetch_leaderboard("2025-12-15", "2025-12-31", max_workers=4)[0]
+
+def test_live_days_expire_after_ttl(stand_in):
+    stand_in(3000)
+    clinics = fetch_clinics()
+    cache = RangeCache(today=lambda: "2025-12-31", live_ttl=3600, max_workers=4)
+    cache.leaderboard("2025-12-30", "2025-12-31", clinics)
+
+    assert requests_for(lambda: cache.leaderboard("2025-12-30", "2025-12-31", clinics))[1] == 0
+    cache.live_ttl = 0
+    assert requests_for(lambda: cache.leaderboard("2025-12-30", "2025-12-31", clinics))[1] > 0
+    assert cache.covered[PRODUK_ENDPOINT].gaps(day_ordinal("2025-12-30"), day_ordinal("2025-12-30")) == []
+
+def test_failed_gap_is_not_cached(stand_in, monkeypatch):
+    stand_in(2000, error_5xx=0.3)
+    monkeypatch.setattr(api_client, 'MAX_RETRIES', 0)
+    cache = closed_cache()
+
+    with pytest.raises(PageFetchFailed):
+        cache.fetch_gap(PRODUK_ENDPOINT, day_ordinal("2025-12-01"), day_ordinal("2025-12-31"))
+    assert len(cache.covered[PRODUK_ENDPOINT]) == 0
+
+def test_failure_elsewhere_does_not_block_caching(stand_in, monkeypatch):
+    stand_in(2000)
+    cache = closed_cache()
+
+    def pages_while_other_endpoint_fails(*args, **kwargs):
+        # Endpoint lain yang jalan bersamaan kehabisan retry: failure_count global naik di tengah walk ini
+        api_client.count_failure()
+        yield from api_client_pages(*args, **kwargs)
+    api_client_pages = range_cache.iter_sharded_pages
+    monkeypatch.setattr(range_cache, 'iter_sharded_pages', pages_while_other_endpoint_fails)
+
+    cache.fetch_gap(PRODUK_ENDPOINT, day_ordinal("2025-12-01"), day_ordinal("2025-12-31"))
+    assert cache.covered[PRODUK_ENDPOINT].n_days == 31
@@ -0,0 +1,46 @@
+import math
+
+import pytest
+
+import api_client
+from api_client import PageFetchFailed
+from range_sharding import split_range, bisect_range, fetch_shard, fetch_sharded, PAGE_WORKERS_PER_SHARD
+
+PRODUK = "laporan-penjualan-produk"
+
+def day_params(dari_tanggal, sampai_tanggal=None):
+    return {'dari_tanggal': dari_tanggal, 'sampai_tanggal': sampai_tanggal or dari_tanggal}
+
+def test_split_and_bisect():
+    assert split_range("2025-12-30", "2026-01-02", 3) == [("2025-12-30", "2026-01-01"), ("2026-01-02", "2026-01-02")]
+    assert bisect_range("2025-12-01", "2025-12-04") == (("2025-12-01", "2025-12-02"), ("2025-12-03", "2025-12-04"))
+    assert bisect_range("2025-12-01", "2025-12-01") is None
+
+def test_oversized_day_is_walked_once(stand_in):
+    server = stand_in(6000)
+    params = day_params("2025-12-10")
+    expected = len(server.datasets[PRODUK].select(params['dari_tanggal'], params['sampai_tanggal']))
+
+    before = api_client.request_count
+    records = fetch_shard(PRODUK, params, max_pages=2)
+
+    assert len(records) == expected
+    assert len({record['id'] for record in records}) == expected
+    # Tiap halaman sekali; tanpa last_page walk paralel boleh meminta satu halaman kosong di ujung
+    assert api_client.request_count - before < math.ceil(expected / server.per_page) + PAGE_WORKERS_PER_SHARD
+
+def test_capped_range_is_bisected_without_losing_records(stand_in):
+    server = stand_in(6000)
+    params = day_params("2025-12-01", "2025-12-08")
+    expected = server.datasets[PRODUK].select(params['dari_tanggal'], params['sampai_tanggal'])
+
+    records = fetch_sharded(PRODUK, params, shard_days=8, max_workers=2, max_pages=3)
+
+    assert sorted(record['id'] for record in records) == sorted(int(i) for i in server.datasets[PRODUK].ids[expected])
+
+def test_failed_shard_raises(stand_in, monkeypatch):
+    stand_in(2000, error_5xx=0.3)
+    monkeypatch.setattr(api_client, 'MAX_RETRIES', 0)
+
+    with pytest.raises(PageFetchFailed):
+        fetch_sharded(PRODUK, day_params("2025-12-01", "2025-12-31"), max_workers=4)
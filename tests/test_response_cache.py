@@ -0,0 +1,52 @@
+import pytest
+
+import api_client
+from api_client import get_json
+from response_cache import ResponseCache, normalize_url, is_immutable
+
+PRODUK = "laporan-penjualan-produk"
+CLOSED = {'dari_tanggal': "2025-12-01", 'sampai_tanggal': "2025-12-01", 'page': 1}
+LIVE = {'dari_tanggal': "2025-12-31", 'sampai_tanggal': "2099-12-31", 'page': 1}
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ResponseCache(directory=str(tmp_path / "api"))
+    monkeypatch.setattr(api_client, 'response_cache', cache)
+    return cache
+
+def requests_for(endpoint, params):
+    before = api_client.request_count
+    data = get_json(endpoint, params)
+    return data, api_client.request_count - before
+
+def test_closed_day_is_served_from_disk(stand_in, cache):
+    stand_in(500)
+    first, sent = requests_for(PRODUK, CLOSED)
+    again, sent_again = requests_for(PRODUK, CLOSED)
+
+    assert (sent, sent_again) == (1, 0)
+    assert again == first and cache.hits == 1
+
+def test_live_range_expires_after_ttl(stand_in, cache):
+    stand_in(500)
+    cache.live_ttl = 0
+    requests_for(PRODUK, LIVE)
+
+    assert requests_for(PRODUK, LIVE)[1] == 1
+
+def test_refresh_and_uncached_requests_go_to_the_api(stand_in, cache):
+    stand_in(500)
+    requests_for(PRODUK, CLOSED)
+
+    assert api_client.get_json(PRODUK, CLOSED, cached=False) is not None
+    assert cache.hits == 0
+    cache.refresh = True
+    assert requests_for(PRODUK, CLOSED)[1] == 1
+
+def test_url_normalization_and_immutability():
+    key = normalize_url("HTTPS://Clinic.BeautyCenter.id/api/laporan-penjualan-produk/", {'page': 2, 'dari_tanggal': "2025-12-01"})
+
+    assert key == "https://clinic.beautycenter.id/api/laporan-penjualan-produk?dari_tanggal=2025-12-01&page=2"
+    assert is_immutable(normalize_url("http://x/api/p", {'sampai_tanggal': "2025-12-31"}), today="2026-01-01")
+    assert not is_immutable(normalize_url("http://x/api/p", {'sampai_tanggal': "2026-01-01"}), today="2026-01-01")
+    assert not is_immutable(normalize_url("http://x/api/klinik"), today="2026-01-01")
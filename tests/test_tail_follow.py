@@ -0,0 +1,61 @@
+import math
+
+import numpy as np
+
+import api_client
+import tail_follow
+from aggregation import sen_to_rupiah
+from leaderboard import PRODUK_ENDPOINT, PERAWATAN_ENDPOINT, fetch_clinics, fetch_leaderboard
+from tail_follow import TailFollower
+
+TANGGAL = "2025-12-31"  # Insert stand-in selalu masuk di hari terakhir
+
+def day_totals(server, endpoint):
+    return {cabang: total for (cabang, tanggal), total in server.datasets[endpoint].totals().items() if tanggal == TANGGAL}
+
+def assert_matches_stand_in(follower, server):
+    for endpoint in (PRODUK_ENDPOINT, PERAWATAN_ENDPOINT):
+        totals = {name: sen_to_rupiah(sen) for name, sen in follower.totals[endpoint].items() if sen}
+        assert totals == day_totals(server, endpoint)
+
+def test_polls_follow_inserts_on_both_endpoints(stand_in):
+    server = stand_in(3000)
+    rng = np.random.default_rng(0)
+    follower = TailFollower(today=lambda: TANGGAL)
+    follower.poll()
+    assert_matches_stand_in(follower, server)
+
+    for endpoint in (PRODUK_ENDPOINT, PERAWATAN_ENDPOINT):
+        server.datasets[endpoint].insert(20, rng)
+    count, deltas, _ = follower.poll()
+
+    assert count == 40
+    assert sum(deltas.values()) > 0
+    assert_matches_stand_in(follower, server)
+    rows, _ = fetch_leaderboard(TANGGAL, TANGGAL, max_workers=4)
+    assert follower.rows(fetch_clinics()) == rows
+
+def test_produk_poll_only_reads_the_new_pages(stand_in):
+    server = stand_in(3000)
+    follower = TailFollower(today=lambda: TANGGAL)
+    follower.poll()
+
+    server.datasets[PRODUK_ENDPOINT].insert(20, np.random.default_rng(0))
+    before = api_client.request_count
+    count, _ = follower.poll_endpoint(PRODUK_ENDPOINT, resync=False)
+
+    assert count == 20
+    assert api_client.request_count - before <= math.ceil(20 / server.per_page) + 1
+
+def test_resync_catches_deleted_produk(stand_in, monkeypatch):
+    server = stand_in(3000)
+    monkeypatch.setattr(tail_follow, 'RESYNC_EVERY', 2)
+    follower = TailFollower(today=lambda: TANGGAL)
+    follower.poll()
+    follower.poll()
+
+    server.datasets[PRODUK_ENDPOINT].delete(5, np.random.default_rng(0), newest=30)
+    _, deltas, _ = follower.poll()
+
+    assert sum(deltas.values()) < 0
+    assert_matches_stand_in(follower, server)
@@ -0,0 +1,96 @@
+import sqlite3
+
+import pytest
+
+import api_client
+from api_client import PageFetchFailed
+from conftest import expected_totals
+from transaction_store import TransactionStore, RecordKeys, sync_endpoint, ENDPOINT_TABLES
+
+PRODUK = "laporan-penjualan-produk"
+PERAWATAN = "laporan-penjualan-perawatan"
+DESEMBER = {'dari_tanggal': "2025-12-01", 'sampai_tanggal': "2025-12-31"}
+
+def perawatan(total_pembayaran="150000.00", **fields):
+    """Record bentuk getlaporanperawatan.json (tanpa id, created_at hanya tanggal)"""
+    return {
+        'nama_pembeli': "Pasien 7",
+        'nama_clinic': "Beauty Center Bantul",
+        'created_at': "2025-12-05",
+        'total_pembayaran': total_pembayaran,
+        'final_pembayaran': "166500.00",
+        'nama_treatment': "Facial White (BC)",
+        **fields,
+    }
+
+@pytest.fixture
+def store(tmp_path):
+    store = TransactionStore(str(tmp_path / "transaksi.db"))
+    yield store
+    store.close()
+
+def test_identical_perawatan_rows_are_each_counted(store):
+    store.upsert(PERAWATAN, [perawatan(), perawatan()])
+
+    assert store.count(PERAWATAN, "2025-12-05", "2025-12-05") == 2
+    assert store.aggregate("2025-12-01", "2025-12-31") == {"Beauty Center Bantul": {"2025-12-05": 300000.0}}
+
+def test_daily_totals_are_exact_integer_sen(store):
+    store.upsert(PERAWATAN, [perawatan(total_pembayaran="0.10", nama_pembeli=f"Pasien {i}") for i in range(1000)])
+
+    # SUM REAL 1000 x 0.10 = 99.9999999999986; dalam sen hasilnya pas
+    assert store.daily_totals(PERAWATAN, "2025-12-05", "2025-12-05") == [("Beauty Center Bantul", "2025-12-05", 10000)]
+    assert store.aggregate("2025-12-05", "2025-12-05") == {"Beauty Center Bantul": {"2025-12-05": 100.0}}
+
+def test_legacy_real_totals_are_migrated(tmp_path):
+    path = str(tmp_path / "lama.db")
+    conn = sqlite3.connect(path)
+    for table in ENDPOINT_TABLES.values():
+        conn.execute(f"CREATE TABLE {table} (record_key TEXT PRIMARY KEY, id INTEGER, nomor_transaksi TEXT, "
+                     "tanggal TEXT NOT NULL, nama_clinic TEXT, total REAL NOT NULL DEFAULT 0, created_at TEXT, raw TEXT NOT NULL)")
+    conn.execute("INSERT INTO penjualan_produk VALUES ('id:1', 1, NULL, '2025-12-05', 'Beauty Center Bantul', 120000.1, NULL, '{}')")
+    conn.commit()
+    conn.close()
+
+    store = TransactionStore(path)
+    store.upsert(PRODUK, [{'id': 2, 'created_at': "2025-12-05 10:00:00", 'nama_clinic': "Beauty Center Bantul", 'total_bayar': "0.20"}])
+    assert store.daily_totals(PRODUK, "2025-12-05", "2025-12-05") == [("Beauty Center Bantul", "2025-12-05", 12000030)]
+    store.close()
+
+def test_reupserting_a_batch_is_idempotent(store):
+    rows = [perawatan(), perawatan(), perawatan(total_pembayaran="50000.00")]
+    store.upsert(PERAWATAN, rows)
+    store.upsert(PERAWATAN, rows)
+
+    assert store.count(PERAWATAN, "2025-12-05", "2025-12-05") == 3
+
+def test_record_keys_share_occurrences_across_pages():
+    keys = RecordKeys()
+    first, second = keys(perawatan()), keys(perawatan())
+
+    assert second == f"{first}#1"
+    assert keys({'id': 25517}) == "id:25517"
+
+def test_perawatan_amount_uses_total_pembayaran(store):
+    # final_pembayaran (setelah potongan + pajak) bukan nominal leaderboard; total_pembayaran sama seperti dashboard
+    store.upsert(PERAWATAN, [perawatan(total_pembayaran="120000.00", total="999.00")])
+
+    assert store.aggregate("2025-12-01", "2025-12-31", [PERAWATAN]) == {"Beauty Center Bantul": {"2025-12-05": 120000.0}}
+
+def test_sync_matches_stand_in_and_resync_downloads_nothing_new(stand_in, store):
+    server = stand_in(2000)
+
+    for endpoint in (PRODUK, PERAWATAN):
+        sync_endpoint(store, endpoint, DESEMBER, max_workers=4)
+    assert store.aggregate("2025-12-01", "2025-12-31") == expected_totals(server)
+
+    assert sync_endpoint(store, PRODUK, DESEMBER, max_workers=4) == 0
+    assert store.aggregate("2025-12-01", "2025-12-31") == expected_totals(server)
+
+def test_failed_sync_leaves_no_watermark(stand_in, store, monkeypatch):
+    stand_in(2000, error_5xx=0.3)
+    monkeypatch.setattr(api_client, 'MAX_RETRIES', 0)
+
+    with pytest.raises(PageFetchFailed):
+        sync_endpoint(store, PRODUK, DESEMBER, max_workers=4)
+    assert store.watermark(PRODUK, DESEMBER['dari_tanggal'], DESEMBER['sampai_tanggal']) is None
@@ -0,0 +1,267 @@
+import sqlite3
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+import api_client
+from api_client import fetch_new_pages, MAX_CONCURRENCY
+from aggregation import parse_rupiah_sen, sen_to_rupiah
+from range_sharding import iter_sharded_pages, fetch_sharded
+
+# Penyimpanan lokal transaksi POS (SQLite), supaya hari yang sudah tutup tidak perlu di-download ulang
+DEFAULT_DB_PATH = "transaksi.db"
+
+# Satu tabel per endpoint API
+ENDPOINT_TABLES = {
+    "laporan-penjualan-perawatan": "penjualan_perawatan",
+    "laporan-penjualan-produk": "penjualan_produk",
+}
+
+# Field nominal per endpoint (perawatan pakai total_pembayaran, sama seperti dashboard)
+AMOUNT_FIELDS = {
+    "laporan-penjualan-perawatan": ("total_pembayaran", "total_bayar", "total", "nominal"),
+    "laporan-penjualan-produk": ("total_bayar", "total", "nominal"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS {table} (
+    record_key TEXT PRIMARY KEY,
+    id INTEGER,
+    nomor_transaksi TEXT,
+    tanggal TEXT NOT NULL,
+    nama_clinic TEXT,
+    total_sen INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT,
+    raw TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_{table}_tanggal ON {table} (tanggal);
+CREATE INDEX IF NOT EXISTS idx_{table}_clinic_tanggal ON {table} (nama_clinic, tanggal);
+"""
+
+SYNC_STATE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sync_state (
+    endpoint TEXT NOT NULL,
+    dari_tanggal TEXT NOT NULL,
+    sampai_tanggal TEXT NOT NULL,
+    watermark_id INTEGER,
+    watermark_tanggal TEXT,
+    synced_at TEXT NOT NULL,
+    PRIMARY KEY (endpoint, dari_tanggal, sampai_tanggal)
+);
+"""
+
+def record_key(record):
+    """Kunci unik transaksi: id, lalu nomor_transaksi, lalu hash isi record (perawatan tidak punya id)"""
+    if record.get('id') is not None:
+        return f"id:{record['id']}"
+    if record.get('nomor_transaksi'):
+        return f"no:{record['nomor_transaksi']}"
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return "sha1:" + hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class RecordKeys:
+    """record_key dengan nomor kemunculan untuk record tanpa id: dua perawatan identik di hari yang sama (pasien,
+    treatment, nominal sama; created_at hanya tanggal) jadi 'sha1:...' dan 'sha1:...#1', tidak saling menimpa.
+    Satu instance per batch yang memuat hari itu utuh (satu sync / satu fetch ulang), dipakai lintas halaman."""
+
+    def __init__(self):
+        self.occurrences = {}
+
+    def __call__(self, record):
+        key = record_key(record)
+        if not key.startswith("sha1:"):
+            return key
+        occurrence = self.occurrences.get(key, 0)
+        self.occurrences[key] = occurrence + 1
+        return f"{key}#{occurrence}" if occurrence else key
+
+def record_date(record):
+    """Tanggal transaksi (YYYY-MM-DD) dari tanggal_transaksi/tanggal/created_at"""
+    tanggal = record.get('tanggal_transaksi') or record.get('tanggal') or record.get('created_at') or ''
+    return str(tanggal).split(' ')[0]
+
+def record_amount_sen(endpoint, record):
+    """Nominal transaksi sesuai field endpoint dalam sen (int, exact); nominal 0 tetap 0"""
+    for field in AMOUNT_FIELDS.get(endpoint, ("total_bayar", "total", "nominal")):
+        value = record.get(field)
+        if value is not None and value != '':
+            return parse_rupiah_sen(value)
+    return 0
+
+def record_amount(endpoint, record):
+    """Nominal transaksi sesuai field endpoint (Rupiah)"""
+    return sen_to_rupiah(record_amount_sen(endpoint, record))
+
+class TransactionStore:
+    """Store transaksi per endpoint dengan watermark untuk sync incremental"""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            for table in ENDPOINT_TABLES.values():
+                self.conn.executescript(SCHEMA.format(table=table))
+                columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+                if 'total_sen' not in columns:
+                    # Store lama menyimpan nominal Rupiah REAL di kolom total: dikonversi sekali ke integer sen
+                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN total_sen INTEGER NOT NULL DEFAULT 0")
+                    self.conn.execute(f"UPDATE {table} SET total_sen = CAST(ROUND(total * 100) AS INTEGER)")
+            self.conn.executescript(SYNC_STATE_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def upsert(self, endpoint, records, keys=None):
+        """Simpan/replace record berdasarkan record_key, return jumlah record.
+        keys: RecordKeys yang dipakai bersama semua halaman satu sync (default: records dianggap batch utuh)"""
+        table = ENDPOINT_TABLES[endpoint]
+        keys = keys or RecordKeys()
+        rows = [
+            (
+                keys(record),
+                record.get('id'),
+                record.get('nomor_transaksi'),
+                record_date(record),
+                record.get('nama_clinic') or record.get('nama_klinik') or record.get('klinik'),
+                record_amount_sen(endpoint, record),
+                record.get('created_at'),
+                json.dumps(record, ensure_ascii=False),
+            )
+            for record in records
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO {table} (record_key, id, nomor_transaksi, tanggal, nama_clinic, total_sen, created_at, raw) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+    def delete_range(self, endpoint, dari_tanggal, sampai_tanggal):
+        """Hapus record di rentang tanggal (dipakai sebelum menulis ulang hari yang mungkin berubah)"""
+        table = ENDPOINT_TABLES[endpoint]
+        with self.lock, self.conn:
+            self.conn.execute(f"DELETE FROM {table} WHERE tanggal BETWEEN ? AND ?", (dari_tanggal, sampai_tanggal))
+
+    def watermark(self, endpoint, dari_tanggal, sampai_tanggal):
+        """Watermark rentang yang pernah di-sync: (id terbesar, tanggal terakhir), atau None kalau belum pernah"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT watermark_id, watermark_tanggal FROM sync_state "
+                "WHERE endpoint = ? AND dari_tanggal = ? AND sampai_tanggal = ?",
+                (endpoint, dari_tanggal, sampai_tanggal),
+            ).fetchone()
+        return row
+
+    def save_watermark(self, endpoint, dari_tanggal, sampai_tanggal):
+        """Catat watermark terbaru dari isi store untuk rentang ini"""
+        table = ENDPOINT_TABLES[endpoint]
+        with self.lock, self.conn:
+            watermark_id, watermark_tanggal = self.conn.execute(
+                f"SELECT MAX(id), MAX(tanggal) FROM {table} WHERE tanggal BETWEEN ? AND ?",
+                (dari_tanggal, sampai_tanggal),
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?, ?, ?, ?)",
+                (endpoint, dari_tanggal, sampai_tanggal, watermark_id, watermark_tanggal,
+                 datetime.now().isoformat(timespec='seconds')),
+            )
+
+    def count(self, endpoint, dari_tanggal, sampai_tanggal):
+        table = ENDPOINT_TABLES[endpoint]
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE tanggal BETWEEN ? AND ?", (dari_tanggal, sampai_tanggal)
+            ).fetchone()[0]
+
+    def records(self, endpoint, nama_clinic, dari_tanggal, sampai_tanggal):
+        """Record mentah di rentang tanggal, satu cabang (pakai index nama_clinic, tanggal) atau semua kalau None"""
+        table = ENDPOINT_TABLES[endpoint]
+        query = f"SELECT raw FROM {table} WHERE tanggal BETWEEN ? AND ?"
+        params = (dari_tanggal, sampai_tanggal)
+        if nama_clinic is not None:
+            query += " AND nama_clinic = ?"
+            params += (nama_clinic,)
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [json.loads(raw) for raw, in rows]
+
+    def daily_totals(self, endpoint, dari_tanggal, sampai_tanggal):
+        """Baris (nama_clinic, tanggal, total sen) satu endpoint, sudah di-group per hari; SUM integer, exact"""
+        table = ENDPOINT_TABLES[endpoint]
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT nama_clinic, tanggal, SUM(total_sen) FROM {table} WHERE tanggal BETWEEN ? AND ? "
+                "AND nama_clinic IS NOT NULL AND nama_clinic != '' GROUP BY nama_clinic, tanggal",
+                (dari_tanggal, sampai_tanggal),
+            ).fetchall()
+
+    def aggregate(self, dari_tanggal, sampai_tanggal, endpoints=None):
+        """Total per cabang per tanggal dari store: {cabang: {tanggal: total}}"""
+        endpoints = endpoints or list(ENDPOINT_TABLES)
+        union = " UNION ALL ".join(
+            f"SELECT nama_clinic, tanggal, total_sen FROM {ENDPOINT_TABLES[endpoint]} WHERE tanggal BETWEEN ? AND ?"
+            for endpoint in endpoints
+        )
+        query = (
+            f"SELECT nama_clinic, tanggal, SUM(total_sen) FROM ({union}) "
+            "WHERE nama_clinic IS NOT NULL AND nama_clinic != '' GROUP BY nama_clinic, tanggal"
+        )
+        with self.lock:
+            rows = self.conn.execute(query, (dari_tanggal, sampai_tanggal) * len(endpoints)).fetchall()
+
+        aggregated = {}
+        for cabang, tanggal, total_sen in rows:
+            aggregated.setdefault(cabang, {})[tanggal] = sen_to_rupiah(total_sen)
+        return aggregated
+
+def sync_endpoint(store, endpoint, params, max_workers=MAX_CONCURRENCY, customers=None):
+    """Sync satu endpoint ke store lokal, hanya download data setelah watermark; return jumlah record di-download.
+    customers: CustomerIndex opsional yang ikut di-update per halaman"""
+    dari_tanggal, sampai_tanggal = params['dari_tanggal'], params['sampai_tanggal']
+    watermark = store.watermark(endpoint, dari_tanggal, sampai_tanggal)
+    # Ada request yang menyerah = halaman hilang: watermark tidak disimpan, jadi sync berikutnya mengulang rentang ini
+    failures_before = api_client.failure_count
+
+    if watermark is None:
+        # Belum pernah di-sync: semua shard langsung ditulis ke store begitu selesai
+        downloaded = 0
+        store_keys, visit_keys = RecordKeys(), RecordKeys()
+        for page in iter_sharded_pages(endpoint, params, max_workers=max_workers):
+            downloaded += store.upsert(endpoint, page, store_keys)
+            if customers is not None:
+                customers.add(endpoint, page, visit_keys)
+        if api_client.failure_count != failures_before:
+            print(f"   ⚠️  {endpoint}: ada request gagal, watermark tidak disimpan (sync berikutnya diulang penuh)")
+        elif downloaded:
+            store.save_watermark(endpoint, dari_tanggal, sampai_tanggal)
+        print(f"   ✅ {endpoint}: {downloaded} record di-download, {store.count(endpoint, dari_tanggal, sampai_tanggal)} record di store")
+        return downloaded
+
+    if watermark[0] is not None:
+        # Endpoint dengan id (produk): cukup halaman teratas yang id-nya > watermark
+        records = fetch_new_pages(endpoint, params, watermark[0])
+    else:
+        # Tanpa id (perawatan): fetch ulang mulai tanggal watermark, hari itu mungkin belum tutup
+        dari_watermark = watermark[1] or dari_tanggal
+        records = fetch_sharded(endpoint, {**params, 'dari_tanggal': dari_watermark}, max_workers=max_workers)
+        if api_client.failure_count != failures_before:
+            # Hasil fetch ulang tidak lengkap: isi store yang lama tetap dipakai
+            print(f"   ⚠️  {endpoint}: ada request gagal, store tidak diubah, dicoba lagi sync berikutnya")
+            return 0
+        if records:
+            store.delete_range(endpoint, dari_watermark, sampai_tanggal)
+            if customers is not None:
+                customers.delete_range(endpoint, dari_watermark, sampai_tanggal)
+
+    store.upsert(endpoint, records)
+    if customers is not None:
+        customers.add(endpoint, records)
+    if api_client.failure_count != failures_before:
+        print(f"   ⚠️  {endpoint}: ada request gagal, watermark tidak dimajukan")
+    else:
+        store.save_watermark(endpoint, dari_tanggal, sampai_tanggal)
+    print(f"   ✅ {endpoint}: {len(records)} record di-download, {store.count(endpoint, dari_tanggal, sampai_tanggal)} record di store")
+    return len(records)
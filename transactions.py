@@ -0,0 +1,131 @@
+import os
+import json
+import threading
+from datetime import date
+
+import numpy as np
+
+from aggregation import DATE_FIELDS, CLINIC_FIELDS, AMOUNT_FIELDS, first_value, parse_rupiah_sen, sen_to_rupiah
+
+# Representasi transaksi ringkas: satu baris NumPy structured array per transaksi (25 byte),
+# nominal disimpan integer sen (exact, tanpa drift float), klinik & metode pembayaran sebagai ID kecil,
+# tanggal sebagai ordinal hari (date.toordinal).
+
+KLINIK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "getklinik.json")
+
+KIND_PRODUK = 0
+KIND_PERAWATAN = 1
+ENDPOINT_KINDS = {
+    "laporan-penjualan-produk": KIND_PRODUK,
+    "laporan-penjualan-perawatan": KIND_PERAWATAN,
+}
+
+TRANSACTION_DTYPE = np.dtype([
+    ('id', '<i8'),      # id transaksi produk (-1 kalau tidak ada, mis. perawatan)
+    ('amount', '<i8'),  # Nominal dalam sen
+    ('day', '<i4'),     # date.toordinal()
+    ('clinic', '<i2'),  # ID klinik (getklinik.json), -1 kalau kosong
+    ('metode', '<i2'),  # ID metode_pembayaran, -1 kalau kosong
+    ('kind', 'i1'),     # KIND_PRODUK / KIND_PERAWATAN
+])
+
+def day_ordinal(value):
+    """'2025-12-01' / '2025-12-01 09:28:27' -> ordinal hari, 0 kalau kosong / tidak valid"""
+    if not value:
+        return 0
+    try:
+        return date.fromisoformat(str(value)[:10]).toordinal()
+    except ValueError:
+        return 0
+
+def ordinal_date(ordinal):
+    return date.fromordinal(int(ordinal)).isoformat()
+
+class Interner:
+    """String <-> ID kecil; aman dipakai bersama oleh thread fetch"""
+
+    def __init__(self, names=None):
+        self.ids = {}
+        self.names = {}
+        self.lock = threading.Lock()
+        for id_, name in (names or {}).items():
+            self.ids[name] = id_
+            self.names[id_] = name
+
+    def id(self, name):
+        if not name:
+            return -1
+        id_ = self.ids.get(name)
+        if id_ is None:
+            with self.lock:
+                id_ = self.ids.get(name)
+                if id_ is None:
+                    id_ = max(self.names, default=0) + 1
+                    self.ids[name] = id_
+                    self.names[id_] = name
+        return id_
+
+    def name(self, id_):
+        return self.names.get(int(id_), '')
+
+def load_clinic_ids(path=KLINIK_FILE):
+    """Interner klinik dengan ID resmi dari getklinik.json; nama yang belum dikenal dapat ID baru"""
+    with open(path, encoding='utf-8') as f:
+        clinics = json.load(f)
+    return Interner({clinic['id']: clinic['nama_clinic'] for clinic in clinics})
+
+clinic_ids = load_clinic_ids()
+metode_ids = Interner()
+
+def pack_records(records, endpoint, clinics=None, metodes=None):
+    """List record JSON satu endpoint -> structured array TRANSACTION_DTYPE"""
+    clinics = clinics or clinic_ids
+    metodes = metodes or metode_ids
+    kind = ENDPOINT_KINDS.get(endpoint, -1)
+    packed = np.empty(len(records), dtype=TRANSACTION_DTYPE)
+
+    # Tanggal dan nominal banyak berulang, jadi hasil parse di-cache per nilai unik
+    days, amounts = {}, {}
+    for i, record in enumerate(records):
+        tanggal = first_value(record, DATE_FIELDS)
+        day = days.get(tanggal)
+        if day is None:
+            day = days[tanggal] = day_ordinal(tanggal)
+        nominal = first_value(record, AMOUNT_FIELDS)
+        amount = amounts.get(nominal)
+        if amount is None:
+            amount = amounts[nominal] = parse_rupiah_sen(nominal)
+        record_id = record.get('id')
+        packed[i] = (
+            record_id if isinstance(record_id, int) else -1,
+            amount,
+            day,
+            clinics.id(first_value(record, CLINIC_FIELDS)),
+            metodes.id(record.get('metode_pembayaran')),
+            kind,
+        )
+    return packed
+
+def totals_by_clinic_day(transactions):
+    """Total exact per (clinic, day): return (clinic, day, total_sen) sebagai array, urut clinic lalu day"""
+    valid = transactions[(transactions['clinic'] >= 0) & (transactions['day'] > 0)]
+    if not len(valid):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+    keys = valid['clinic'].astype(np.int64) << 32 | valid['day'].astype(np.int64)
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    totals = np.zeros(len(unique_keys), dtype=np.int64)
+    np.add.at(totals, inverse, valid['amount'])
+    return unique_keys >> 32, unique_keys & 0xFFFFFFFF, totals
+
+def aggregate_compact(arrays, year_month=None, clinics=None):
+    """Beberapa structured array -> {nama_clinic: {tanggal: total Rupiah}} seperti StreamingAggregator.result"""
+    clinics = clinics or clinic_ids
+    transactions = np.concatenate(arrays) if arrays else np.empty(0, dtype=TRANSACTION_DTYPE)
+    aggregated = {}
+    for clinic, day, total in zip(*totals_by_clinic_day(transactions)):
+        tanggal = ordinal_date(day)
+        if year_month and not tanggal.startswith(year_month):
+            continue
+        aggregated.setdefault(clinics.name(clinic), {})[tanggal] = sen_to_rupiah(int(total))
+    return aggregated